@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Response
+
+from app.core.calculation.result_cache import result_cache
+from app.core.schemas import ResultCacheStatsResponse
+
+router = APIRouter()
+
+
+@router.get("/cache/stats", response_model=ResultCacheStatsResponse)
+def cache_stats():
+    return result_cache.stats()
+
+
+@router.delete("/cache", status_code=204)
+def clear_cache():
+    result_cache.clear()
+    return Response(status_code=204)
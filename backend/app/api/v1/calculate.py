@@ -1,17 +1,273 @@
-from fastapi import APIRouter
+from typing import List, Optional
 
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from app.api.v1.models import get_registered_model
+from app.core.calculation.batch import BatchCalculator
 from app.core.calculation.calculator import Calculator
+from app.core.calculation.coalescer import request_coalescer
+from app.core.calculation.columnar import NPZ_MEDIA_TYPE, accepts_npz, read_npz, write_npz
+from app.core.calculation.model import CalculationModel, model_hash
+from app.core.calculation.monte_carlo import MonteCarloSimulator
+from app.core.calculation.offload import PoolSaturatedError, evaluation_pool
 from app.core.calculation.parameter import Parameter
-from app.core.schemas import CalculationRequest, CalculationResponse
+from app.core.calculation.result_cache import result_cache
+from app.core.calculation.sensitivity import SensitivityAnalyzer
+from app.core.calculation.solver import GoalSeekSolver
+from app.core.calculation.streaming import RequestStreamingResponse, iter_ndjson, stream_results
+from app.core.calculation.sweep import ParameterSweep, stream_sweep
+from app.core.config import settings
+from app.core.schemas import (
+    BatchCalculationRequest,
+    BatchCalculationResponse,
+    CalculationRequest,
+    CalculationResponse,
+    DistributionSpec,
+    ModelBatchCalculationRequest,
+    ModelCalculationRequest,
+    SimulationRequest,
+    SimulationResponse,
+    SolveRequest,
+    SolveResponse,
+    SweepRange,
+    SweepRequest,
+    SweepResponse,
+)
 
 router = APIRouter()
 
 
-@router.post("/calculate", response_model=CalculationResponse)
-def calculate(request: CalculationRequest):
+@router.post("/calculate", response_model=CalculationResponse, response_model_exclude_none=True)
+async def calculate(request: CalculationRequest):
+    if request.sensitivity:
+        return await run_in_threadpool(evaluate_request, request)
+
+    definitions = [param.model_dump() for param in request.parameters]
+
+    async def evaluate():
+        # Large models go to the process pool, everything else to the threadpool as before
+        if evaluation_pool.should_offload(len(definitions)):
+            return await offload(evaluation_pool.evaluate_definitions(definitions, request.inputs, request.target))
+        if request_coalescer.enabled:
+            # Concurrent requests with the same parameter set share one model and one vectorized pass
+            return await request_coalescer.evaluate(
+                model_hash(definitions),
+                lambda: CalculationModel.from_definitions(definitions),
+                request.inputs,
+                request.target,
+            )
+        return await run_in_threadpool(evaluate_request, request)
+
+    return await cached(lambda: model_hash(definitions), request.inputs, request.target, evaluate)
+
+
+def evaluate_request(request: CalculationRequest):
     parameters = [Parameter(param.model_dump()) for param in request.parameters]
 
+    if request.sensitivity:
+        return analyze_sensitivity(CalculationModel(parameters), request.inputs, request.target, request.swing)
+
     calculator = Calculator(parameters=parameters, inputs=request.inputs)
     targets = request.target
     result = calculator.evaluate(targets)
     return result
+
+
+@router.post("/calculate/batch", response_model=BatchCalculationResponse)
+def calculate_batch(request: BatchCalculationRequest, http_request: Request):
+    parameters = [Parameter(param.model_dump()) for param in request.parameters]
+    return evaluate_batch(parameters, request.inputs, request.target, http_request.headers.get("accept", ""))
+
+
+def evaluate_batch(parameters, inputs, targets: List[str], accept: str, model: Optional[CalculationModel] = None):
+    try:
+        calculator = BatchCalculator(parameters=parameters, inputs=inputs, model=model)
+        # Binary results keep inf/nan as they are instead of mapping them to null
+        if accepts_npz(accept):
+            return Response(write_npz(targets, calculator.evaluate_arrays(targets)), media_type=NPZ_MEDIA_TYPE)
+        return calculator.evaluate(targets)
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=f"Missing input {e}")
+    except (ValueError, ZeroDivisionError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.post(
+    "/calculate/{model_id}/batch",
+    response_model=BatchCalculationResponse,
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/json": {"schema": ModelBatchCalculationRequest.model_json_schema()},
+                NPZ_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+            },
+        },
+    },
+)
+async def calculate_model_batch(
+    request: Request,
+    target: Optional[List[str]] = Query(None),
+    model: CalculationModel = Depends(get_registered_model),
+):
+    # Body: JSON like /calculate/batch without parameters, or an .npz archive with one array per
+    # input and the targets in the query string. Accept: application/x-npz returns one array per target.
+    body = await request.body()
+    if request.headers.get("content-type", "").split(";")[0].strip() == NPZ_MEDIA_TYPE:
+        if not target:
+            raise HTTPException(status_code=422, detail="Binary batches need at least one target query parameter")
+        try:
+            inputs = read_npz(body, settings.columnar_max_bytes)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    else:
+        try:
+            batch = ModelBatchCalculationRequest.model_validate_json(body)
+        except ValidationError as e:
+            raise RequestValidationError(e.errors(include_url=False))
+        inputs, target = batch.inputs, batch.target
+
+    accept = request.headers.get("accept", "")
+    return await run_in_threadpool(evaluate_batch, model.parameters, inputs, target, accept, model)
+
+
+@router.post("/calculate/{model_id}", response_model=CalculationResponse, response_model_exclude_none=True)
+async def calculate_model(request: ModelCalculationRequest, model: CalculationModel = Depends(get_registered_model)):
+    if request.sensitivity:
+        return await run_in_threadpool(analyze_sensitivity, model, request.inputs, request.target, request.swing)
+
+    async def evaluate():
+        if evaluation_pool.should_offload(len(model.parameters)):
+            return await offload(evaluation_pool.evaluate(model, request.inputs, request.target))
+        if request_coalescer.enabled:
+            return await request_coalescer.evaluate(model.model_id, lambda: model, request.inputs, request.target)
+
+        calculator = Calculator(parameters=model.parameters, inputs=request.inputs, model=model, optimize=True)
+        return await run_in_threadpool(calculator.evaluate, request.target)
+
+    return await cached(lambda: model.model_id, request.inputs, request.target, evaluate)
+
+
+async def cached(get_model_id, inputs, targets: List[str], evaluate):
+    # Exact repeats of a calculation are answered from the result cache when it is enabled
+    if not result_cache.enabled:
+        return await evaluate()
+
+    model_id = get_model_id()
+    result = await cache_call(result_cache.get, model_id, inputs, targets)
+    if result is not None:
+        return {"result": result}
+
+    response = await evaluate()
+    await cache_call(result_cache.set, model_id, inputs, targets, response["result"])
+    return response
+
+
+async def cache_call(function, *args):
+    if result_cache.backend.blocking:
+        return await run_in_threadpool(function, *args)
+    return function(*args)
+
+
+async def offload(evaluation):
+    try:
+        return await evaluation
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
+def analyze_sensitivity(model: CalculationModel, inputs, targets: List[str], swing: float):
+    try:
+        return SensitivityAnalyzer(model, inputs).analyze(targets, swing)
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=f"Missing input {e}")
+    except (ValueError, ZeroDivisionError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.post("/calculate/{model_id}/stream")
+async def calculate_stream(
+    request: Request,
+    target: List[str] = Query(...),
+    chunk_size: int = Query(settings.stream_chunk_size, ge=1, le=settings.stream_max_chunk_size),
+    model: CalculationModel = Depends(get_registered_model),
+):
+    # Body: one JSON object of inputs per line. Response: one {"result": [...]} line per scenario.
+    scenarios = iter_ndjson(request.stream())
+    return RequestStreamingResponse(
+        stream_results(model, scenarios, target, chunk_size),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.post("/calculate/{model_id}/simulate", response_model=SimulationResponse)
+def simulate(request: SimulationRequest, model: CalculationModel = Depends(get_registered_model)):
+    if request.samples > settings.monte_carlo_max_samples:
+        raise HTTPException(status_code=422, detail=f"At most {settings.monte_carlo_max_samples} samples are allowed")
+    if any(not 0 <= percentile <= 100 for percentile in request.percentiles):
+        raise HTTPException(status_code=422, detail="Percentiles must be between 0 and 100")
+
+    inputs = {
+        name: value.model_dump() if isinstance(value, DistributionSpec) else value
+        for name, value in request.inputs.items()
+    }
+
+    try:
+        simulator = MonteCarloSimulator(
+            model,
+            inputs,
+            request.target,
+            samples=request.samples,
+            seed=request.seed,
+            chunk_size=settings.monte_carlo_chunk_size,
+            workers=min(request.workers, settings.monte_carlo_max_workers),
+        )
+        return simulator.run(request.percentiles)
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=f"Missing input {e}")
+    except (ValueError, ZeroDivisionError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.post("/calculate/{model_id}/solve", response_model=SolveResponse)
+def solve(request: SolveRequest, model: CalculationModel = Depends(get_registered_model)):
+    if len(request.solve) > settings.solver_max_specs:
+        raise HTTPException(status_code=422, detail=f"At most {settings.solver_max_specs} solves are allowed")
+    if request.max_iterations > settings.solver_max_iterations:
+        raise HTTPException(status_code=422, detail=f"At most {settings.solver_max_iterations} iterations are allowed")
+
+    try:
+        solver = GoalSeekSolver(
+            model, request.inputs, tolerance=request.tolerance, max_iterations=request.max_iterations
+        )
+        return solver.solve([spec.model_dump() for spec in request.solve])
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=f"Missing input {e}")
+    except (ValueError, ZeroDivisionError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.post("/calculate/{model_id}/sweep", response_model=SweepResponse)
+async def sweep(
+    request: SweepRequest,
+    chunk_size: int = Query(settings.stream_chunk_size, ge=1, le=settings.stream_max_chunk_size),
+    model: CalculationModel = Depends(get_registered_model),
+):
+    # Evaluates every combination of the axes' levels without materializing the grid. Aggregates
+    # are returned as JSON, full results stream as NDJSON lines of {"index", "inputs", "result"}.
+    axes = {name: axis.model_dump() if isinstance(axis, SweepRange) else axis for name, axis in request.axes.items()}
+    try:
+        parameter_sweep = ParameterSweep(
+            model, axes, request.inputs, request.target, chunk_size, max_scenarios=settings.sweep_max_scenarios
+        )
+        if request.mode == "results":
+            if request.pareto:
+                raise ValueError("Pareto fronts are only computed in aggregate mode.")
+            return RequestStreamingResponse(stream_sweep(parameter_sweep), media_type="application/x-ndjson")
+        return await run_in_threadpool(parameter_sweep.aggregate, request.pareto, settings.sweep_max_pareto_points)
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=f"Missing input {e}")
+    except (ValueError, ZeroDivisionError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
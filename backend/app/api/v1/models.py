@@ -0,0 +1,82 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from app.core.calculation.model import CalculationModel
+from app.core.calculation.model_store import model_store
+from app.core.calculation.registry import ModelTooLargeError, model_registry
+from app.core.calculation.unit_calculator import UnitCalculator
+from app.core.schemas import (
+    ModelRegistrationRequest,
+    ModelRegistrationResponse,
+    ModelUnitsResponse,
+    OptimizationStatsResponse,
+    RegistryStatsResponse,
+)
+
+router = APIRouter()
+
+
+def get_registered_model(model_id: str) -> CalculationModel:
+    model = model_registry.get(model_id)
+    if model is None:
+        # Stored models outlive the registry, e.g. across restarts; they load from their artifact
+        stored = model_store.find(model_id)
+        if stored is not None:
+            try:
+                model = model_registry.add(stored)
+            except ModelTooLargeError as e:
+                raise HTTPException(status_code=413, detail=str(e))
+    if model is None:
+        raise HTTPException(status_code=404, detail=f"Model '{model_id}' is not registered")
+    return model
+
+
+@router.post("/models", response_model=ModelRegistrationResponse)
+def register_model(request: ModelRegistrationRequest):
+    definitions = [param.model_dump() for param in request.parameters]
+
+    try:
+        model = model_registry.register(definitions, request.check_units)
+    except ModelTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    return {"model_id": model.model_id, "parameter_count": len(model.parameters)}
+
+
+@router.get("/models/stats", response_model=RegistryStatsResponse, response_model_exclude_none=True)
+def registry_stats():
+    return model_registry.stats()
+
+
+@router.delete("/models/{model_id}", status_code=204)
+def delete_model(model_id: str):
+    # With the shared store, other worker processes drop their copy at their next lookup
+    if not model_registry.remove(model_id):
+        raise HTTPException(status_code=404, detail=f"Model '{model_id}' is not registered")
+    return Response(status_code=204)
+
+
+@router.get("/models/{model_id}/units", response_model=ModelUnitsResponse)
+def model_units(model: CalculationModel = Depends(get_registered_model)):
+    if model.units is not None:
+        return {"units": model.units}
+    try:
+        return {"units": UnitCalculator.resolve_units(model)}
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.get("/models/{model_id}/optimization", response_model=OptimizationStatsResponse)
+def model_optimization(
+    target: Optional[List[str]] = Query(None),
+    model: CalculationModel = Depends(get_registered_model),
+):
+    # Folding and sharing statistics for the targets' expression plan; all parameters by default
+    targets = target or [param.name for param in model.parameters]
+    try:
+        return model.expression_plan(targets).stats
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
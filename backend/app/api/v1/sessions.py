@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException, Response
+
+from app.api.v1.models import get_registered_model
+from app.core.calculation.session import CalculationSession, session_store
+from app.core.schemas import SessionCreateRequest, SessionResponse, SessionUpdateRequest, SessionUpdateResponse
+
+router = APIRouter()
+
+
+def get_session(session_id: str) -> CalculationSession:
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' does not exist or has expired")
+    return session
+
+
+@router.post("/sessions", response_model=SessionResponse)
+def create_session(request: SessionCreateRequest):
+    model = get_registered_model(request.model_id)
+    try:
+        session = session_store.create(model, request.inputs, request.target)
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=f"Missing input {e}")
+    except (ValueError, ZeroDivisionError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"session_id": session.session_id, "result": session.results()}
+
+
+@router.get("/sessions/{session_id}", response_model=SessionResponse)
+def read_session(session_id: str):
+    session = get_session(session_id)
+    return {"session_id": session.session_id, "result": session.results()}
+
+
+@router.patch("/sessions/{session_id}", response_model=SessionUpdateResponse)
+def update_session(session_id: str, request: SessionUpdateRequest):
+    session = get_session(session_id)
+    try:
+        changed, recomputed = session.update(request.inputs)
+    except (ValueError, ZeroDivisionError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"changed": changed, "recomputed": recomputed}
+
+
+@router.delete("/sessions/{session_id}", status_code=204)
+def delete_session(session_id: str):
+    if not session_store.remove(session_id):
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' does not exist or has expired")
+    return Response(status_code=204)
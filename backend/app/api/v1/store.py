@@ -0,0 +1,71 @@
+from fastapi import APIRouter, HTTPException, Response
+
+from app.core.calculation.model_store import StoredModel, VersionConflictError, model_store
+from app.core.calculation.registry import ModelTooLargeError, model_registry
+from app.core.schemas import (
+    ModelRegistrationRequest,
+    StoredModelDetailResponse,
+    StoredModelResponse,
+    StoredModelVersionsResponse,
+)
+
+router = APIRouter()
+
+
+def get_stored_model(name: str, version: str) -> StoredModel:
+    if version != "latest" and not version.isdigit():
+        raise HTTPException(status_code=422, detail="Version must be a number or 'latest'")
+
+    record = model_store.get(name, None if version == "latest" else int(version))
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Model '{name}' has no version '{version}'")
+    return record
+
+
+@router.post("/store/{name}", response_model=StoredModelResponse)
+def save_model(name: str, request: ModelRegistrationRequest):
+    # Saves a new version unless the parameters equal the latest one; either way the model is
+    # registered, so its model_id can be calculated with right away
+    definitions = [param.model_dump() for param in request.parameters]
+
+    try:
+        record, model = model_store.save(name, definitions, request.check_units)
+        model_registry.add(model)
+    except VersionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ModelTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    return record.metadata()
+
+
+@router.get("/store/{name}", response_model=StoredModelVersionsResponse)
+def model_versions(name: str):
+    versions = model_store.versions(name)
+    if not versions:
+        raise HTTPException(status_code=404, detail=f"Model '{name}' is not stored")
+    return {"name": name, "versions": [record.metadata() for record in versions]}
+
+
+@router.get("/store/{name}/{version}", response_model=StoredModelDetailResponse)
+def stored_model(name: str, version: str):
+    # Looking a version up also registers its compiled artifact, so calculating with the
+    # returned model_id skips all preparation
+    record = get_stored_model(name, version)
+    if model_registry.get(record.model_id) is None:
+        try:
+            model_registry.add(model_store.load(record))
+        except ModelTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+    return {**record.metadata(), "parameters": record.definitions, "units": record.units}
+
+
+@router.delete("/store/{name}", status_code=204)
+def delete_stored_model(name: str):
+    # Removes every version; registered copies stay until evicted
+    if not model_store.delete(name):
+        raise HTTPException(status_code=404, detail=f"Model '{name}' is not stored")
+    return Response(status_code=204)
@@ -0,0 +1,78 @@
+# Compact binary form of a prepared model, loadable without parsing or compiling any formula
+import marshal
+import struct
+import sys
+from typing import Union
+
+from app.core.metrics import metrics
+
+from .compiler import FormulaCompiler
+from .model import CalculationModel
+from .parameter import Parameter
+
+MAGIC = b"CALCMDL\0"
+# Bumped whenever the layout or the meaning of a compiled program changes
+FORMAT_VERSION = 1
+# Marshalled code objects only load into the interpreter version that wrote them
+INTERPRETER = sys.implementation.cache_tag.encode()
+
+_HEADER = struct.Struct("<8sHH")
+
+
+class ArtifactVersionError(ValueError):
+    # Written by another format or interpreter version; rebuild the model from its definitions
+    pass
+
+
+def dump_model(model: CalculationModel) -> bytes:
+    """Header, then the marshalled model: its id, unit check, and per parameter its definition,
+    postfix program and the code objects of its compiled functions.
+    """
+    parameters = []
+    for param in model.parameters:
+        compiled = param.compiled
+        if compiled is None:
+            formula = None
+        else:
+            formula = (
+                list(compiled.program),
+                tuple(compiled.operands),
+                compiled.source,
+                compiled.function.__code__ if compiled.is_native else None,
+                compiled.slot_function.__code__ if compiled.is_native else None,
+            )
+        parameters.append((param.name, param.type, param.unit, param.value, param.formula, formula))
+
+    payload = marshal.dumps((model.model_id, model.check_units, model.units, parameters))
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, len(INTERPRETER)) + INTERPRETER + payload
+
+
+def load_model(data: Union[bytes, memoryview]) -> CalculationModel:
+    # Accepts any buffer, e.g. a memoryview of a memory-mapped file, without copying it first
+    data = memoryview(data)
+    if len(data) < _HEADER.size:
+        raise ValueError("Model artifact is truncated.")
+
+    magic, version, interpreter_size = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a model artifact.")
+    interpreter = bytes(data[_HEADER.size : _HEADER.size + interpreter_size])
+    if version != FORMAT_VERSION or interpreter != INTERPRETER:
+        raise ArtifactVersionError(
+            f"Model artifact has format {version} for {interpreter.decode(errors='replace')}, "
+            f"expected format {FORMAT_VERSION} for {INTERPRETER.decode()}."
+        )
+
+    with metrics.stage("artifact_load"):
+        model_id, check_units, units, definitions = marshal.loads(data[_HEADER.size + interpreter_size :])
+
+        compiler = FormulaCompiler()
+        parameters = []
+        for name, kind, unit, value, formula, compiled in definitions:
+            if compiled is not None:
+                program, operands, source, code, slot_code = compiled
+                compiled = compiler.restore(formula, program, set(operands), source, code, slot_code)
+            definition = {"name": name, "type": kind, "unit": unit, "value": value, "formula": formula}
+            parameters.append(Parameter(definition, compiled))
+
+        return CalculationModel(parameters, model_id, check_units, units)
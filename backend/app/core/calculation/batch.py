@@ -0,0 +1,60 @@
+# Vectorized evaluation of many input scenarios in one graph traversal
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .model import CalculationModel
+from .parameter import Parameter
+
+
+class BatchCalculator:
+    def __init__(
+        self,
+        parameters: List[Parameter],
+        inputs: Dict[str, Union[float, Sequence[float]]],
+        model: Optional[CalculationModel] = None,
+        size: Optional[int] = None,
+    ):
+        self.parameters = parameters
+        self.inputs = {name: np.asarray(values, dtype=float) for name, values in inputs.items()}
+        self.size = self._scenario_count(size)
+        self.context: Dict[str, np.ndarray] = dict(self.inputs)
+        self.param_map = {p.name: p for p in parameters}
+        self.model = model
+
+    def _scenario_count(self, size: Optional[int]) -> int:
+        sizes = set() if size is None else {size}
+        for name, values in self.inputs.items():
+            if values.ndim > 1:
+                raise ValueError(f"Batch input '{name}' must be a scalar or a flat list of values.")
+            if values.ndim == 1:
+                sizes.add(values.shape[0])
+
+        if len(sizes) > 1:
+            raise ValueError(f"Batch inputs must all have the same number of scenarios, got {sorted(sizes)}.")
+
+        return sizes.pop() if sizes else 1
+
+    def evaluate_arrays(self, targets: List[str]) -> List[np.ndarray]:
+        if self.model is None:
+            self.model = CalculationModel(self.parameters)
+        if self.model.time_series:
+            # The time axis and the scenario axis would be broadcast against each other
+            raise ValueError("Models with time series can't be evaluated over a batch of scenarios.")
+
+        # Shared subexpressions are computed once for all scenarios. Scenarios that divide by zero
+        # yield inf/nan (None in evaluate()) instead of failing the whole batch.
+        plan = self.model.expression_plan(targets, self.inputs)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            values = plan.evaluate(self.context, targets, constant=np.float64)
+
+        return [np.broadcast_to(np.asarray(value, dtype=float), (self.size,)) for value in values]
+
+    def evaluate(self, targets: List[str]) -> Dict[str, List[List[Optional[float]]]]:
+        # JSON has no inf/nan, so scenarios without a finite result are reported as None
+        columns = []
+        for column in self.evaluate_arrays(targets):
+            values = column.astype(object)
+            values[~np.isfinite(column)] = None
+            columns.append(values.tolist())
+        return {"result": columns}
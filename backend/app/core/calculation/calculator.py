@@ -1,36 +1,61 @@
 # Calculator
-from typing import Dict, List
+from typing import Any, Dict, List, Optional
 
-from .dependency_graph import DependencyGraph
+import numpy as np
+
+from app.core.metrics import metrics
+
+from .model import CalculationModel
 from .parameter import Parameter
 
 
 class Calculator:
-    def __init__(self, parameters: List[Parameter], inputs: Dict[str, float]):
+    def __init__(
+        self,
+        parameters: List[Parameter],
+        inputs: Dict[str, float],
+        model: Optional[CalculationModel] = None,
+        optimize: bool = False,
+    ):
         self.parameters = parameters
         self.inputs = inputs
-        self.context = inputs.copy()
         self.param_map = {p.name: p for p in parameters}
-
-    def evaluate(self, targets: List[str]) -> Dict[str, List[float]]:
-        graph = DependencyGraph(self.parameters)
-        evaluation_order = graph.topological_sort()
-
-        for param_name in evaluation_order:
-            param = self.param_map[param_name]
-
-            if param_name not in self.context:
-                param.resolve_value(self.context)
-
-                if param.result is None:
-                    raise ValueError(f"Parameter '{param_name}' could not be resolved.")
-
-                self.context[param_name] = param.result
-
-        results = []
-        for target in targets:
-            if target not in self.context:
-                raise ValueError(f"Target '{target}' was not resolved.")
-            results.append(self.context[target])
-
-        return {"result": results}
+        self.model = model
+        # Per-run slot buffer; the model itself holds no run state
+        self.buffer = None
+        self.plan: List[str] = []
+        # Evaluate through the model's folded, shared expression plan; it only pays off when
+        # the model (and so the cached plan) is reused, and intermediate values aren't kept
+        self.optimize = optimize
+
+    def evaluate(self, targets: List[str]) -> Dict[str, List[Any]]:
+        if self.model is None:
+            self.model = CalculationModel(self.parameters)
+        self.inputs = self.model.prepare_inputs(self.inputs)
+
+        if self.optimize:
+            expression_plan = self.model.expression_plan(targets, self.inputs)
+            with metrics.stage("evaluate"):
+                return {"result": to_results(expression_plan.evaluate(self.inputs, targets))}
+
+        compiled = self.model.compiled
+        self.plan = self.model.evaluation_plan(targets, self.inputs)
+
+        with metrics.stage("evaluate"):
+            self.buffer = compiled.run(self.inputs, targets)
+
+        return {"result": to_results(compiled.read(self.buffer, self.inputs, targets))}
+
+    @property
+    def context(self) -> Dict[str, float]:
+        # Inputs plus every value the last evaluation computed, by name
+        context = dict(self.inputs)
+        if self.buffer is not None:
+            slots = self.model.compiled.slots
+            context.update((name, self.buffer[slots[name]]) for name in self.plan)
+        return context
+
+
+def to_results(values: List[Any]) -> List[Any]:
+    # Time series targets are returned as lists, one value per step
+    return [value.tolist() if isinstance(value, np.ndarray) else value for value in values]
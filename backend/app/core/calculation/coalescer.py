@@ -0,0 +1,141 @@
+# Micro-batching: concurrent calculations against the same model are evaluated as one batch
+import asyncio
+import math
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+from .batch import BatchCalculator
+from .calculator import Calculator
+from .model import CalculationModel
+
+# Requests are only batched with others for the same model, targets and input names
+BatchKey = Tuple[str, Tuple[str, ...], FrozenSet[str]]
+
+
+class _PendingBatch:
+    __slots__ = ("get_model", "scenarios", "futures", "timer")
+
+    def __init__(self, get_model: Callable[[], CalculationModel]):
+        self.get_model = get_model
+        self.scenarios: List[Dict[str, float]] = []
+        self.futures: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class RequestCoalescer:
+    """Holds each calculation for at most ``window_ms`` so that others for the same model can join it.
+
+    A batch is evaluated once the window of its first request ends or it reaches ``max_batch``
+    scenarios, in one vectorized pass, and every request gets its own row of the result back.
+    """
+
+    def __init__(self, window_ms: float, max_batch: int, enabled: bool = False):
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self.enabled = enabled
+
+        # Only touched from the event loop, so no lock is needed
+        self._pending: Dict[BatchKey, _PendingBatch] = {}
+        self._running: Set[asyncio.Task] = set()
+        self.requests = 0
+        self.batches = 0
+
+    async def evaluate(
+        self,
+        model_id: str,
+        get_model: Callable[[], CalculationModel],
+        inputs: Dict[str, float],
+        targets: List[str],
+    ) -> Dict[str, List[float]]:
+        loop = asyncio.get_running_loop()
+        key = (model_id, tuple(targets), frozenset(inputs))
+
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _PendingBatch(get_model)
+            batch.timer = loop.call_later(self.window_ms / 1000, self._flush, key)
+
+        future = loop.create_future()
+        batch.scenarios.append(inputs)
+        batch.futures.append(future)
+        self.requests += 1
+
+        if len(batch.scenarios) >= self.max_batch:
+            self._flush(key)
+
+        return await future
+
+    def _flush(self, key: BatchKey):
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        self.batches += 1
+
+        # Keep a reference, the event loop only holds weak ones to running tasks
+        task = asyncio.ensure_future(self._run(batch, list(key[1])))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: _PendingBatch, targets: List[str]):
+        try:
+            results = await run_in_threadpool(evaluate_scenarios, batch.get_model, batch.scenarios, targets)
+        except Exception as e:
+            results = [e] * len(batch.futures)
+
+        for future, result in zip(batch.futures, results):
+            # Requests whose client went away have already been cancelled
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "pending": sum(len(batch.scenarios) for batch in self._pending.values()),
+        }
+
+
+def evaluate_scenarios(
+    get_model: Callable[[], CalculationModel], scenarios: List[Dict[str, float]], targets: List[str]
+) -> List[Any]:
+    # One result dict or exception per scenario, exactly as each would have been evaluated alone
+    model = get_model()
+    if len(scenarios) == 1 or model.time_series or any(isinstance(value, list) for value in scenarios[0].values()):
+        # Time series runs can't share a vectorized pass, but still share the model
+        return [_evaluate_one(model, scenario, targets) for scenario in scenarios]
+
+    columns = {name: [scenario[name] for scenario in scenarios] for name in scenarios[0]}
+    calculator = BatchCalculator(model.parameters, columns, model=model, size=len(scenarios))
+    rows = list(zip(*(column.tolist() for column in calculator.evaluate_arrays(targets))))
+
+    results: List[Any] = []
+    for scenario, row in zip(scenarios, rows):
+        # Batches turn errors like a division by zero into inf/nan; rerun those scenarios alone
+        # so they fail (or not) just like an uncoalesced request would
+        if all(math.isfinite(value) for value in row):
+            results.append({"result": list(row)})
+        else:
+            results.append(_evaluate_one(model, scenario, targets))
+    return results
+
+
+def _evaluate_one(model: CalculationModel, inputs: Dict[str, float], targets: List[str]):
+    try:
+        return Calculator(model.parameters, inputs, model=model, optimize=True).evaluate(targets)
+    except Exception as e:
+        return e
+
+
+request_coalescer = RequestCoalescer(
+    window_ms=settings.coalesce_window_ms,
+    max_batch=settings.coalesce_max_batch,
+    enabled=settings.coalesce_enabled,
+)
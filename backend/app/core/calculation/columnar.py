@@ -0,0 +1,75 @@
+# Columnar binary (.npz) encoding of batch inputs and results
+import io
+import zipfile
+from typing import Dict, List
+
+import numpy as np
+
+NPZ_MEDIA_TYPE = "application/x-npz"
+
+
+def read_npz(body: bytes, max_bytes: int) -> Dict[str, np.ndarray]:
+    """Columns of an .npz archive, one per ``<name>.npy`` member.
+
+    Members stored uncompressed (``numpy.savez``) are returned as read-only views into ``body``,
+    so the evaluator reads the request bytes directly. Compressed members are inflated as usual.
+    """
+    columns = {}
+    view = memoryview(body)
+    try:
+        with zipfile.ZipFile(io.BytesIO(body)) as archive:
+            for info in archive.infolist():
+                if not info.filename.endswith(".npy"):
+                    raise ValueError(f"Unexpected member '{info.filename}' in .npz body.")
+                if info.file_size > max_bytes:
+                    raise ValueError(f"Column '{info.filename[:-4]}' exceeds {max_bytes} bytes.")
+
+                name = info.filename[:-4]
+                if info.compress_type == zipfile.ZIP_STORED:
+                    columns[name] = _stored_column(view, info)
+                else:
+                    with archive.open(info) as member:
+                        columns[name] = np.lib.format.read_array(member, allow_pickle=False)
+    except (zipfile.BadZipFile, EOFError) as e:
+        raise ValueError(f"Invalid .npz body: {e}")
+
+    for name, column in columns.items():
+        if column.dtype.kind not in "biuf":
+            raise ValueError(f"Column '{name}' must be numeric, got dtype {column.dtype}.")
+    return columns
+
+
+def _stored_column(view: memoryview, info: zipfile.ZipInfo) -> np.ndarray:
+    # The local file header's name and extra field lengths can differ from the central directory's
+    header = bytes(view[info.header_offset : info.header_offset + 30])
+    if header[:4] != b"PK\x03\x04":
+        raise ValueError(f"Invalid .npz body: bad header for '{info.filename}'.")
+    name_length = int.from_bytes(header[26:28], "little")
+    extra_length = int.from_bytes(header[28:30], "little")
+    start = info.header_offset + 30 + name_length + extra_length
+
+    member = io.BytesIO(view[start : start + info.file_size])
+    version = np.lib.format.read_magic(member)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(member)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(member)
+    if dtype.hasobject:
+        raise ValueError(f"Column '{info.filename[:-4]}' must be numeric, got dtype {dtype}.")
+
+    count = int(np.prod(shape))
+    if member.tell() + count * dtype.itemsize > info.file_size:
+        raise ValueError(f"Invalid .npz body: '{info.filename}' is truncated.")
+    column = np.frombuffer(view, dtype=dtype, count=count, offset=start + member.tell())
+    return column.reshape(shape, order="F" if fortran_order else "C")
+
+
+def write_npz(names: List[str], columns: List[np.ndarray]) -> bytes:
+    # Uncompressed, so clients can map the result columns without inflating them
+    buffer = io.BytesIO()
+    np.savez(buffer, **dict(zip(names, columns)))
+    return buffer.getvalue()
+
+
+def accepts_npz(accept: str) -> bool:
+    return any(part.split(";")[0].strip() == NPZ_MEDIA_TYPE for part in accept.split(","))
@@ -0,0 +1,163 @@
+# Immutable, slot-indexed runtime form of a model; each run evaluates into its own flat buffer
+from array import array
+from collections import OrderedDict
+from threading import Lock
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .model import CalculationModel
+
+STATIC_TYPES = ("COMPANY", "GLOBAL")
+
+
+class SlotProgram:
+    """Steps computing the calculations a set of targets needs, in dependency order.
+
+    Each step is ``(slot, slot_function, operand_slots)``; ``required`` lists the
+    ``(name, slot, type)`` values a run must provide.
+    """
+
+    __slots__ = ("steps", "required")
+
+    def __init__(self, steps: Tuple[Tuple[int, Any, Tuple[int, ...]], ...], required: Tuple[Tuple[str, int, str], ...]):
+        self.steps = steps
+        self.required = required
+
+
+class CompiledModel:
+    """Integer slot per parameter, assigned in evaluation order.
+
+    Static values are baked into a template buffer that every run copies, so a run allocates one
+    flat buffer instead of a dict and formulas read their operands by index. Runs involving time
+    series use a list buffer instead, since slots then hold arrays. Nothing here changes after
+    construction, so one instance serves concurrent requests.
+    """
+
+    __slots__ = ("names", "slots", "template", "series", "_model", "_invalid", "_programs", "_lock")
+
+    MAX_CACHED_PROGRAMS = 128
+
+    def __init__(self, model: "CalculationModel"):
+        self.names: Tuple[str, ...] = tuple(model.evaluation_order)
+        self.slots: Mapping[str, int] = MappingProxyType({name: slot for slot, name in enumerate(self.names)})
+        self._model = model
+
+        template = array("d", [float("nan")]) * len(self.names)
+        # Static values that don't parse only fail runs that actually need them
+        self._invalid: Dict[int, str] = {}
+        # Static time series by slot, shared read-only by every run
+        series: Dict[int, np.ndarray] = {}
+        for slot, name in enumerate(self.names):
+            param = model.param_map[name]
+            if param.type in STATIC_TYPES:
+                try:
+                    value = param.compute_value({})
+                except ValueError as e:
+                    self._invalid[slot] = str(e)
+                    continue
+                if isinstance(value, np.ndarray):
+                    value.flags.writeable = False
+                    series[slot] = value
+                else:
+                    template[slot] = float(value)
+        self.template = template
+        self.series: Mapping[int, np.ndarray] = MappingProxyType(series)
+
+        self._programs: "OrderedDict[Tuple[FrozenSet[str], FrozenSet[str]], SlotProgram]" = OrderedDict()
+        self._lock = Lock()
+
+    def program(self, targets: List[str], provided: Iterable[str] = ()) -> SlotProgram:
+        provided = set(provided)
+        # Like evaluation plans, only provided names that replace a calculation change the program
+        overrides = frozenset(name for name in provided if self._model.graph.graph.get(name))
+        key = (frozenset(targets), overrides)
+
+        with self._lock:
+            program = self._programs.get(key)
+            if program is not None:
+                self._programs.move_to_end(key)
+                return program
+
+        steps = []
+        required = []
+        for name in self._model.evaluation_plan(targets, provided):
+            param = self._model.param_map[name]
+            slot = self.slots[name]
+
+            if name in overrides:
+                continue
+            elif param.type == "CALCULATION":
+                operands = tuple(self.slots[operand] for operand in param.compiled.operands)
+                steps.append((slot, param.compiled.slot_function, operands))
+            elif param.type not in STATIC_TYPES:
+                required.append((name, slot, param.type))
+            elif slot in self._invalid:
+                required.append((name, slot, "INVALID"))
+
+        program = SlotProgram(tuple(steps), tuple(required))
+        with self._lock:
+            self._programs[key] = program
+            if len(self._programs) > self.MAX_CACHED_PROGRAMS:
+                self._programs.popitem(last=False)
+
+        return program
+
+    def new_buffer(self, size: Optional[int] = None, series: bool = False):
+        # Scalar runs use a flat array of doubles, batch runs a (slots, scenarios) NumPy array and
+        # time series runs a list holding floats and arrays
+        if size is None and (series or self.series):
+            buffer = list(self.template)
+            for slot, value in self.series.items():
+                buffer[slot] = value
+            return buffer
+        if self.series:
+            raise ValueError("Models with time series can't be evaluated over a batch of scenarios.")
+        if size is None:
+            return array("d", self.template)
+        buffer = np.empty((len(self.names), size))
+        buffer[:] = np.frombuffer(self.template, dtype=float)[:, None]
+        return buffer
+
+    def run(self, inputs: Mapping[str, Any], targets: List[str], size: Optional[int] = None):
+        program = self.program(targets, inputs)
+        buffer = self.new_buffer(size, series=any(isinstance(value, np.ndarray) for value in inputs.values()))
+
+        slots = self.slots
+        for name, value in inputs.items():
+            slot = slots.get(name)
+            if slot is not None:
+                buffer[slot] = value
+
+        for name, slot, kind in program.required:
+            if name not in inputs:
+                if kind == "USER":
+                    raise KeyError(name)
+                if kind == "INVALID":
+                    raise ValueError(self._invalid[slot])
+                raise ValueError(f"Parameter '{name}' could not be resolved.")
+
+        for slot, function, operands in program.steps:
+            buffer[slot] = function(buffer, operands)
+
+        return buffer
+
+    def read(self, buffer, inputs: Mapping[str, Any], targets: List[str]) -> List[Any]:
+        results = []
+        for target in targets:
+            slot = self.slots.get(target)
+            if slot is not None:
+                results.append(buffer[slot])
+            elif target in inputs:
+                # Inputs that aren't model parameters can still be asked for
+                results.append(inputs[target])
+            else:
+                raise ValueError(f"Target '{target}' was not resolved.")
+        return results
+
+    def __setattr__(self, name: str, value: Any):
+        if hasattr(self, "_lock"):
+            raise AttributeError(f"{type(self).__name__} is immutable")
+        object.__setattr__(self, name, value)
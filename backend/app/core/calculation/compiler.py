@@ -0,0 +1,242 @@
+# Formula compilation into cached executable plans
+from functools import lru_cache
+from types import CodeType, FunctionType
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .functions import FUNCTION_GLOBALS, FUNCTIONS
+from .parser import FormulaParser
+
+BINARY_OPERATORS = {
+    "Add": "+",
+    "Subtract": "-",
+    "Multiply": "*",
+    "Divide": "/",
+    "Power": "**",
+}
+
+UNARY_OPERATORS = {
+    "Unary_USub": "-",
+    "Unary_UAdd": "+",
+}
+
+# Instructions of the postfix program a formula is linearized into; CALL's argument is
+# (function name, argument count)
+CONST = "const"
+VAR = "var"
+CALL = "call"
+
+
+class CompiledFormula:
+    __slots__ = ("formula", "ast", "variables", "operands", "program", "source", "function", "slot_function")
+
+    def __init__(
+        self,
+        formula: Optional[str],
+        ast,
+        variables: Set[str],
+        program: List[Tuple[str, Any]],
+        source: Optional[str] = None,
+        function=None,
+        slot_function=None,
+    ):
+        self.formula = formula
+        self.ast = ast
+        self.variables = variables
+        # Variables in a fixed order; slot_function(buffer, slots) reads variable i from buffer[slots[i]]
+        self.operands = tuple(sorted(variables))
+        self.program = program
+        self.source = source
+        self.function = function
+        self.slot_function = slot_function or self._run_slots
+
+    @property
+    def is_native(self) -> bool:
+        return self.function is not None
+
+    def __call__(self, context: Dict[str, float]) -> float:
+        if self.function is not None:
+            try:
+                return self.function(context)
+            except KeyError as e:
+                raise ValueError(f"Variable '{e.args[0]}' not found in context.")
+
+        return self.run_program(context)
+
+    def _run_slots(self, buffer, slots: Tuple[int, ...]) -> float:
+        return self.run_program({name: buffer[slot] for name, slot in zip(self.operands, slots)})
+
+    def run_program(self, context: Dict[str, float]) -> float:
+        # Iterative stack machine, used when the formula is too deep for a native code object
+        stack: List[Any] = []
+        for op, arg in self.program:
+            if op == CONST:
+                stack.append(arg)
+            elif op == VAR:
+                if arg not in context:
+                    raise ValueError(f"Variable '{arg}' not found in context.")
+                stack.append(context[arg])
+            elif op == "Unary_USub":
+                stack.append(-stack.pop())
+            elif op == "Unary_UAdd":
+                stack.append(+stack.pop())
+            elif op == CALL:
+                name, argc = arg
+                args = stack[len(stack) - argc :]
+                del stack[len(stack) - argc :]
+                stack.append(FUNCTIONS[name][0](*args))
+            else:
+                right = stack.pop()
+                left = stack.pop()
+                if op == "Add":
+                    stack.append(left + right)
+                elif op == "Subtract":
+                    stack.append(left - right)
+                elif op == "Multiply":
+                    stack.append(left * right)
+                elif op == "Divide":
+                    stack.append(left / right)
+                else:
+                    stack.append(left**right)
+
+        return stack.pop()
+
+
+class FormulaCompiler:
+    # Python's own parser rejects more than ~200 nested parentheses, stay well below that
+    MAX_NATIVE_DEPTH = 100
+
+    def compile(self, formula: str) -> CompiledFormula:
+        ast_root, variables = FormulaParser().parse_formula_to_ast(formula)
+        return self.compile_ast(ast_root, variables, formula)
+
+    def compile_ast(self, node, variables: Optional[Set[str]] = None, formula: Optional[str] = None) -> CompiledFormula:
+        return self.compile_program(self.linearize(node), variables, formula, node)
+
+    def compile_program(
+        self,
+        program: List[Tuple[str, Any]],
+        variables: Optional[Set[str]] = None,
+        formula: Optional[str] = None,
+        ast=None,
+    ) -> CompiledFormula:
+        if variables is None:
+            variables = {arg for op, arg in program if op == VAR}
+
+        source, function, slot_function = None, None, None
+        generated = self._generate_source(program)
+        if generated is not None:
+            source, constants = generated
+            function = self._build_function(f"lambda _ctx: {source}", constants)
+
+            # Same expression reading operands by position from a flat per-run buffer
+            operands = {name: index for index, name in enumerate(sorted(variables))}
+            slot_source, _ = self._generate_source(program, lambda name: f"_v[_s[{operands[name]}]]")
+            slot_function = self._build_function(f"lambda _v, _s: {slot_source}", constants)
+
+        return CompiledFormula(formula, ast, variables, program, source, function, slot_function)
+
+    def restore(
+        self,
+        formula: Optional[str],
+        program: List[Tuple[str, Any]],
+        variables: Set[str],
+        source: Optional[str],
+        code: Optional[CodeType],
+        slot_code: Optional[CodeType],
+    ) -> CompiledFormula:
+        # Formula compiled earlier, e.g. in another process, from its program and the code objects
+        # of its functions; nothing is parsed or compiled again. The AST isn't kept.
+        if code is None:
+            return CompiledFormula(formula, None, variables, program)
+
+        constants = [arg for op, arg in program if op == CONST]
+        function = FunctionType(code, self._globals(constants))
+        slot_function = FunctionType(slot_code, self._globals(constants))
+        return CompiledFormula(formula, None, variables, program, source, function, slot_function)
+
+    def linearize(self, node) -> List[Tuple[str, Any]]:
+        program: List[Tuple[str, Any]] = []
+        stack = [(node, False)]
+
+        while stack:
+            current, children_emitted = stack.pop()
+
+            if isinstance(current, (float, int)):
+                program.append((CONST, float(current)))
+
+            elif isinstance(current, str):
+                program.append((VAR, current))
+
+            elif isinstance(current, dict):
+                op_type = current["type"]
+
+                if children_emitted:
+                    if op_type == "Call":
+                        program.append((CALL, (current["function"], len(current["args"]))))
+                    else:
+                        program.append((op_type, None))
+                elif op_type == "Call":
+                    stack.append((current, True))
+                    stack.extend((arg, False) for arg in reversed(current["args"]))
+                elif op_type in BINARY_OPERATORS:
+                    stack.append((current, True))
+                    stack.append((current["right"], False))
+                    stack.append((current["left"], False))
+                elif op_type in UNARY_OPERATORS:
+                    stack.append((current, True))
+                    stack.append((current["operand"], False))
+                elif op_type.startswith("Unary"):
+                    raise ValueError(f"Unsupported unary operator: {op_type}")
+                else:
+                    raise ValueError(f"Unsupported AST node structure: {current}")
+
+            else:
+                raise ValueError(f"Unsupported AST node structure: {current}")
+
+        return program
+
+    def _generate_source(
+        self, program: List[Tuple[str, Any]], variable: Callable[[str], str] = lambda name: f"_ctx[{name!r}]"
+    ) -> Optional[Tuple[str, List[float]]]:
+        constants: List[float] = []
+        stack: List[Tuple[str, int]] = []
+
+        for op, arg in program:
+            if op == CONST:
+                stack.append((f"_k[{len(constants)}]", 0))
+                constants.append(arg)
+            elif op == VAR:
+                stack.append((variable(arg), 0))
+            elif op in UNARY_OPERATORS:
+                operand, depth = stack.pop()
+                stack.append((f"({UNARY_OPERATORS[op]}{operand})", depth + 1))
+            elif op == CALL:
+                name, argc = arg
+                args = stack[len(stack) - argc :]
+                del stack[len(stack) - argc :]
+                depth = max(arg_depth for _, arg_depth in args) + 1
+                stack.append((f"_fn_{name}({', '.join(source for source, _ in args)})", depth))
+            else:
+                right, right_depth = stack.pop()
+                left, left_depth = stack.pop()
+                stack.append((f"({left} {BINARY_OPERATORS[op]} {right})", max(left_depth, right_depth) + 1))
+
+            if stack[-1][1] > self.MAX_NATIVE_DEPTH:
+                return None
+
+        return stack.pop()[0], constants
+
+    def _build_function(self, source: str, constants: List[float]):
+        try:
+            code = compile(source, "<formula>", "eval")
+        except (RecursionError, SyntaxError, MemoryError):
+            return None
+        return eval(code, self._globals(constants))
+
+    def _globals(self, constants: List[float]) -> Dict[str, Any]:
+        return {"__builtins__": {}, "_k": tuple(constants), **FUNCTION_GLOBALS}
+
+
+@lru_cache(maxsize=4096)
+def compile_formula(formula: str) -> CompiledFormula:
+    return FormulaCompiler().compile(formula)
@@ -1,6 +1,8 @@
 # DAG construction and topological sort
 from collections import deque
-from typing import Dict, List
+from typing import Dict, Iterable, List, Set
+
+from app.core.metrics import metrics
 
 from .parameter import Parameter
 
@@ -8,10 +10,17 @@ from .parameter import Parameter
 class DependencyGraph:
     def __init__(self, parameters: List[Parameter]):
         self.parameters = parameters
-        self.graph = self.build_graph()
-        self.param_names = {p.name for p in parameters}
 
-        self.validate_graph()
+        with metrics.stage("graph_build"):
+            self.graph = self.build_graph()
+            self.dependants = self.build_reverse_graph()
+            self.param_names = {p.name for p in parameters}
+
+            self.validate_graph()
+
+        if metrics.enabled:
+            metrics.observe("calc_model_size", "parameters", len(self.graph))
+            metrics.observe("calc_model_size", "edges", sum(len(deps) for deps in self.graph.values()))
 
     def build_graph(self) -> Dict[str, List[str]]:
         graph = {}
@@ -22,6 +31,14 @@ class DependencyGraph:
                 graph[param.name] = []
         return graph
 
+    def build_reverse_graph(self) -> Dict[str, List[str]]:
+        dependants: Dict[str, List[str]] = {node: [] for node in self.graph}
+        for node, deps in self.graph.items():
+            for dep in deps:
+                if dep in dependants:
+                    dependants[dep].append(node)
+        return dependants
+
     def validate_graph(self):
         for param_name, deps in self.graph.items():
             for dep in deps:
@@ -29,10 +46,11 @@ class DependencyGraph:
                     raise ValueError(f"Parameter {param_name} depends on undefined parameter '{dep}'")
 
     def topological_sort(self) -> List[str]:
-        in_degree = {node: 0 for node in self.graph}
-        for node, deps in self.graph.items():
-            for dep in deps:
-                in_degree[node] += 1
+        with metrics.stage("graph_sort"):
+            return self._kahn_sort()
+
+    def _kahn_sort(self) -> List[str]:
+        in_degree = {node: len(deps) for node, deps in self.graph.items()}
 
         queue = deque([node for node, degree in in_degree.items() if degree == 0])
         sorted_result = []
@@ -41,13 +59,44 @@ class DependencyGraph:
             node = queue.popleft()
             sorted_result.append(node)
 
-            for dependant in self.graph:
-                if node in self.graph[dependant]:
-                    in_degree[dependant] -= 1
-                    if in_degree[dependant] == 0:
-                        queue.append(dependant)
+            for dependant in self.dependants[node]:
+                in_degree[dependant] -= 1
+                if in_degree[dependant] == 0:
+                    queue.append(dependant)
 
         if len(sorted_result) != len(self.graph):
-            raise ValueError("Cycle detected in parameter dependencies")
+            cycle = self.find_cycle({node for node, degree in in_degree.items() if degree > 0})
+            raise ValueError(f"Cycle detected in parameter dependencies: {' -> '.join(cycle)}")
 
         return sorted_result
+
+    def ancestors(self, targets: Iterable[str], provided: Iterable[str] = ()) -> Set[str]:
+        # Transitive dependency closure of the targets, including the targets themselves.
+        # Provided names are kept but not expanded, since their value doesn't come from their formula.
+        provided = set(provided)
+        closure: Set[str] = set()
+        stack = [target for target in targets if target in self.graph]
+
+        while stack:
+            node = stack.pop()
+            if node in closure:
+                continue
+            closure.add(node)
+            if node not in provided:
+                stack.extend(dep for dep in self.graph[node] if dep not in closure)
+
+        return closure
+
+    def find_cycle(self, unresolved: Set[str]) -> List[str]:
+        # Every unresolved node still waits on an unresolved dependency, so following
+        # those edges from any of them must eventually revisit a node on the path
+        node = next(node for node in self.graph if node in unresolved)
+        path: List[str] = []
+        position: Dict[str, int] = {}
+
+        while node not in position:
+            position[node] = len(path)
+            path.append(node)
+            node = next(dep for dep in self.graph[node] if dep in unresolved)
+
+        return path[position[node] :] + [node]
@@ -0,0 +1,56 @@
+# Functions formulas may call. Time series are 1-D arrays along the model's time axis (the last
+# axis); scalars behave like a series of one.
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+
+def _sum(values):
+    return np.sum(values, axis=-1) if np.ndim(values) else values
+
+
+def _cumsum(values):
+    return np.cumsum(values, axis=-1) if np.ndim(values) else values
+
+
+def _min(values, other=None):
+    # min(series) is the smallest step, min(a, b) the element-wise minimum
+    if other is not None:
+        return np.minimum(values, other)
+    return np.min(values, axis=-1) if np.ndim(values) else values
+
+
+def _max(values, other=None):
+    if other is not None:
+        return np.maximum(values, other)
+    return np.max(values, axis=-1) if np.ndim(values) else values
+
+
+def discount_factors(rate, values) -> np.ndarray:
+    # Step t is discounted over steps 1..t, so a per-step rate series compounds step by step
+    shape = np.shape(values) or (1,)
+    return np.cumprod(np.broadcast_to(1 / (1 + np.asarray(rate, dtype=float)), shape), axis=-1)
+
+
+def _npv(rate, values):
+    # Like a spreadsheet NPV: the first step is already discounted once
+    return np.sum(np.reshape(values, np.shape(values) or (1,)) * discount_factors(rate, values), axis=-1)
+
+
+# name -> (implementation, accepted argument counts)
+FUNCTIONS: Dict[str, Tuple[Callable, Tuple[int, ...]]] = {
+    "sum": (_sum, (1,)),
+    "cumsum": (_cumsum, (1,)),
+    "min": (_min, (1, 2)),
+    "max": (_max, (1, 2)),
+    "npv": (_npv, (2,)),
+}
+
+# Names compiled formulas call the implementations by
+FUNCTION_GLOBALS = {f"_fn_{name}": function for name, (function, _) in FUNCTIONS.items()}
+
+
+def reads_time_axis(name: str, argc: int) -> bool:
+    # Calls that read along the time axis rather than element-wise, so they can't be applied to a
+    # batch axis of scenarios
+    return not (name in ("min", "max") and argc == 2)
@@ -0,0 +1,196 @@
+# Prepared model: parsed parameters plus their evaluation order, reusable across requests
+import hashlib
+import json
+import sys
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.metrics import metrics
+
+from .compiled_model import CompiledModel
+from .compiler import CALL
+from .dependency_graph import DependencyGraph
+from .functions import reads_time_axis
+from .optimizer import ExpressionPlan, build_expression_plan
+from .parameter import Parameter
+from .unit_checker import UnitChecker
+
+
+def model_hash(definitions: List[Dict[str, Any]], check_units: bool = False) -> str:
+    # Content hash independent of parameter order and of key order within a definition. Unit
+    # checked models evaluate differently, so they hash differently.
+    canonical = sorted(json.dumps(definition, sort_keys=True, separators=(",", ":")) for definition in definitions)
+    if check_units:
+        canonical.insert(0, "check_units")
+    return hashlib.sha256("\n".join(canonical).encode()).hexdigest()
+
+
+def estimate_size(obj: Any) -> int:
+    size = 0
+    seen = set()
+    stack = [obj]
+
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+
+    return size
+
+
+class CalculationModel:
+    # Number of distinct target sets whose pruned evaluation plans are kept per model
+    MAX_CACHED_PLANS = 128
+
+    def __init__(
+        self,
+        parameters: List[Parameter],
+        model_id: str = "",
+        check_units: bool = False,
+        units: Optional[Dict[str, Optional[str]]] = None,
+    ):
+        self.model_id = model_id
+        self.parameters = parameters
+        self.param_map = {p.name: p for p in parameters}
+
+        self.graph = DependencyGraph(parameters)
+        self.evaluation_order = self.graph.topological_sort()
+
+        # Length of the time axis set by time series values, and whether anything reads along it
+        # (time series values or calls like sum/npv), which rules out vectorizing over scenarios
+        self.time_steps = self._time_steps()
+        self.time_series = self.time_steps is not None or any(
+            op == CALL and reads_time_axis(*arg)
+            for param in parameters
+            if param.compiled is not None
+            for op, arg in param.compiled.program
+        )
+
+        # With check_units, formulas are dimensionally checked once here and unit conversions
+        # become part of their compiled programs; units maps each parameter to its unit. Models
+        # restored from an artifact pass the units of that check, their formulas already convert.
+        self.check_units = check_units
+        self.units = units
+        if check_units and units is None:
+            formulas, self.units = UnitChecker(self).check()
+            for name, compiled in formulas.items():
+                self.param_map[name].compiled = compiled
+
+        self.compiled = CompiledModel(self)
+
+        self._plans: "OrderedDict[Tuple[FrozenSet[str], FrozenSet[str]], List[str]]" = OrderedDict()
+        self._expression_plans: "OrderedDict[Tuple[FrozenSet[str], FrozenSet[str]], ExpressionPlan]" = OrderedDict()
+        self._plans_lock = Lock()
+
+    @classmethod
+    def from_definitions(cls, definitions: List[Dict[str, Any]], check_units: bool = False) -> "CalculationModel":
+        parameters = [Parameter(definition) for definition in definitions]
+        return cls(parameters, model_hash(definitions, check_units), check_units)
+
+    def definitions(self) -> List[Dict[str, Any]]:
+        # Plain parameter definitions, e.g. for rebuilding the model in another process
+        return [
+            {"name": p.name, "type": p.type, "unit": p.unit, "value": p.value, "formula": p.formula}
+            for p in self.parameters
+        ]
+
+    def _time_steps(self) -> Optional[int]:
+        steps = None
+        for param in self.parameters:
+            if isinstance(param.value, list):
+                if steps is not None and len(param.value) != steps:
+                    raise ValueError(
+                        f"Time series parameter '{param.name}' has {len(param.value)} steps, others have {steps}."
+                    )
+                steps = len(param.value)
+        return steps
+
+    def prepare_inputs(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        # List inputs are time series and become arrays; they must all match the time axis
+        if not any(isinstance(value, list) for value in inputs.values()):
+            return inputs
+
+        steps = self.time_steps
+        prepared = {}
+        for name, value in inputs.items():
+            if isinstance(value, list):
+                if not value:
+                    raise ValueError(f"Time series input '{name}' needs at least one value.")
+                if steps is not None and len(value) != steps:
+                    raise ValueError(f"Time series input '{name}' has {len(value)} steps, the model has {steps}.")
+                steps = len(value)
+                value = np.asarray(value, dtype=float)
+            prepared[name] = value
+        return prepared
+
+    def evaluation_plan(self, targets: List[str], provided: Iterable[str] = ()) -> List[str]:
+        # Evaluation order restricted to the parameters the targets actually depend on. Provided
+        # values that override a calculation cut off everything upstream of it; other inputs
+        # have no dependencies, so they don't need to be part of the cache key.
+        overrides = frozenset(name for name in provided if self.graph.graph.get(name))
+        key = (frozenset(targets), overrides)
+
+        with self._plans_lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                metrics.increment("calc_cache_hits_total", "evaluation_plan")
+                return plan
+
+        metrics.increment("calc_cache_misses_total", "evaluation_plan")
+        closure = self.graph.ancestors(key[0], overrides)
+        plan = [name for name in self.evaluation_order if name in closure]
+
+        with self._plans_lock:
+            self._plans[key] = plan
+            if len(self._plans) > self.MAX_CACHED_PLANS:
+                self._plans.popitem(last=False)
+
+        return plan
+
+    def expression_plan(self, targets: List[str], provided: Iterable[str] = ()) -> ExpressionPlan:
+        # Folded, hash-consed DAG for the targets. Static parameters are folded unless provided,
+        # so every provided name that isn't a plain USER input is part of the cache key.
+        overrides = frozenset(
+            name
+            for name in provided
+            if name in targets or (name in self.param_map and self.param_map[name].type != "USER")
+        )
+        key = (frozenset(targets), overrides)
+
+        with self._plans_lock:
+            plan = self._expression_plans.get(key)
+            if plan is not None:
+                self._expression_plans.move_to_end(key)
+                metrics.increment("calc_cache_hits_total", "expression_plan")
+                return plan
+
+        metrics.increment("calc_cache_misses_total", "expression_plan")
+        with metrics.stage("optimize"):
+            plan = build_expression_plan(self, targets, overrides)
+
+        with self._plans_lock:
+            self._expression_plans[key] = plan
+            if len(self._expression_plans) > self.MAX_CACHED_PLANS:
+                self._expression_plans.popitem(last=False)
+
+        return plan
+
+    def estimated_size(self) -> int:
+        parts = [self.evaluation_order, self.graph.graph]
+        for param in self.parameters:
+            parts.append([param.name, param.type, param.unit, param.value, param.formula, param.dependencies])
+            if param.compiled is not None:
+                parts.append([param.ast, param.compiled.program])
+        return estimate_size(parts)
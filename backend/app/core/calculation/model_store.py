@@ -0,0 +1,395 @@
+# Persistent, versioned parameter sets, each stored with its compiled artifact
+import json
+import re
+import sqlite3
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+from .artifact import dump_model, load_model
+from .model import CalculationModel
+from .unit_calculator import UnitCalculator
+
+_NAME = re.compile(r"[A-Za-z0-9_.-]{1,128}")
+
+
+class VersionConflictError(Exception):
+    # Another process saved the same version of a model first
+    pass
+
+
+class StoredModel:
+    """One saved version of a named model.
+
+    ``model_id`` is the content hash the registry and the calculation endpoints use. Listings may
+    leave ``definitions`` and ``artifact`` out.
+    """
+
+    __slots__ = ("name", "version", "model_id", "check_units", "definitions", "units", "artifact", "created_at")
+
+    def __init__(
+        self,
+        name: str,
+        version: int,
+        model_id: str,
+        check_units: bool,
+        definitions: Optional[List[Dict[str, Any]]],
+        units: Dict[str, Optional[str]],
+        artifact: Optional[bytes],
+        created_at: datetime,
+    ):
+        self.name = name
+        self.version = version
+        self.model_id = model_id
+        self.check_units = check_units
+        self.definitions = definitions
+        self.units = units
+        self.artifact = artifact
+        self.created_at = created_at
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "version": self.version,
+            "model_id": self.model_id,
+            "check_units": self.check_units,
+            "created_at": self.created_at,
+        }
+
+
+class ModelStoreBackend:
+    # Backends whose calls do I/O are run in the threadpool by the API
+    blocking = False
+
+    def insert(self, record: StoredModel):
+        # Raises VersionConflictError if the name already has this version
+        raise NotImplementedError
+
+    def get(self, name: str, version: Optional[int] = None) -> Optional[StoredModel]:
+        # The latest version unless one is given
+        raise NotImplementedError
+
+    def find(self, model_id: str) -> Optional[StoredModel]:
+        # Latest version of any name whose content hashes to model_id
+        raise NotImplementedError
+
+    def versions(self, name: str) -> List[StoredModel]:
+        raise NotImplementedError
+
+    def update_artifact(self, name: str, version: int, artifact: bytes):
+        raise NotImplementedError
+
+    def delete(self, name: str) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class MemoryModelStoreBackend(ModelStoreBackend):
+    """Keeps models for the life of the process, e.g. for tests and single-process development."""
+
+    def __init__(self):
+        self._records: Dict[str, List[StoredModel]] = {}
+        self._lock = Lock()
+
+    def insert(self, record: StoredModel):
+        with self._lock:
+            records = self._records.setdefault(record.name, [])
+            if any(existing.version == record.version for existing in records):
+                raise VersionConflictError(f"Model '{record.name}' already has version {record.version}.")
+            records.append(record)
+            records.sort(key=lambda existing: existing.version)
+
+    def get(self, name: str, version: Optional[int] = None) -> Optional[StoredModel]:
+        with self._lock:
+            records = self._records.get(name, [])
+            if version is None:
+                return records[-1] if records else None
+            return next((record for record in records if record.version == version), None)
+
+    def find(self, model_id: str) -> Optional[StoredModel]:
+        with self._lock:
+            matches = [
+                record for records in self._records.values() for record in records if record.model_id == model_id
+            ]
+            return max(matches, key=lambda record: record.created_at, default=None)
+
+    def versions(self, name: str) -> List[StoredModel]:
+        with self._lock:
+            return list(self._records.get(name, []))
+
+    def update_artifact(self, name: str, version: int, artifact: bytes):
+        record = self.get(name, version)
+        if record is not None:
+            record.artifact = artifact
+
+    def delete(self, name: str) -> int:
+        with self._lock:
+            return len(self._records.pop(name, []))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"models": len(self._records), "versions": sum(len(records) for records in self._records.values())}
+
+
+class SqliteModelStoreBackend(ModelStoreBackend):
+    """Models in a local SQLite database file; needs no server, so it also works offline."""
+
+    blocking = True
+
+    _COLUMNS = "name, version, model_id, check_units, definitions, units, artifact, created_at"
+
+    def __init__(self, path: str):
+        # One connection shared by the threadpool, serialized by the lock
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = Lock()
+        with self._lock, self._connection:
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS models (
+                    name TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    model_id TEXT NOT NULL,
+                    check_units INTEGER NOT NULL,
+                    definitions TEXT NOT NULL,
+                    units TEXT NOT NULL,
+                    artifact BLOB NOT NULL,
+                    created_at TEXT NOT NULL,
+                    PRIMARY KEY (name, version)
+                );
+                CREATE INDEX IF NOT EXISTS models_model_id ON models (model_id);
+                """
+            )
+
+    def _query(self, sql: str, parameters: Tuple = ()) -> List[Tuple]:
+        with self._lock, self._connection:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def _record(self, row: Tuple) -> StoredModel:
+        name, version, model_id, check_units, definitions, units, artifact, created_at = row
+        return StoredModel(
+            name,
+            version,
+            model_id,
+            bool(check_units),
+            None if definitions is None else json.loads(definitions),
+            json.loads(units),
+            artifact,
+            datetime.fromisoformat(created_at),
+        )
+
+    def insert(self, record: StoredModel):
+        try:
+            self._query(
+                f"INSERT INTO models ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record.name,
+                    record.version,
+                    record.model_id,
+                    int(record.check_units),
+                    json.dumps(record.definitions),
+                    json.dumps(record.units),
+                    record.artifact,
+                    record.created_at.isoformat(),
+                ),
+            )
+        except sqlite3.IntegrityError:
+            raise VersionConflictError(f"Model '{record.name}' already has version {record.version}.")
+
+    def get(self, name: str, version: Optional[int] = None) -> Optional[StoredModel]:
+        if version is None:
+            rows = self._query(
+                f"SELECT {self._COLUMNS} FROM models WHERE name = ? ORDER BY version DESC LIMIT 1", (name,)
+            )
+        else:
+            rows = self._query(f"SELECT {self._COLUMNS} FROM models WHERE name = ? AND version = ?", (name, version))
+        return self._record(rows[0]) if rows else None
+
+    def find(self, model_id: str) -> Optional[StoredModel]:
+        rows = self._query(
+            f"SELECT {self._COLUMNS} FROM models WHERE model_id = ? ORDER BY created_at DESC LIMIT 1", (model_id,)
+        )
+        return self._record(rows[0]) if rows else None
+
+    def versions(self, name: str) -> List[StoredModel]:
+        rows = self._query(
+            "SELECT name, version, model_id, check_units, NULL, units, NULL, created_at "
+            "FROM models WHERE name = ? ORDER BY version",
+            (name,),
+        )
+        return [self._record(row) for row in rows]
+
+    def update_artifact(self, name: str, version: int, artifact: bytes):
+        self._query("UPDATE models SET artifact = ? WHERE name = ? AND version = ?", (artifact, name, version))
+
+    def delete(self, name: str) -> int:
+        with self._lock, self._connection:
+            return self._connection.execute("DELETE FROM models WHERE name = ?", (name,)).rowcount
+
+    def stats(self) -> Dict[str, int]:
+        (models, versions), *_ = self._query("SELECT COUNT(DISTINCT name), COUNT(*) FROM models")
+        return {"models": models, "versions": versions}
+
+
+class MongoModelStoreBackend(ModelStoreBackend):
+    """Models in a MongoDB collection, one document per version."""
+
+    blocking = True
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.collection.create_index([("name", 1), ("version", -1)], unique=True)
+        self.collection.create_index("model_id")
+
+    @classmethod
+    def from_url(cls, url: str, database: str, collection: str):
+        # Imported here so the other backends work without a MongoDB driver installed
+        from pymongo import MongoClient
+
+        return cls(MongoClient(url)[database][collection])
+
+    def _record(self, document: Dict[str, Any]) -> StoredModel:
+        return StoredModel(
+            document["name"],
+            document["version"],
+            document["model_id"],
+            document["check_units"],
+            document.get("definitions"),
+            document["units"],
+            document.get("artifact"),
+            document["created_at"].replace(tzinfo=timezone.utc),
+        )
+
+    def insert(self, record: StoredModel):
+        from pymongo.errors import DuplicateKeyError
+
+        document = {"_id": f"{record.name}/{record.version}", **record.metadata()}
+        document.update(definitions=record.definitions, units=record.units, artifact=record.artifact)
+        try:
+            self.collection.insert_one(document)
+        except DuplicateKeyError:
+            raise VersionConflictError(f"Model '{record.name}' already has version {record.version}.")
+
+    def get(self, name: str, version: Optional[int] = None) -> Optional[StoredModel]:
+        if version is None:
+            document = self.collection.find_one({"name": name}, sort=[("version", -1)])
+        else:
+            document = self.collection.find_one({"_id": f"{name}/{version}"})
+        return None if document is None else self._record(document)
+
+    def find(self, model_id: str) -> Optional[StoredModel]:
+        document = self.collection.find_one({"model_id": model_id}, sort=[("created_at", -1)])
+        return None if document is None else self._record(document)
+
+    def versions(self, name: str) -> List[StoredModel]:
+        documents = self.collection.find({"name": name}, {"definitions": 0, "artifact": 0}).sort("version", 1)
+        return [self._record(document) for document in documents]
+
+    def update_artifact(self, name: str, version: int, artifact: bytes):
+        self.collection.update_one({"_id": f"{name}/{version}"}, {"$set": {"artifact": artifact}})
+
+    def delete(self, name: str) -> int:
+        return self.collection.delete_many({"name": name}).deleted_count
+
+    def stats(self) -> Dict[str, int]:
+        return {"versions": self.collection.estimated_document_count()}
+
+
+class ModelStore:
+    """Saves each distinct parameter set of a name as its next version, prepared once on save.
+
+    Saving parses the formulas, builds the dependency graph and resolves (or, with check_units,
+    checks) units, so invalid models are rejected before anything is stored. The compiled
+    artifact is stored next to the definitions, and loading a version only unmarshals it.
+    """
+
+    MAX_SAVE_ATTEMPTS = 3
+
+    def __init__(self, backend: ModelStoreBackend):
+        self.backend = backend
+        self._lock = Lock()
+        self.saves = 0
+        self.loads = 0
+        self.rebuilds = 0
+
+    def save(
+        self, name: str, definitions: List[Dict[str, Any]], check_units: bool = False
+    ) -> Tuple[StoredModel, CalculationModel]:
+        if not _NAME.fullmatch(name):
+            raise ValueError(f"Model name '{name}' may only use letters, digits, '_', '.' and '-'.")
+
+        model = CalculationModel.from_definitions(definitions, check_units)
+        units = model.units if model.units is not None else UnitCalculator.resolve_units(model)
+        artifact = dump_model(model)
+
+        for _ in range(self.MAX_SAVE_ATTEMPTS):
+            latest = self.backend.get(name)
+            if latest is not None and latest.model_id == model.model_id:
+                # Saving the latest version again doesn't create a new one
+                return latest, model
+
+            version = 1 if latest is None else latest.version + 1
+            record = StoredModel(
+                name, version, model.model_id, check_units, definitions, units, artifact, datetime.now(timezone.utc)
+            )
+            try:
+                self.backend.insert(record)
+            except VersionConflictError:
+                continue
+            with self._lock:
+                self.saves += 1
+            return record, model
+
+        raise VersionConflictError(f"Model '{name}' is being saved concurrently, try again.")
+
+    def get(self, name: str, version: Optional[int] = None) -> Optional[StoredModel]:
+        return self.backend.get(name, version)
+
+    def versions(self, name: str) -> List[StoredModel]:
+        return self.backend.versions(name)
+
+    def delete(self, name: str) -> int:
+        return self.backend.delete(name)
+
+    def load(self, record: StoredModel) -> CalculationModel:
+        try:
+            model = load_model(record.artifact)
+            with self._lock:
+                self.loads += 1
+            return model
+        except ValueError:
+            # Artifact of an older release; compile once more and keep the new artifact
+            pass
+
+        model = CalculationModel.from_definitions(record.definitions, record.check_units)
+        self.backend.update_artifact(record.name, record.version, dump_model(model))
+        with self._lock:
+            self.rebuilds += 1
+        return model
+
+    def find(self, model_id: str) -> Optional[CalculationModel]:
+        record = self.backend.find(model_id)
+        return None if record is None else self.load(record)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {"saves": self.saves, "loads": self.loads, "rebuilds": self.rebuilds}
+        return {"backend": type(self.backend).__name__, **counts, **self.backend.stats()}
+
+
+def create_backend() -> ModelStoreBackend:
+    if settings.model_store_backend == "sqlite":
+        return SqliteModelStoreBackend(settings.model_store_sqlite_path)
+    if settings.model_store_backend == "mongo":
+        return MongoModelStoreBackend.from_url(
+            settings.model_store_mongo_url,
+            settings.model_store_mongo_database,
+            settings.model_store_mongo_collection,
+        )
+    return MemoryModelStoreBackend()
+
+
+model_store = ModelStore(create_backend())
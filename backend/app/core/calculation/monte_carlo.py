@@ -0,0 +1,154 @@
+# Monte Carlo uncertainty propagation over a prepared model
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from .batch import BatchCalculator
+from .model import CalculationModel
+
+# Required parameters per distribution; lognormal takes the mean and sigma of the underlying normal
+DISTRIBUTIONS = {
+    "normal": ["mean", "std"],
+    "uniform": ["low", "high"],
+    "triangular": ["low", "mode", "high"],
+    "lognormal": ["mean", "sigma"],
+}
+
+# Model rebuilt once per worker process by the pool initializer
+_worker_model: Optional[CalculationModel] = None
+
+
+def validate_distribution(name: str, spec: Dict[str, Any]):
+    distribution = spec.get("distribution")
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Input '{name}' has unknown distribution '{distribution}'.")
+
+    missing = [field for field in DISTRIBUTIONS[distribution] if spec.get(field) is None]
+    if missing:
+        raise ValueError(f"Input '{name}' with {distribution} distribution requires {', '.join(missing)}.")
+
+    if distribution in ["uniform", "triangular"] and spec["low"] > spec["high"]:
+        raise ValueError(f"Input '{name}' has low > high.")
+    if distribution == "triangular" and not spec["low"] <= spec["mode"] <= spec["high"]:
+        raise ValueError(f"Input '{name}' has a mode outside [low, high].")
+    if (spec.get("std") or 0) < 0 or (spec.get("sigma") or 0) < 0:
+        raise ValueError(f"Input '{name}' has a negative spread.")
+
+
+def sample_distribution(rng: np.random.Generator, spec: Dict[str, Any], size: int) -> np.ndarray:
+    distribution = spec["distribution"]
+
+    if distribution == "normal":
+        return rng.normal(spec["mean"], spec["std"], size)
+    elif distribution == "uniform":
+        return rng.uniform(spec["low"], spec["high"], size)
+    elif distribution == "triangular":
+        if spec["low"] == spec["high"]:
+            return np.full(size, float(spec["low"]))
+        return rng.triangular(spec["low"], spec["mode"], spec["high"], size)
+    else:
+        return rng.lognormal(spec["mean"], spec["sigma"], size)
+
+
+def simulate_chunk(
+    model: CalculationModel,
+    inputs: Dict[str, Union[float, Dict[str, Any]]],
+    targets: List[str],
+    size: int,
+    seed: np.random.SeedSequence,
+) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+
+    # Sample in sorted name order so a seed maps to the same draws regardless of request key order
+    columns: Dict[str, Any] = {}
+    for name in sorted(inputs):
+        value = inputs[name]
+        columns[name] = sample_distribution(rng, value, size) if isinstance(value, dict) else value
+
+    calculator = BatchCalculator(model.parameters, columns, model=model, size=size)
+    return np.vstack(calculator.evaluate_arrays(targets))
+
+
+def _init_worker(definitions: List[Dict[str, Any]], check_units: bool = False):
+    global _worker_model
+    _worker_model = CalculationModel.from_definitions(definitions, check_units)
+
+
+def _simulate_in_worker(inputs, targets, size, seed) -> np.ndarray:
+    assert _worker_model is not None
+    return simulate_chunk(_worker_model, inputs, targets, size, seed)
+
+
+class MonteCarloSimulator:
+    def __init__(
+        self,
+        model: CalculationModel,
+        inputs: Dict[str, Union[float, Dict[str, Any]]],
+        targets: List[str],
+        samples: int,
+        seed: Optional[int] = None,
+        chunk_size: int = 10_000,
+        workers: int = 1,
+    ):
+        for name, value in inputs.items():
+            if isinstance(value, dict):
+                validate_distribution(name, value)
+
+        self.model = model
+        self.inputs = inputs
+        self.targets = targets
+        self.samples = samples
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.workers = workers
+
+    def run(self, percentiles: List[float]) -> Dict[str, Any]:
+        start = time.perf_counter()
+
+        # One independent RNG stream per chunk, so results only depend on seed and chunk size,
+        # not on how many workers the chunks were spread across
+        sizes = [min(self.chunk_size, self.samples - offset) for offset in range(0, self.samples, self.chunk_size)]
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sizes))
+
+        if self.workers > 1 and len(sizes) > 1:
+            with ProcessPoolExecutor(
+                max_workers=min(self.workers, len(sizes)),
+                initializer=_init_worker,
+                initargs=(self.model.definitions(), self.model.check_units),
+            ) as pool:
+                chunks = list(
+                    pool.map(
+                        _simulate_in_worker,
+                        [self.inputs] * len(sizes),
+                        [self.targets] * len(sizes),
+                        sizes,
+                        seeds,
+                    )
+                )
+        else:
+            chunks = [
+                simulate_chunk(self.model, self.inputs, self.targets, size, seed) for size, seed in zip(sizes, seeds)
+            ]
+
+        values = np.hstack(chunks) if chunks else np.empty((len(self.targets), 0))
+
+        results = {}
+        for target, column in zip(self.targets, values):
+            finite = column[np.isfinite(column)]
+            results[target] = {
+                "mean": float(finite.mean()) if finite.size else None,
+                "std": float(finite.std()) if finite.size else None,
+                "percentiles": {
+                    f"p{percentile:g}": (float(np.percentile(finite, percentile)) if finite.size else None)
+                    for percentile in percentiles
+                },
+                "invalid": int(column.size - finite.size),
+            }
+
+        return {
+            "results": results,
+            "samples": self.samples,
+            "elapsed_ms": (time.perf_counter() - start) * 1000,
+        }
@@ -0,0 +1,155 @@
+# Process pool for evaluating large models outside the event loop's threadpool and the GIL
+import asyncio
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+from .calculator import Calculator
+from .model import CalculationModel, model_hash
+
+# Models rebuilt in this worker process, by model id
+_worker_models: "OrderedDict[str, CalculationModel]" = OrderedDict()
+_worker_max_models = 32
+
+
+class PoolSaturatedError(RuntimeError):
+    pass
+
+
+class ModelNotLoadedError(Exception):
+    # Raised in a worker asked to evaluate a model it hasn't been sent yet
+    pass
+
+
+def _init_worker(max_models: int):
+    global _worker_max_models
+    _worker_max_models = max_models
+
+
+def _evaluate_in_worker(
+    model_id: str,
+    definitions: Optional[List[Dict[str, Any]]],
+    inputs: Dict[str, float],
+    targets: List[str],
+    check_units: bool = False,
+) -> Dict[str, List[float]]:
+    model = _worker_models.get(model_id)
+    if model is None:
+        if definitions is None:
+            raise ModelNotLoadedError(model_id)
+        model = CalculationModel.from_definitions(definitions, check_units)
+        _worker_models[model_id] = model
+        if len(_worker_models) > _worker_max_models:
+            _worker_models.popitem(last=False)
+    else:
+        _worker_models.move_to_end(model_id)
+
+    return Calculator(model.parameters, inputs, model=model, optimize=True).evaluate(targets)
+
+
+class EvaluationPool:
+    def __init__(self, max_workers: int, max_queue: int, min_parameters: int, worker_max_models: int = 32):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.min_parameters = min_parameters
+        self.worker_max_models = worker_max_models
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Ids of models whose definitions have been sent to at least one worker
+        self._shipped: set = set()
+        self._pending = 0
+        self._lock = Lock()
+
+    def should_offload(self, parameter_count: int) -> bool:
+        return self.max_workers > 0 and parameter_count >= self.min_parameters
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Workers are spawned rather than forked from a server process with live threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.worker_max_models,),
+                )
+            return self._executor
+
+    async def evaluate(
+        self, model: CalculationModel, inputs: Dict[str, float], targets: List[str]
+    ) -> Dict[str, List[float]]:
+        model_id = model.model_id or model_hash(model.definitions(), model.check_units)
+        return await self._dispatch(model_id, model.definitions, inputs, targets, model.check_units)
+
+    async def evaluate_definitions(
+        self, definitions: List[Dict[str, Any]], inputs: Dict[str, float], targets: List[str]
+    ) -> Dict[str, List[float]]:
+        # Unregistered models are parsed in the worker only, but still cached there by content hash
+        return await self._dispatch(model_hash(definitions), lambda: definitions, inputs, targets)
+
+    async def _dispatch(
+        self,
+        model_id: str,
+        get_definitions: Callable[[], List[Dict[str, Any]]],
+        inputs: Dict[str, float],
+        targets: List[str],
+        check_units: bool = False,
+    ) -> Dict[str, List[float]]:
+        # Fail fast instead of queueing behind work that already saturates the pool
+        with self._lock:
+            if self._pending >= self.max_queue:
+                raise PoolSaturatedError(f"Evaluation pool is saturated ({self._pending} evaluations pending).")
+            self._pending += 1
+
+        try:
+            # Models are sent by id only once any worker has them; a worker that doesn't asks again
+            definitions = None if model_id in self._shipped else get_definitions()
+            try:
+                result = await self._submit(model_id, definitions, inputs, targets, check_units)
+            except ModelNotLoadedError:
+                result = await self._submit(model_id, get_definitions(), inputs, targets, check_units)
+            self._shipped.add(model_id)
+            return result
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def _submit(self, model_id, definitions, inputs, targets, check_units=False) -> Dict[str, List[float]]:
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                executor, _evaluate_in_worker, model_id, definitions, inputs, targets, check_units
+            )
+        except BrokenProcessPool:
+            # A crashed worker breaks the whole pool; start a fresh one for the next request
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+                    self._shipped.clear()
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise PoolSaturatedError("Evaluation pool restarted after a worker failure.")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"pending": self._pending, "max_queue": self.max_queue, "workers": self.max_workers}
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._shipped.clear()
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+evaluation_pool = EvaluationPool(
+    max_workers=settings.offload_max_workers,
+    max_queue=settings.offload_max_queue,
+    min_parameters=settings.offload_min_parameters,
+    worker_max_models=settings.offload_worker_max_models,
+)
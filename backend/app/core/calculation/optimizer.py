@@ -0,0 +1,201 @@
+# Cross-formula constant folding and common-subexpression elimination
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from .compiler import BINARY_OPERATORS, CALL, CONST, UNARY_OPERATORS, VAR
+from .functions import FUNCTION_GLOBALS
+
+if TYPE_CHECKING:
+    from .model import CalculationModel
+
+# Node reading a value from the per-run context
+INPUT = "input"
+# Node holding a static time series; its argument indexes the plan's series
+SERIES = "series"
+
+# Operand order doesn't change the IEEE result, so these are hash-consed with sorted operands
+COMMUTATIVE = {"Add", "Multiply"}
+
+
+class ExpressionPlan:
+    """The formulas behind a set of targets merged into one DAG of shared nodes.
+
+    Nodes are ``(op, arg)`` in evaluation order: ``(CONST, value)``, ``(INPUT, name)``,
+    ``(SERIES, index)``, ``(CALL, (function, operand node indices))`` or an operator with a tuple
+    of operand node indices. Static parameters are folded into constants unless the run provides
+    them, so a plan is only valid for the provided names it was built for.
+    """
+
+    def __init__(
+        self,
+        nodes: List[Tuple[str, Any]],
+        outputs: Dict[str, int],
+        stats: Dict[str, int],
+        series: Sequence[np.ndarray] = (),
+    ):
+        self.nodes = nodes
+        self.outputs = outputs
+        self.stats = stats
+        self.series = tuple(series)
+
+        # Distinct output nodes, in the order the generated function returns them
+        self.returned = sorted(set(outputs.values()))
+        self.source, self.constants = self._generate_source()
+        namespace: Dict[str, Any] = {}
+        exec(compile(self.source, "<plan>", "exec"), {"__builtins__": {}, **FUNCTION_GLOBALS}, namespace)
+        self.function = namespace["_plan"]
+
+    def evaluate(self, context: Dict[str, Any], targets: Sequence[str], constant=float) -> List[Any]:
+        # Every shared node runs exactly once. constant wraps the folded values, e.g. numpy.float64
+        # so that a batch dividing by zero yields inf instead of raising.
+        constants = tuple(constant(k) for k in self.constants)
+        values = dict(zip(self.returned, self.function(context, constants, self.series)))
+
+        results = []
+        for target in targets:
+            if target not in self.outputs:
+                raise ValueError(f"Target '{target}' was not resolved.")
+            results.append(values[self.outputs[target]])
+        return results
+
+    def _generate_source(self) -> Tuple[str, List[float]]:
+        # Straight-line code with one assignment per node, so there is no nesting depth limit
+        constants: List[float] = []
+        lines = ["def _plan(_ctx, _k, _a):"]
+
+        for index, (op, arg) in enumerate(self.nodes):
+            if op == CONST:
+                lines.append(f"    v{index} = _k[{len(constants)}]")
+                constants.append(arg)
+            elif op == INPUT:
+                lines.append(f"    v{index} = _ctx[{arg!r}]")
+            elif op == SERIES:
+                lines.append(f"    v{index} = _a[{arg}]")
+            elif op == CALL:
+                name, operands = arg
+                lines.append(f"    v{index} = _fn_{name}({', '.join(f'v{operand}' for operand in operands)})")
+            elif op in UNARY_OPERATORS:
+                lines.append(f"    v{index} = {UNARY_OPERATORS[op]}v{arg[0]}")
+            else:
+                lines.append(f"    v{index} = v{arg[0]} {BINARY_OPERATORS[op]} v{arg[1]}")
+
+        lines.append(f"    return ({''.join(f'v{node}, ' for node in self.returned)})")
+        return "\n".join(lines), constants
+
+
+class ExpressionBuilder:
+    def __init__(self):
+        self.nodes: List[Tuple[str, Any]] = []
+        self._index: Dict[Tuple[str, Any], int] = {}
+        self.folded = 0
+        self.shared = 0
+
+    def add(self, op: str, arg: Any) -> int:
+        if op in BINARY_OPERATORS or op in UNARY_OPERATORS:
+            operands = [self.nodes[index] for index in arg]
+            if all(operand[0] == CONST for operand in operands):
+                value = _fold(op, [operand[1] for operand in operands])
+                if value is not None:
+                    self.folded += 1
+                    return self.add(CONST, value)
+            if op in COMMUTATIVE:
+                arg = tuple(sorted(arg))
+
+        node = (op, arg)
+        # float.hex keeps 0.0 and -0.0 apart, which compare equal but divide differently
+        key = (op, arg.hex()) if op == CONST else node
+        index = self._index.get(key)
+        if index is not None:
+            if op not in (CONST, INPUT, SERIES):
+                self.shared += 1
+            return index
+
+        self.nodes.append(node)
+        self._index[key] = len(self.nodes) - 1
+        return len(self.nodes) - 1
+
+
+def build_expression_plan(model: "CalculationModel", targets: List[str], provided: Iterable[str]) -> ExpressionPlan:
+    provided = set(provided)
+    builder = ExpressionBuilder()
+    series: List[np.ndarray] = []
+    param_nodes: Dict[str, int] = {}
+    source_nodes = 0
+    formulas = 0
+
+    for name in model.evaluation_plan(targets, provided):
+        param = model.param_map[name]
+
+        if name in provided or param.type == "USER":
+            param_nodes[name] = builder.add(INPUT, name)
+        elif param.type == "CALCULATION":
+            stack: List[int] = []
+            for op, arg in param.compiled.program:
+                if op == CONST:
+                    stack.append(builder.add(CONST, arg))
+                elif op == VAR:
+                    stack.append(param_nodes[arg])
+                elif op in UNARY_OPERATORS:
+                    stack.append(builder.add(op, (stack.pop(),)))
+                elif op == CALL:
+                    function, argc = arg
+                    operands = tuple(stack[len(stack) - argc :])
+                    del stack[len(stack) - argc :]
+                    stack.append(builder.add(CALL, (function, operands)))
+                else:
+                    right = stack.pop()
+                    left = stack.pop()
+                    stack.append(builder.add(op, (left, right)))
+            param_nodes[name] = stack.pop()
+            source_nodes += len(param.compiled.program)
+            formulas += 1
+        else:
+            value = param.compute_value({})
+            if value is None:
+                raise ValueError(f"Parameter '{name}' could not be resolved.")
+            if isinstance(value, np.ndarray):
+                series.append(value)
+                param_nodes[name] = builder.add(SERIES, len(series) - 1)
+            else:
+                param_nodes[name] = builder.add(CONST, float(value))
+
+    # Targets that are only run inputs, not model parameters, are passed through
+    for target in targets:
+        if target not in param_nodes and target in provided:
+            param_nodes[target] = builder.add(INPUT, target)
+
+    outputs = {target: param_nodes[target] for target in targets if target in param_nodes}
+    stats = {
+        "formulas": formulas,
+        "source_nodes": source_nodes,
+        "nodes": len(builder.nodes),
+        "eliminated": max(0, source_nodes - len(builder.nodes)),
+        "folded": builder.folded,
+        "shared": builder.shared,
+    }
+    return ExpressionPlan(builder.nodes, outputs, stats, series)
+
+
+def _fold(op: str, operands: List[float]):
+    # Constant subtrees are computed once at build time; anything that would raise or leave the
+    # reals (e.g. a division by zero) is left to fail or produce inf at run time as before
+    try:
+        if op == "Unary_USub":
+            value = -operands[0]
+        elif op == "Unary_UAdd":
+            value = operands[0]
+        elif op == "Add":
+            value = operands[0] + operands[1]
+        elif op == "Subtract":
+            value = operands[0] - operands[1]
+        elif op == "Multiply":
+            value = operands[0] * operands[1]
+        elif op == "Divide":
+            value = operands[0] / operands[1]
+        else:
+            value = operands[0] ** operands[1]
+    except (ArithmeticError, ValueError):
+        return None
+
+    return value if isinstance(value, float) else None
@@ -1,110 +1,75 @@
 # Parameter model
-from .parser import FormulaParser
+import numpy as np
+
+from .compiler import compile_formula
 
 
 class Parameter:
-    def __init__(self, data: dict):
+    # Definition only: values live in each run's own context or buffer, so one parsed
+    # parameter can be shared by concurrent requests
+    __slots__ = ("name", "type", "unit", "value", "formula", "dependencies", "ast", "compiled")
+
+    def __init__(self, data: dict, compiled=None):
         self.name = data["name"]
         self.type = data["type"]  # COMPANY/USER/CALCULATION/GLOBAL
         self.unit = data.get("unit", "")
-        self.value = data.get("value")  # For static parameters only (GLOBAL/COMPANY)
+        # For static parameters only (GLOBAL/COMPANY); a list is a time series, one value per step
+        self.value = data.get("value")
         self.formula = data.get("formula")  # For CALCULATION parameters only
         self.dependencies = []
 
-        # Runtime states
         self.ast = None
-        self.evaluated = False
-        self.result = None
-        self.unit_resolved = False
+        # A formula compiled earlier (see artifact.py) skips compiling it again
+        self.compiled = compiled
 
         self.validate()
 
     def validate(self):
         if self.type in ["COMPANY", "GLOBAL"] and self.value is None:
             raise ValueError(f"{self.type} parameter '{self.name}' requires value")
+        if isinstance(self.value, list) and not self.value:
+            raise ValueError(f"Time series parameter '{self.name}' needs at least one value")
 
         if self.type == "CALCULATION":
             if not self.formula:
                 raise ValueError(f"{self.type} parameter '{self.name}' requires formula")
-            self.ast, variables = FormulaParser().parse_formula_to_ast(self.formula)
-            self.dependencies = list(variables)
+            if self.compiled is None:
+                self.compiled = compile_formula(self.formula)
+            self.ast = self.compiled.ast
+            self.dependencies = list(self.compiled.variables)
 
     def resolve_unit(self, context: dict[str, "Parameter"]):
-        if self.unit_resolved:
-            return self.unit
-
-        if self.type in ["COMPANY", "GLOBAL", "USER"]:
-            pass
-
-        elif self.type == "CALCULATION":
+        # Records the inferred unit on this definition; shared models use UnitCalculator.resolve_units
+        if self.type == "CALCULATION":
             from .unit_calculator import UnitCalculator
 
-            self.unit = UnitCalculator.calculate_unit(self.ast, context)
+            units = {name: param.unit for name, param in context.items()}
+            self.unit = UnitCalculator.calculate_program_unit(tuple(self.compiled.program), units)
 
-        self.unit_resolved = True
         return self.unit
 
-    def resolve_value(self, context: dict[str, float]):
-        if self.evaluated:
-            return self.result
-
+    def compute_value(self, context: dict[str, float]):
+        # Stateless, safe to call against any context
         if self.type in ["COMPANY", "GLOBAL"]:
             if isinstance(self.value, str):
                 try:
-                    self.result = float(self.value)
+                    return float(self.value)
                 except ValueError:
                     raise ValueError(f"Parameter '{self.name}' has invalid numeric value: {self.value}")
-            else:
-                self.result = self.value
+            if isinstance(self.value, list):
+                return np.asarray(self.value, dtype=float)
+            return self.value
 
         elif self.type == "USER":
-            self.result = context[self.name]
+            return context[self.name]
 
         elif self.type == "CALCULATION":
-            self.result = self.evaluate_formula(context)
+            return self.evaluate_formula(context)
 
-        self.evaluated = True
-        return self.result
+        return None
 
     def evaluate_formula(self, context: dict[str, float]) -> float:
         if not self.formula:
             raise ValueError(f"No formula available for parameter {self.name}")
 
-        return self._evaluate_ast(self.ast, context)
-
-    def _evaluate_ast(self, node, context: dict[str, float]) -> float:
-        if isinstance(node, (float, int)):
-            return float(node)
-
-        if isinstance(node, str):
-            if node in context:
-                return context[node]
-            raise ValueError(f"Variable '{node}' not found in context.")
-
-        if isinstance(node, dict):
-            return self._evaluate_operation(node, context)
-
-        raise ValueError(f"Unsupported AST node structure: {node}")
-
-    def _evaluate_operation(self, node, context: dict[str, float]) -> float:
-        op_type = node["type"]
-
-        if op_type == "Add":
-            return self._evaluate_ast(node["left"], context) + self._evaluate_ast(node["right"], context)
-
-        elif op_type == "Subtract":
-            return self._evaluate_ast(node["left"], context) - self._evaluate_ast(node["right"], context)
-
-        elif op_type == "Multiply":
-            return self._evaluate_ast(node["left"], context) * self._evaluate_ast(node["right"], context)
-
-        elif op_type == "Divide":
-            return self._evaluate_ast(node["left"], context) / self._evaluate_ast(node["right"], context)
-
-        elif op_type == "Power":
-            return self._evaluate_ast(node["left"], context) ** self._evaluate_ast(node["right"], context)
-
-        elif op_type.startswith("Unary"):
-            return -self._evaluate_ast(node["operand"], context)
-
-        raise ValueError(f"Unsupported AST node structure: {node}")
+        return self.compiled(context)
@@ -1,5 +1,9 @@
 import ast
-from typing import Any, Dict, Optional, Set, Tuple, Union
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from app.core.metrics import metrics
+
+from .functions import FUNCTIONS
 
 
 class FormulaParser:
@@ -13,53 +17,97 @@ class FormulaParser:
         }
 
     def parse_formula_to_ast(self, formula: str) -> Tuple[Union[Dict[str, Any], str, int, float], Set[str]]:
-        try:
-            expr_ast = ast.parse(formula, mode="eval")
-            root_node = expr_ast.body
+        with metrics.stage("parse"):
+            try:
+                expr_ast = ast.parse(formula, mode="eval")
+                root_node = expr_ast.body
 
-            custom_ast = self._build_ast(root_node)
-            dependencies = self._extract_variables(root_node)
+                custom_ast = self._build_ast(root_node)
+                dependencies = self._extract_variables(root_node)
 
-            return custom_ast, dependencies
-        except Exception as e:
-            raise ValueError(f"Error parsing formula: {e}")
+                return custom_ast, dependencies
+            except Exception as e:
+                raise ValueError(f"Error parsing formula: {e}")
 
     def _build_ast(self, node: ast.AST) -> Union[Dict[str, Any], str, int, float]:
-        if isinstance(node, ast.BinOp):
-            return {
-                "type": self.ops[type(node.op)],
-                "left": self._build_ast(node.left),
-                "right": self._build_ast(node.right),
-            }
-
-        elif isinstance(node, ast.UnaryOp):
-            return {
-                "type": f"Unary_{type(node.op).__name__}",
-                "operand": self._build_ast(node.operand),
-            }
-
-        elif isinstance(node, ast.Constant) and isinstance(node.value, (float, int)):
-            return node.value
-
-        elif isinstance(node, ast.Name):
-            return node.id
-
-        else:
-            raise ValueError(f"Unsupported node type: {type(node).__name__}")
+        # Post-order walk with an explicit stack so deeply nested formulas don't hit the recursion limit
+        results: List[Union[Dict[str, Any], str, int, float]] = []
+        stack: List[Tuple[ast.AST, bool]] = [(node, False)]
+
+        while stack:
+            current, children_built = stack.pop()
+
+            if isinstance(current, ast.BinOp):
+                if children_built:
+                    right = results.pop()
+                    left = results.pop()
+                    results.append({"type": self.ops[type(current.op)], "left": left, "right": right})
+                else:
+                    stack.append((current, True))
+                    stack.append((current.right, False))
+                    stack.append((current.left, False))
+
+            elif isinstance(current, ast.UnaryOp):
+                if children_built:
+                    results.append({"type": f"Unary_{type(current.op).__name__}", "operand": results.pop()})
+                else:
+                    stack.append((current, True))
+                    stack.append((current.operand, False))
+
+            elif isinstance(current, ast.Call):
+                if children_built:
+                    args = results[len(results) - len(current.args) :]
+                    del results[len(results) - len(current.args) :]
+                    results.append({"type": "Call", "function": current.func.id, "args": args})
+                else:
+                    self._check_call(current)
+                    stack.append((current, True))
+                    stack.extend((arg, False) for arg in reversed(current.args))
+
+            elif isinstance(current, ast.Constant) and isinstance(current.value, (float, int)):
+                results.append(current.value)
+
+            elif isinstance(current, ast.Name):
+                results.append(current.id)
+
+            else:
+                raise ValueError(f"Unsupported node type: {type(current).__name__}")
+
+        return results.pop()
+
+    def _check_call(self, node: ast.Call):
+        # Only whitelisted functions, called by name with positional arguments
+        name = node.func.id if isinstance(node.func, ast.Name) else None
+        if name not in FUNCTIONS:
+            raise ValueError(f"Unsupported function: {name or type(node.func).__name__}")
+        if node.keywords or any(isinstance(arg, ast.Starred) for arg in node.args):
+            raise ValueError(f"{name}() only takes positional arguments")
+        if len(node.args) not in FUNCTIONS[name][1]:
+            counts = " or ".join(str(count) for count in FUNCTIONS[name][1])
+            plural = "" if counts == "1" else "s"
+            raise ValueError(f"{name}() takes {counts} argument{plural}, got {len(node.args)}")
 
     def _extract_variables(self, node: ast.AST, vars_set: Optional[Set[str]] = None) -> Set[str]:
         if vars_set is None:
             vars_set = set()
 
-        if isinstance(node, ast.BinOp):
-            self._extract_variables(node.left, vars_set)
-            self._extract_variables(node.right, vars_set)
+        stack = [node]
+        while stack:
+            current = stack.pop()
+
+            if isinstance(current, ast.BinOp):
+                stack.append(current.left)
+                stack.append(current.right)
+
+            elif isinstance(current, ast.UnaryOp):
+                stack.append(current.operand)
 
-        elif isinstance(node, ast.UnaryOp):
-            self._extract_variables(node.operand, vars_set)
+            elif isinstance(current, ast.Call):
+                # The function name itself isn't a variable
+                stack.extend(current.args)
 
-        elif isinstance(node, ast.Name):
-            vars_set.add(node.id)
+            elif isinstance(current, ast.Name):
+                vars_set.add(current.id)
 
         return vars_set
 
@@ -0,0 +1,150 @@
+# Bounded LRU registry of prepared models, keyed by content hash
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+from .model import CalculationModel, model_hash
+from .shared_store import SharedModelStore, Stamp, default_path
+
+
+class ModelTooLargeError(ValueError):
+    pass
+
+
+class ModelRegistry:
+    def __init__(self, max_models: int, max_bytes: int, store: Optional[SharedModelStore] = None):
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        # With a shared store, models prepared by one worker process are loaded by the others
+        # instead of being compiled again, and removing one removes it from every worker
+        self.store = store
+
+        self._models: "OrderedDict[str, CalculationModel]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        # Stamp of the shared artifact each local model corresponds to
+        self._stamps: Dict[str, Stamp] = {}
+        self._lock = Lock()
+
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def register(self, definitions: List[Dict[str, Any]], check_units: bool = False) -> CalculationModel:
+        model_id = model_hash(definitions, check_units)
+
+        with self._lock:
+            if model_id in self._models:
+                self._models.move_to_end(model_id)
+                return self._models[model_id]
+
+        loaded = self.store.load(model_id) if self.store is not None else None
+        if loaded is None:
+            return self.add(CalculationModel.from_definitions(definitions, check_units))
+
+        model, stamp = loaded
+        return self._add(model, self._checked_size(model), stamp)
+
+    def add(self, model: CalculationModel) -> CalculationModel:
+        # Registers a model prepared elsewhere, e.g. loaded from the model store
+        with self._lock:
+            if model.model_id in self._models:
+                self._models.move_to_end(model.model_id)
+                return self._models[model.model_id]
+
+        size = self._checked_size(model)
+        stamp = self.store.publish(model) if self.store is not None else None
+        return self._add(model, size, stamp)
+
+    def _checked_size(self, model: CalculationModel) -> int:
+        size = model.estimated_size()
+        if size > self.max_bytes:
+            raise ModelTooLargeError(f"Model of ~{size} bytes exceeds the registry limit of {self.max_bytes} bytes.")
+        return size
+
+    def get(self, model_id: str) -> Optional[CalculationModel]:
+        with self._lock:
+            model = self._models.get(model_id)
+            stamp = self._stamps.get(model_id)
+
+        if model is not None and self.store is not None and self.store.stamp(model_id) != stamp:
+            # Removed or replaced by another worker since this one loaded it
+            self.remove(model_id, shared=False)
+            model = None
+
+        if model is None and self.store is not None:
+            loaded = self.store.load(model_id)
+            if loaded is not None:
+                model = self._add(loaded[0], loaded[0].estimated_size(), loaded[1])
+
+        with self._lock:
+            if model is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            if model_id in self._models:
+                self._models.move_to_end(model_id)
+            return model
+
+    def _add(self, model: CalculationModel, size: int, stamp: Optional[Stamp]) -> CalculationModel:
+        with self._lock:
+            model_id = model.model_id
+            if model_id not in self._models:
+                self._models[model_id] = model
+                self._sizes[model_id] = size
+                if stamp is not None:
+                    self._stamps[model_id] = stamp
+                self.total_bytes += size
+                self._evict()
+            return self._models.get(model_id, model)
+
+    def remove(self, model_id: str, shared: bool = True) -> bool:
+        removed = shared and self.store is not None and self.store.remove(model_id)
+        with self._lock:
+            if model_id not in self._models:
+                return removed
+            del self._models[model_id]
+            self.total_bytes -= self._sizes.pop(model_id)
+            self._stamps.pop(model_id, None)
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._sizes.clear()
+            self._stamps.clear()
+            self.total_bytes = 0
+
+    def _evict(self):
+        while len(self._models) > self.max_models or self.total_bytes > self.max_bytes:
+            model_id, _ = self._models.popitem(last=False)
+            self.total_bytes -= self._sizes.pop(model_id)
+            self._stamps.pop(model_id, None)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "models": len(self._models),
+                "bytes": self.total_bytes,
+                "max_models": self.max_models,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                **(self.store.stats() if self.store is not None else {}),
+            }
+
+
+model_registry = ModelRegistry(
+    max_models=settings.registry_max_models,
+    max_bytes=settings.registry_max_bytes,
+    store=(
+        SharedModelStore(settings.shared_store_path or default_path(), settings.shared_store_max_bytes)
+        if settings.shared_store_enabled
+        else None
+    ),
+)
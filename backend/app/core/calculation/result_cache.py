@@ -0,0 +1,202 @@
+# Cache of calculation results keyed by model hash, inputs and targets
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+from .model import estimate_size
+
+
+def result_key(model_id: str, inputs: Dict[str, float], targets: List[str]) -> str:
+    # Input order doesn't matter, target order does since results are returned in that order
+    canonical = json.dumps({"model": model_id, "inputs": inputs, "targets": targets}, sort_keys=True)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class CacheBackend:
+    # Backends whose calls do I/O are run in the threadpool by the API
+    blocking = False
+
+    def get(self, key: str) -> Optional[List[float]]:
+        raise NotImplementedError
+
+    def set(self, key: str, result: List[float]):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class MemoryCacheBackend(CacheBackend):
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        ttl_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+
+        # key -> (result, size, expires_at)
+        self._entries: "OrderedDict[str, Tuple[List[float], int, Optional[float]]]" = OrderedDict()
+        self._lock = Lock()
+        self.total_bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            result, size, expires_at = entry
+            if expires_at is not None and expires_at <= self.clock():
+                self._drop(key)
+                self.expirations += 1
+                return None
+
+            self._entries.move_to_end(key)
+            return result
+
+    def set(self, key: str, result: List[float]):
+        size = estimate_size([key, result])
+        if size > self.max_bytes:
+            return
+
+        expires_at = self.clock() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (result, size, expires_at)
+            self.total_bytes += size
+
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self.total_bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class MongoCacheBackend(CacheBackend):
+    """Cache shared between server processes, stored in a MongoDB collection.
+
+    Expired documents are removed by a TTL index on ``expires_at``; reads also check it, since
+    MongoDB only purges expired documents about once a minute.
+    """
+
+    blocking = True
+
+    def __init__(self, collection, ttl_seconds: Optional[float] = None):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    @classmethod
+    def from_url(cls, url: str, database: str, collection: str, ttl_seconds: Optional[float] = None):
+        # Imported here so the in-memory backend works without a MongoDB driver installed
+        from pymongo import MongoClient
+
+        return cls(MongoClient(url)[database][collection], ttl_seconds)
+
+    def get(self, key: str) -> Optional[List[float]]:
+        document = self.collection.find_one({"_id": key})
+        if document is None:
+            return None
+        expires_at = document.get("expires_at")
+        if expires_at is not None and expires_at.replace(tzinfo=timezone.utc) <= datetime.now(timezone.utc):
+            return None
+        return document["result"]
+
+    def set(self, key: str, result: List[float]):
+        document: Dict[str, Any] = {"_id": key, "result": result}
+        if self.ttl_seconds:
+            document["expires_at"] = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        self.collection.replace_one({"_id": key}, document, upsert=True)
+
+    def clear(self):
+        self.collection.delete_many({})
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": self.collection.estimated_document_count()}
+
+
+class ResultCache:
+    def __init__(self, backend: CacheBackend, enabled: bool = False):
+        self.backend = backend
+        self.enabled = enabled
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model_id: str, inputs: Dict[str, float], targets: List[str]) -> Optional[List[float]]:
+        result = self.backend.get(result_key(model_id, inputs, targets))
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def set(self, model_id: str, inputs: Dict[str, float], targets: List[str], result: List[float]):
+        self.backend.set(result_key(model_id, inputs, targets), result)
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "hits": hits,
+            "misses": misses,
+            **self.backend.stats(),
+        }
+
+
+def create_backend() -> CacheBackend:
+    ttl = settings.result_cache_ttl_seconds or None
+    # Only connect to MongoDB when the cache is actually turned on
+    if settings.result_cache_enabled and settings.result_cache_backend == "mongo":
+        return MongoCacheBackend.from_url(
+            settings.result_cache_mongo_url,
+            settings.result_cache_mongo_database,
+            settings.result_cache_mongo_collection,
+            ttl,
+        )
+    return MemoryCacheBackend(settings.result_cache_max_entries, settings.result_cache_max_bytes, ttl)
+
+
+result_cache = ResultCache(create_backend(), enabled=settings.result_cache_enabled)
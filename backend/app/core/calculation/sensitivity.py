@@ -0,0 +1,239 @@
+# Reverse-mode derivatives of targets with respect to inputs
+import math
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from .calculator import to_results
+from .compiler import CALL, CONST, VAR
+from .functions import FUNCTIONS, discount_factors
+from .model import CalculationModel
+
+# Tape entry: (op, child node indices, value, variable name for VAR nodes or (function, argc) for CALL).
+# Values and adjoints are floats, or arrays along the time axis for time series.
+TapeNode = Tuple[str, Tuple[int, ...], Any, Any]
+
+
+class SensitivityAnalyzer:
+    def __init__(self, model: CalculationModel, inputs: Dict[str, Any]):
+        self.model = model
+        self.inputs = model.prepare_inputs(inputs)
+
+    def analyze(self, targets: List[str], swing: float = 0.1) -> Dict[str, Any]:
+        # One forward pass records every formula's operations, then one reverse sweep per target
+        # accumulates adjoints back through the parameter DAG down to the inputs
+        plan = self.model.evaluation_plan(targets, self.inputs)
+        values: Dict[str, float] = dict(self.inputs)
+        tapes: Dict[str, List[TapeNode]] = {}
+
+        for name in plan:
+            if name in values:
+                continue
+            param = self.model.param_map[name]
+            if param.type == "CALCULATION":
+                tapes[name] = self._record(param.compiled.program, values)
+                values[name] = tapes[name][-1][2]
+            else:
+                value = param.compute_value(values)
+                if value is None:
+                    raise ValueError(f"Parameter '{name}' could not be resolved.")
+                values[name] = value if isinstance(value, np.ndarray) else float(value)
+
+        results = []
+        sensitivity = {}
+        for target in targets:
+            if target not in values:
+                raise ValueError(f"Target '{target}' was not resolved.")
+            if np.ndim(values[target]):
+                raise ValueError(
+                    f"Sensitivity needs scalar targets, reduce time series '{target}' with sum() or npv()."
+                )
+            results.append(values[target])
+
+            gradient = self._reverse_sweep(target, plan, tapes)
+            sensitivity[target] = {
+                "gradient": dict(zip(gradient, to_results(list(gradient.values())))),
+                "tornado": self._tornado(values[target], gradient, swing),
+            }
+
+        return {"result": results, "sensitivity": sensitivity}
+
+    def _record(self, program, values: Dict[str, float]) -> List[TapeNode]:
+        tape: List[TapeNode] = []
+        stack: List[int] = []
+
+        for op, arg in program:
+            if op == CONST:
+                tape.append((op, (), arg, None))
+            elif op == VAR:
+                if arg not in values:
+                    raise ValueError(f"Variable '{arg}' not found in context.")
+                tape.append((op, (), values[arg], arg))
+            elif op.startswith("Unary"):
+                operand = stack.pop()
+                value = tape[operand][2]
+                tape.append((op, (operand,), -value if op == "Unary_USub" else value, None))
+            elif op == CALL:
+                children = tuple(stack[len(stack) - arg[1] :])
+                del stack[len(stack) - arg[1] :]
+                value = FUNCTIONS[arg[0]][0](*(tape[child][2] for child in children))
+                tape.append((op, children, value, arg))
+            else:
+                right = stack.pop()
+                left = stack.pop()
+                tape.append((op, (left, right), _apply(op, tape[left][2], tape[right][2]), None))
+            stack.append(len(tape) - 1)
+
+        return tape
+
+    def _reverse_sweep(self, target: str, plan: List[str], tapes: Dict[str, List[TapeNode]]) -> Dict[str, Any]:
+        adjoints: Dict[str, Any] = {target: 1.0}
+
+        for name in reversed(plan):
+            adjoint = adjoints.get(name, 0.0)
+            if _is_zero(adjoint) or name not in tapes or name in self.inputs:
+                continue
+
+            tape = tapes[name]
+            node_adjoints: List[Any] = [0.0] * len(tape)
+            node_adjoints[-1] = adjoint
+
+            for index in range(len(tape) - 1, -1, -1):
+                op, children, _, arg = tape[index]
+                node_adjoint = node_adjoints[index]
+                if _is_zero(node_adjoint):
+                    continue
+
+                if op == VAR:
+                    adjoints[arg] = adjoints.get(arg, 0.0) + node_adjoint
+                elif op == "Unary_USub":
+                    node_adjoints[children[0]] -= node_adjoint
+                elif op == "Unary_UAdd":
+                    node_adjoints[children[0]] += node_adjoint
+                elif op == CALL:
+                    values = [tape[child][2] for child in children]
+                    for child, child_adjoint in zip(children, _call_adjoints(arg[0], values, node_adjoint)):
+                        node_adjoints[child] += _reduce_to(child_adjoint, tape[child][2])
+                elif op != CONST:
+                    left, right = children
+                    d_left, d_right = _partials(op, tape[left][2], tape[right][2])
+                    # A scalar operand broadcast over the time axis collects the adjoint of every step
+                    node_adjoints[left] += _reduce_to(node_adjoint * d_left, tape[left][2])
+                    node_adjoints[right] += _reduce_to(node_adjoint * d_right, tape[right][2])
+
+        return {name: adjoints.get(name, 0.0) for name in self.inputs}
+
+    def _tornado(self, target_value: float, gradient: Dict[str, Any], swing: float) -> List[Dict[str, Any]]:
+        # Linearized swing of the target when each input moves by ±swing of its own value; a time
+        # series input moves all its steps together
+        entries = []
+        for name, derivative in gradient.items():
+            value = self.inputs[name]
+            directional = float(np.sum(derivative * value))
+            delta = directional * swing
+            value, derivative = to_results([value, derivative])
+            entries.append(
+                {
+                    "input": name,
+                    "value": value,
+                    "derivative": derivative,
+                    "elasticity": directional / target_value if target_value != 0 else None,
+                    "low": target_value - delta,
+                    "high": target_value + delta,
+                }
+            )
+
+        entries.sort(key=lambda entry: abs(entry["high"] - entry["low"]), reverse=True)
+        return entries
+
+
+def _apply(op: str, left: float, right: float) -> float:
+    if op == "Add":
+        return left + right
+    elif op == "Subtract":
+        return left - right
+    elif op == "Multiply":
+        return left * right
+    elif op == "Divide":
+        return left / right
+    return left**right
+
+
+def _is_zero(value) -> bool:
+    return value == 0.0 if isinstance(value, float) else not np.any(value)
+
+
+def _reduce_to(adjoint, value):
+    # Sum the adjoint of a scalar that was broadcast against a time series
+    if np.ndim(adjoint) and not np.ndim(value):
+        return float(np.sum(adjoint))
+    return adjoint
+
+
+def _call_adjoints(name: str, args: List[Any], adjoint) -> List[Any]:
+    # Adjoint of each argument of a function call, before reduction to the argument's shape
+    if len(args) == 2 and name in ("min", "max"):
+        left, right = args
+        chosen = np.less_equal(left, right) if name == "min" else np.greater_equal(left, right)
+        return [np.where(chosen, adjoint, 0.0), np.where(chosen, 0.0, adjoint)]
+
+    if name == "npv":
+        rate, values = args
+        discount = discount_factors(rate, values)
+        steps = np.reshape(values, np.shape(values) or (1,))
+        # Step t is discounted by every rate up to t, so rate s collects the adjoint of steps s..T
+        later = np.cumsum((adjoint * steps * discount)[..., ::-1], axis=-1)[..., ::-1]
+        d_rate = -later / (1 + np.asarray(rate, dtype=float))
+        d_values = adjoint * discount
+        return [d_rate, d_values if np.ndim(values) else float(np.sum(d_values))]
+
+    (values,) = args
+    if not np.ndim(values):
+        return [adjoint]
+    if name == "sum":
+        return [np.broadcast_to(adjoint, np.shape(values)).astype(float)]
+    if name == "cumsum":
+        return [np.cumsum(np.asarray(adjoint)[..., ::-1], axis=-1)[..., ::-1]]
+
+    # min/max of a series: only the chosen step moves the result
+    step = np.argmin(values) if name == "min" else np.argmax(values)
+    gradient = np.zeros(np.shape(values))
+    gradient[step] = adjoint
+    return [gradient]
+
+
+def _partials(op: str, left: Any, right: Any) -> Tuple[Any, Any]:
+    if isinstance(left, np.ndarray) or isinstance(right, np.ndarray):
+        return _array_partials(op, np.asarray(left, dtype=float), np.asarray(right, dtype=float))
+
+    if op == "Add":
+        return 1.0, 1.0
+    elif op == "Subtract":
+        return 1.0, -1.0
+    elif op == "Multiply":
+        return right, left
+    elif op == "Divide":
+        return 1.0 / right, -left / (right * right)
+
+    # d(l**r)/dr needs log(l), which only exists for positive bases
+    d_left = right * left ** (right - 1) if right != 0 else 0.0
+    d_right = left**right * math.log(left) if left > 0 else 0.0
+    return d_left, d_right
+
+
+def _array_partials(op: str, left: np.ndarray, right: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Element-wise partials for time series, with the same conventions as the scalar ones
+    if op == "Add":
+        return np.ones_like(left), np.ones_like(right)
+    elif op == "Subtract":
+        return np.ones_like(left), -np.ones_like(right)
+    elif op == "Multiply":
+        return right, left
+    elif op == "Divide":
+        return 1.0 / right, -left / (right * right)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d_left = np.where(right != 0, right * left ** (right - 1), 0.0)
+        positive = left > 0
+        d_right = np.where(positive, left**right * np.log(np.where(positive, left, 1.0)), 0.0)
+    return d_left, d_right
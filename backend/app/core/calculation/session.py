@@ -0,0 +1,125 @@
+# Stateful recalculation sessions that only recompute what an input change affects
+import heapq
+import time
+import uuid
+from collections import ChainMap, OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+
+from .calculator import Calculator
+from .model import CalculationModel
+
+
+class CalculationSession:
+    def __init__(self, model: CalculationModel, inputs: Dict[str, float], targets: List[str]):
+        if model.time_series:
+            raise ValueError("Sessions don't support models with time series.")
+
+        self.session_id = uuid.uuid4().hex
+        self.model = model
+        self.targets = targets
+        self.inputs = dict(inputs)
+        self.lock = Lock()
+        self.last_access = time.monotonic()
+
+        self.plan = model.evaluation_plan(targets, self.inputs)
+        self.position = {name: index for index, name in enumerate(self.plan)}
+
+        calculator = Calculator(model.parameters, self.inputs, model=model)
+        calculator.evaluate(targets)
+        self.values = calculator.context
+
+    def results(self) -> List[float]:
+        return [self.values[target] for target in self.targets]
+
+    def update(self, deltas: Dict[str, float]) -> Tuple[Dict[str, float], int]:
+        # Returns the targets whose value changed and how many parameters were recomputed
+        for name in deltas:
+            if name not in self.model.param_map:
+                raise ValueError(f"Input '{name}' is not a parameter of this model.")
+
+        with self.lock:
+            inputs = {**self.inputs, **deltas}
+
+            # New values go to a scratch layer over the current ones and are only committed once
+            # every dirty parameter evaluated, so a failing formula leaves the session untouched
+            changes: Dict[str, float] = {}
+            values = ChainMap(changes, self.values)
+
+            # Min-heap on plan position processes dirty parameters in dependency order,
+            # and only parameters whose value actually changed mark their dependants dirty
+            queue: List[int] = []
+            queued: Set[str] = set()
+            recomputed = 0
+
+            for name, value in deltas.items():
+                if values.get(name) != value:
+                    changes[name] = value
+                    self._mark_dependants(name, inputs, queue, queued)
+
+            while queue:
+                name = self.plan[heapq.heappop(queue)]
+                value = self.model.param_map[name].compute_value(values)
+                recomputed += 1
+
+                if value != values.get(name):
+                    changes[name] = value
+                    self._mark_dependants(name, inputs, queue, queued)
+
+            changed = {target: changes[target] for target in self.targets if target in changes}
+            self.inputs = inputs
+            self.values.update(changes)
+            return changed, recomputed
+
+    def _mark_dependants(self, name: str, inputs: Dict[str, float], queue: List[int], queued: Set[str]):
+        for dependant in self.model.graph.dependants.get(name, []):
+            # Inputs override calculations, and parameters outside the plan aren't tracked
+            if dependant in inputs or dependant not in self.position or dependant in queued:
+                continue
+            queued.add(dependant)
+            heapq.heappush(queue, self.position[dependant])
+
+
+class SessionStore:
+    def __init__(self, max_sessions: int, ttl_seconds: float):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, CalculationSession]" = OrderedDict()
+        self._lock = Lock()
+
+    def create(self, model: CalculationModel, inputs: Dict[str, float], targets: List[str]) -> CalculationSession:
+        session = CalculationSession(model, inputs, targets)
+
+        with self._lock:
+            self._expire()
+            self._sessions[session.session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+        return session
+
+    def get(self, session_id: str) -> Optional[CalculationSession]:
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_access = time.monotonic()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def remove(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_access >= cutoff:
+                break
+            del self._sessions[session_id]
+
+
+session_store = SessionStore(max_sessions=settings.session_max_sessions, ttl_seconds=settings.session_ttl_seconds)
@@ -0,0 +1,153 @@
+# Compiled model artifacts shared by the server's worker processes through a tmpfs directory
+import mmap
+import os
+import re
+import tempfile
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from .artifact import dump_model, load_model
+from .model import CalculationModel
+
+# Identifies one published artifact; it changes whenever the file is replaced or removed
+Stamp = Tuple[int, int]
+
+_MODEL_ID = re.compile(r"[0-9a-f]{64}")
+
+
+def default_path() -> str:
+    # /dev/shm is memory-backed, so artifacts there are shared via the page cache and never hit disk
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, f"calc-models-{os.getuid()}" if hasattr(os, "getuid") else "calc-models")
+
+
+class SharedModelStore:
+    """One artifact file per model id, written once by whichever worker prepares the model first.
+
+    Other workers memory-map the file and load the model from it instead of compiling it again.
+    Files are replaced atomically, so readers see either the old or the new artifact, and a
+    worker can tell its own copy is stale when the file's stamp changes. Artifacts hold code
+    objects, so the directory is only accessible to the user running the server.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, mode=0o700, exist_ok=True)
+
+        self._lock = Lock()
+        self.loads = 0
+        self.publishes = 0
+        self.stale = 0
+
+    def _file(self, model_id: str) -> Optional[str]:
+        # Model ids come from URLs; only content hashes map to a file
+        if not _MODEL_ID.fullmatch(model_id):
+            return None
+        return os.path.join(self.path, f"{model_id}.model")
+
+    def stamp(self, model_id: str) -> Optional[Stamp]:
+        path = self._file(model_id)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def load(self, model_id: str) -> Optional[Tuple[CalculationModel, Stamp]]:
+        path = self._file(model_id)
+        if path is None:
+            return None
+
+        try:
+            with open(path, "rb") as file:
+                stat = os.fstat(file.fileno())
+                if not stat.st_size:
+                    return None
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    # Handled inside the mapping, so the traceback's views of it are gone before it closes
+                    try:
+                        model = load_model(mapped)
+                    except (ValueError, EOFError, TypeError):
+                        model = None
+        except FileNotFoundError:
+            return None
+
+        if model is None:
+            # Left behind by a different release, or damaged; the caller rebuilds and republishes it
+            with self._lock:
+                self.stale += 1
+            return None
+
+        with self._lock:
+            self.loads += 1
+        return model, (stat.st_ino, stat.st_mtime_ns)
+
+    def publish(self, model: CalculationModel) -> Optional[Stamp]:
+        path = self._file(model.model_id)
+        if path is None:
+            return None
+
+        data = dump_model(model)
+        if len(data) > self.max_bytes:
+            return None
+
+        # Written under a temporary name and renamed, so no reader ever maps a partial file
+        descriptor, temporary = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+        with self._lock:
+            self.publishes += 1
+        self._evict(keep=path)
+        return self.stamp(model.model_id)
+
+    def remove(self, model_id: str) -> bool:
+        path = self._file(model_id)
+        if path is None:
+            return False
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def clear(self):
+        for name in os.listdir(self.path):
+            if name.endswith(".model"):
+                self.remove(name[: -len(".model")])
+
+    def _evict(self, keep: str):
+        # Oldest artifacts go first once the directory outgrows max_bytes. Workers that loaded an
+        # evicted model keep their copy but drop it at their next lookup, like after remove().
+        files = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".model"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"shared_loads": self.loads, "shared_publishes": self.publishes, "shared_stale": self.stale}
@@ -0,0 +1,183 @@
+# Goal seek: find the input value that makes a target hit a desired value
+import math
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .calculator import Calculator
+from .model import CalculationModel
+from .sensitivity import SensitivityAnalyzer
+
+METHODS = ["brent", "bisection", "newton"]
+
+EPSILON = sys.float_info.epsilon
+
+# (solution, iterations, converged)
+SolveOutcome = Tuple[float, int, bool]
+
+
+class GoalSeekSolver:
+    def __init__(
+        self,
+        model: CalculationModel,
+        inputs: Dict[str, float],
+        tolerance: float = 1e-9,
+        max_iterations: int = 100,
+    ):
+        self.model = model
+        self.inputs = inputs
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+
+    def solve(self, specs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        solutions = [self.solve_one(spec) for spec in specs]
+        return {"solutions": solutions, "elapsed_ms": (time.perf_counter() - start) * 1000}
+
+    def solve_one(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        target, name, method = spec["target"], spec["input"], spec.get("method", "brent")
+        lower, upper = spec.get("lower"), spec.get("upper")
+
+        if method not in METHODS:
+            raise ValueError(f"Unknown solve method '{method}'.")
+        if name not in self.model.param_map:
+            raise ValueError(f"Input '{name}' is not a parameter of the model.")
+        if (lower is None) != (upper is None) or (method != "newton" and lower is None):
+            raise ValueError(f"Solving '{target}' with {method} requires both lower and upper bounds.")
+        if lower is not None and lower > upper:
+            raise ValueError(f"Solving '{target}' requires lower <= upper.")
+
+        def residual(x: float) -> float:
+            inputs = dict(self.inputs, **{name: x})
+            calculator = Calculator(self.model.parameters, inputs, model=self.model, optimize=True)
+            result = calculator.evaluate([target])["result"][0]
+            if isinstance(result, list):
+                raise ValueError(f"Goal seek needs a scalar target, reduce time series '{target}' with sum() or npv().")
+            return result - spec["value"]
+
+        message = None
+        if method == "newton":
+            initial = spec.get("initial")
+            if initial is None:
+                initial = self.inputs.get(name, 0.0) if lower is None else (lower + upper) / 2
+            solution, iterations, converged = self._newton(target, name, spec["value"], initial, lower, upper)
+        else:
+            f_lower, f_upper = residual(lower), residual(upper)
+            if f_lower * f_upper > 0:
+                solution, iterations, converged = lower, 0, False
+                message = f"'{target}' - {spec['value']} has the same sign at both bounds."
+            elif method == "bisection":
+                solution, iterations, converged = self._bisection(residual, lower, upper, f_lower)
+            else:
+                solution, iterations, converged = self._brent(residual, lower, upper, f_lower, f_upper)
+
+        if not converged and message is None:
+            message = f"No solution within {self.max_iterations} iterations."
+
+        return {
+            "target": target,
+            "input": name,
+            "solution": solution if converged else None,
+            "residual": residual(solution) if converged else None,
+            "iterations": iterations,
+            "converged": converged,
+            "elapsed_ms": (time.perf_counter() - start) * 1000,
+            "message": message,
+        }
+
+    def _bisection(self, f: Callable[[float], float], lower: float, upper: float, f_lower: float) -> SolveOutcome:
+        for iteration in range(1, self.max_iterations + 1):
+            middle = (lower + upper) / 2
+            f_middle = f(middle)
+            if f_middle == 0 or (upper - lower) / 2 <= self.tolerance:
+                return middle, iteration, True
+
+            if (f_middle < 0) == (f_lower < 0):
+                lower, f_lower = middle, f_middle
+            else:
+                upper = middle
+
+        return (lower + upper) / 2, self.max_iterations, False
+
+    def _brent(self, f: Callable[[float], float], a: float, b: float, fa: float, fb: float) -> SolveOutcome:
+        # Brent's method: inverse quadratic interpolation or secant steps, falling back to
+        # bisection whenever they would not shrink the bracket fast enough
+        c, fc = a, fa
+        d = e = b - a
+
+        for iteration in range(1, self.max_iterations + 1):
+            if (fb > 0) == (fc > 0):
+                c, fc = a, fa
+                d = e = b - a
+            if abs(fc) < abs(fb):
+                a, b, c = b, c, b
+                fa, fb, fc = fb, fc, fb
+
+            tolerance = 2 * EPSILON * abs(b) + 0.5 * self.tolerance
+            middle = 0.5 * (c - b)
+            if abs(middle) <= tolerance or fb == 0:
+                return b, iteration, True
+
+            if abs(e) >= tolerance and abs(fa) > abs(fb):
+                s = fb / fa
+                if a == c:
+                    p, q = 2 * middle * s, 1 - s
+                else:
+                    q, r = fa / fc, fb / fc
+                    p = s * (2 * middle * q * (q - r) - (b - a) * (r - 1))
+                    q = (q - 1) * (r - 1) * (s - 1)
+                if p > 0:
+                    q = -q
+                p = abs(p)
+
+                if 2 * p < min(3 * middle * q - abs(tolerance * q), abs(e * q)):
+                    e, d = d, p / q
+                else:
+                    d = e = middle
+            else:
+                d = e = middle
+
+            a, fa = b, fb
+            b += d if abs(d) > tolerance else math.copysign(tolerance, middle)
+            fb = f(b)
+
+        return b, self.max_iterations, False
+
+    def _newton(
+        self,
+        target: str,
+        name: str,
+        value: float,
+        x: float,
+        lower: Optional[float],
+        upper: Optional[float],
+    ) -> SolveOutcome:
+        # Derivatives come from the reverse sweep; with bounds, steps leaving them are replaced by bisection
+        for iteration in range(1, self.max_iterations + 1):
+            analysis = SensitivityAnalyzer(self.model, dict(self.inputs, **{name: x})).analyze([target])
+            f = analysis["result"][0] - value
+            derivative = analysis["sensitivity"][target]["gradient"][name]
+
+            if f == 0:
+                return x, iteration, True
+            if derivative == 0 or not math.isfinite(derivative):
+                return x, iteration, False
+
+            if lower is not None:
+                if f > 0 and derivative > 0 or f < 0 and derivative < 0:
+                    upper = min(upper, x)
+                else:
+                    lower = max(lower, x)
+
+            step = f / derivative
+            next_x = x - step
+            if lower is not None and not lower <= next_x <= upper:
+                next_x = (lower + upper) / 2
+                step = x - next_x
+
+            x = next_x
+            if abs(step) <= self.tolerance * max(1.0, abs(x)):
+                return x, iteration, True
+
+        return x, self.max_iterations, False
@@ -0,0 +1,98 @@
+# Chunked evaluation of NDJSON scenario streams against a prepared model
+import json
+import math
+from typing import AsyncIterator, Dict, List, Optional
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from .batch import BatchCalculator
+from .model import CalculationModel
+
+
+class RequestStreamingResponse(StreamingResponse):
+    # StreamingResponse listens for http.disconnect on receive() while it streams (ASGI < 2.4),
+    # which would swallow the request body chunks our generator is still reading. Disconnects
+    # surface as send() failures instead, like Starlette's own ASGI 2.4 path.
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Dict[str, float]]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield _parse_scenario(line)
+
+    if buffer.strip():
+        yield _parse_scenario(buffer)
+
+
+def _parse_scenario(line: bytes) -> Dict[str, float]:
+    scenario = json.loads(line)
+    if not isinstance(scenario, dict):
+        raise ValueError("Each NDJSON line must be an object mapping input names to values.")
+
+    for name, value in scenario.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"Input '{name}' must be a number, got {json.dumps(value)}.")
+    return scenario
+
+
+def evaluate_chunk(model: CalculationModel, scenarios: List[Dict[str, float]], targets: List[str]) -> np.ndarray:
+    names = set().union(*scenarios)
+    columns = {}
+    for name in names:
+        try:
+            columns[name] = [scenario[name] for scenario in scenarios]
+        except KeyError:
+            raise ValueError(f"A scenario is missing input '{name}' that other scenarios provide.")
+
+    calculator = BatchCalculator(model.parameters, columns, model=model, size=len(scenarios))
+    results = calculator.evaluate_arrays(targets)
+    return np.column_stack(results) if results else np.empty((len(scenarios), 0))
+
+
+async def stream_results(
+    model: CalculationModel,
+    scenarios: AsyncIterator[Dict[str, float]],
+    targets: List[str],
+    chunk_size: int,
+) -> AsyncIterator[bytes]:
+    # Only one chunk of scenarios and results is held in memory at a time. Errors can't change
+    # the status code once streaming has started, so they are reported as a final error line.
+    chunk: List[Dict[str, float]] = []
+
+    try:
+        async for scenario in scenarios:
+            chunk.append(scenario)
+            if len(chunk) >= chunk_size:
+                yield await _encode_chunk(model, chunk, targets)
+                chunk = []
+
+        if chunk:
+            yield await _encode_chunk(model, chunk, targets)
+    except (ValueError, KeyError, ZeroDivisionError) as e:
+        yield (json.dumps({"error": str(e)}) + "\n").encode()
+
+
+async def _encode_chunk(model: CalculationModel, chunk: List[Dict[str, float]], targets: List[str]) -> bytes:
+    rows = await run_in_threadpool(evaluate_chunk, model, chunk, targets)
+    return "".join(
+        json.dumps({"result": [finite_or_none(value) for value in row]}, allow_nan=False) + "\n"
+        for row in rows.tolist()
+    ).encode()
+
+
+def finite_or_none(value: float) -> Optional[float]:
+    # NDJSON clients need strict JSON, so inf/nan from e.g. division by zero become null
+    return value if math.isfinite(value) else None
@@ -0,0 +1,258 @@
+# Cartesian-product parameter sweeps, generated and evaluated chunk by chunk
+import json
+import math
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from .batch import BatchCalculator
+from .model import CalculationModel
+from .streaming import finite_or_none
+
+# Levels of a swept input: listed values, or a range of evenly spaced ones with both ends included
+Axis = Union[List[float], Dict[str, Any]]
+
+
+class ParameterSweep:
+    """Evaluates a model over every combination of levels of the swept inputs.
+
+    Scenario ``index`` takes level ``(index // stride) % levels`` of each axis, in request order
+    with the last axis varying fastest (like ``itertools.product``). Chunks are built from a range
+    of indices, so memory depends on the chunk size and never on the size of the grid.
+    """
+
+    def __init__(
+        self,
+        model: CalculationModel,
+        axes: Dict[str, Axis],
+        inputs: Dict[str, float],
+        targets: List[str],
+        chunk_size: int = 10_000,
+        max_scenarios: Optional[int] = None,
+    ):
+        if model.time_series:
+            raise ValueError("Models with time series can't be swept.")
+        if not axes:
+            raise ValueError("A sweep needs at least one swept input.")
+        for name in axes:
+            if name in inputs:
+                raise ValueError(f"Input '{name}' is both swept and fixed.")
+
+        self.model = model
+        self.inputs = inputs
+        self.targets = targets
+        self.chunk_size = chunk_size
+        self.levels = {name: _levels(name, axis) for name, axis in axes.items()}
+
+        self.size = math.prod(len(levels) for levels in self.levels.values())
+        if max_scenarios is not None and self.size > max_scenarios:
+            raise ValueError(f"The sweep has {self.size} scenarios, at most {max_scenarios} are allowed.")
+
+        self.strides: Dict[str, int] = {}
+        stride = 1
+        for name in reversed(list(self.levels)):
+            self.strides[name] = stride
+            stride *= len(self.levels[name])
+
+    def scenario(self, index: int) -> Dict[str, float]:
+        # Swept input values of one scenario
+        return {
+            name: float(levels[(index // self.strides[name]) % len(levels)]) for name, levels in self.levels.items()
+        }
+
+    def columns(self, start: int, stop: int) -> Dict[str, Any]:
+        indices = np.arange(start, stop, dtype=np.int64)
+        columns: Dict[str, Any] = dict(self.inputs)
+        for name, levels in self.levels.items():
+            columns[name] = levels[(indices // self.strides[name]) % len(levels)]
+        return columns
+
+    def evaluate_chunk(self, start: int, stop: int) -> np.ndarray:
+        # One row per target, one column per scenario in [start, stop)
+        calculator = BatchCalculator(
+            self.model.parameters, self.columns(start, stop), model=self.model, size=stop - start
+        )
+        results = calculator.evaluate_arrays(self.targets)
+        return np.vstack(results) if results else np.empty((0, stop - start))
+
+    def chunks(self) -> Iterator[Tuple[int, int]]:
+        for start in range(0, self.size, self.chunk_size):
+            yield start, min(start + self.chunk_size, self.size)
+
+    def aggregate(self, pareto: Optional[Dict[str, str]] = None, max_pareto_points: int = 10_000) -> Dict[str, Any]:
+        # Extremes of every target and optionally the Pareto front of some of them; only the
+        # running aggregates outlive a chunk
+        start_time = time.perf_counter()
+        pareto = pareto or {}
+        for target, direction in pareto.items():
+            if target not in self.targets:
+                raise ValueError(f"Pareto objective '{target}' must be one of the targets.")
+            if direction not in ("min", "max"):
+                raise ValueError(f"Pareto objective '{target}' must be minimized or maximized, got '{direction}'.")
+
+        extremes = [_Extremes() for _ in self.targets]
+        front = _ParetoFront(
+            [self.targets.index(target) for target in pareto],
+            [1.0 if direction == "min" else -1.0 for direction in pareto.values()],
+            max_pareto_points,
+        )
+
+        for start, stop in self.chunks():
+            values = self.evaluate_chunk(start, stop)
+            for row, extreme in zip(values, extremes):
+                extreme.update(start, row, values)
+            if pareto:
+                front.update(start, values)
+
+        return {
+            "results": {target: extreme.result(self) for target, extreme in zip(self.targets, extremes)},
+            "pareto": [self.point(index, row) for index, row in front.points()],
+            "scenarios": self.size,
+            "elapsed_ms": (time.perf_counter() - start_time) * 1000,
+        }
+
+    def point(self, index: int, row: np.ndarray) -> Dict[str, Any]:
+        return {
+            "index": index,
+            "inputs": self.scenario(index),
+            "result": [finite_or_none(value) for value in row.tolist()],
+        }
+
+
+def _levels(name: str, axis: Axis) -> np.ndarray:
+    if isinstance(axis, dict):
+        if axis["steps"] < 1:
+            raise ValueError(f"Swept input '{name}' needs at least one step.")
+        return np.linspace(axis["start"], axis["stop"], axis["steps"])
+
+    levels = np.asarray(axis, dtype=float)
+    if levels.ndim != 1 or not levels.size:
+        raise ValueError(f"Swept input '{name}' needs a non-empty list of values.")
+    return levels
+
+
+class _Extremes:
+    __slots__ = ("min", "max", "argmin", "argmax", "invalid")
+
+    def __init__(self):
+        # argmin/argmax keep the scenario index and its results for every target
+        self.min = self.max = math.nan
+        self.argmin: Optional[Tuple[int, np.ndarray]] = None
+        self.argmax: Optional[Tuple[int, np.ndarray]] = None
+        self.invalid = 0
+
+    def update(self, start: int, row: np.ndarray, values: np.ndarray):
+        finite = np.isfinite(row)
+        self.invalid += int(row.size - np.count_nonzero(finite))
+        if not finite.any():
+            return
+
+        # Ties keep the earliest scenario, also across chunks
+        candidates = np.where(finite, row, np.inf)
+        low = int(np.argmin(candidates))
+        if self.argmin is None or row[low] < self.min:
+            self.min, self.argmin = float(row[low]), (start + low, values[:, low].copy())
+
+        candidates = np.where(finite, row, -np.inf)
+        high = int(np.argmax(candidates))
+        if self.argmax is None or row[high] > self.max:
+            self.max, self.argmax = float(row[high]), (start + high, values[:, high].copy())
+
+    def result(self, sweep: ParameterSweep) -> Dict[str, Any]:
+        return {
+            "min": None if self.argmin is None else self.min,
+            "max": None if self.argmax is None else self.max,
+            "argmin": None if self.argmin is None else sweep.point(*self.argmin),
+            "argmax": None if self.argmax is None else sweep.point(*self.argmax),
+            "invalid": self.invalid,
+        }
+
+
+class _ParetoFront:
+    """Non-dominated scenarios seen so far, as scenario indices and their results."""
+
+    def __init__(self, objectives: List[int], signs: List[float], max_points: int):
+        self.objectives = objectives
+        # Maximized objectives are negated so that smaller is always better
+        self.signs = np.asarray(signs)
+        self.max_points = max_points
+        self.indices = np.empty(0, dtype=np.int64)
+        self.values: Optional[np.ndarray] = None
+
+    def update(self, start: int, values: np.ndarray):
+        objectives = values[self.objectives]
+        finite = np.isfinite(objectives).all(axis=0)
+        indices = np.flatnonzero(finite)
+        # Dominated scenarios of the chunk go first, so the merge only sees its own front
+        candidates = indices[pareto_front(objectives[:, indices].T * self.signs)]
+
+        columns = values[:, candidates].T
+        if self.values is not None:
+            columns = np.vstack([self.values, columns])
+        merged = np.concatenate([self.indices, start + candidates])
+
+        keep = pareto_front(columns[:, self.objectives] * self.signs)
+        if keep.size > self.max_points:
+            raise ValueError(
+                f"The Pareto front has more than {self.max_points} scenarios; sweep fewer levels or objectives."
+            )
+        self.indices, self.values = merged[keep], columns[keep]
+
+    def points(self) -> Iterator[Tuple[int, np.ndarray]]:
+        if self.values is None:
+            return
+        for position in np.argsort(self.indices, kind="stable"):
+            yield int(self.indices[position]), self.values[position]
+
+
+def pareto_front(values: np.ndarray) -> np.ndarray:
+    """Positions of the rows of ``values`` (scenarios x objectives, all minimized) that no other row dominates.
+
+    Of identical rows only the first is kept.
+    """
+    if not len(values):
+        return np.empty(0, dtype=np.int64)
+
+    remaining = np.lexsort(values.T[::-1])
+    if values.shape[1] == 2:
+        # Sorted by the first objective, a row is on the front iff it beats every earlier row on
+        # the second one
+        second = values[remaining, 1]
+        best_before = np.minimum.accumulate(np.concatenate([[np.inf], second[:-1]]))
+        return np.sort(remaining[second < best_before])
+
+    # The lexicographically smallest remaining row can't be dominated, and removes every row it
+    # dominates or equals; one pass per front member
+    front = []
+    while remaining.size:
+        best = remaining[0]
+        front.append(best)
+        remaining = remaining[1:]
+        remaining = remaining[~np.all(values[best] <= values[remaining], axis=1)]
+    return np.sort(np.asarray(front, dtype=np.int64))
+
+
+async def stream_sweep(sweep: ParameterSweep) -> AsyncIterator[bytes]:
+    # One line per scenario in index order; errors can't change the status code once streaming
+    # has started, so they are reported as a final error line
+    try:
+        for start, stop in sweep.chunks():
+            yield await run_in_threadpool(_encode_chunk, sweep, start, stop)
+    except (ValueError, KeyError, ZeroDivisionError) as e:
+        yield (json.dumps({"error": str(e)}) + "\n").encode()
+
+
+def _encode_chunk(sweep: ParameterSweep, start: int, stop: int) -> bytes:
+    rows = sweep.evaluate_chunk(start, stop).T.tolist()
+    columns = {name: column.tolist() for name, column in sweep.columns(start, stop).items() if name in sweep.levels}
+    lines = []
+    for offset, row in enumerate(rows):
+        line = {
+            "index": start + offset,
+            "inputs": {name: column[offset] for name, column in columns.items()},
+            "result": [finite_or_none(value) for value in row],
+        }
+        lines.append(json.dumps(line, allow_nan=False) + "\n")
+    return "".join(lines).encode()
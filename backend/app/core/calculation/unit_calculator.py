@@ -1,19 +1,56 @@
-from typing import Dict, Optional
+from functools import lru_cache
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
-import pint
+from app.core.config import settings
+from app.core.metrics import metrics
 
-from .parameter import Parameter
+from .compiler import CALL, CONST, VAR, FormulaCompiler
 
+if TYPE_CHECKING:
+    import pint
+
+    from .model import CalculationModel
+    from .parameter import Parameter
+
+CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP"}
+
+_registry: Optional["pint.UnitRegistry"] = None
+_registry_lock = Lock()
 
-class UnitCalculator:
-    def __init__(self):
-        self.ureg = pint.UnitRegistry()
 
-        self.ureg.define("USD = [currency]")
-        self.ureg.define("EUR = 1.1 * USD")
-        self.ureg.define("GBP = 1.3 * USD")
+def get_unit_registry() -> "pint.UnitRegistry":
+    # One process-wide registry, built on first use. pint is only imported here, so purely
+    # numeric work never pays for it.
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                ureg = _build_registry()
+                ureg.define("USD = [currency]")
+                ureg.define("EUR = 1.1 * USD")
+                ureg.define("GBP = 1.3 * USD")
+                _registry = ureg
+    return _registry
 
-        self.currency_symbols = {"$": "USD", "€": "EUR", "£": "GBP"}
+
+def _build_registry() -> "pint.UnitRegistry":
+    import pint
+
+    # Parsing pint's definitions file dominates construction; the parsed form is cached on disk
+    # and reused by later processes (~0.3s down to ~0.04s)
+    if settings.unit_cache_folder:
+        try:
+            return pint.UnitRegistry(cache_folder=settings.unit_cache_folder)
+        except OSError:
+            pass
+    return pint.UnitRegistry()
+
+
+class UnitCalculator:
+    def __init__(self):
+        self.ureg = get_unit_registry()
+        self.currency_symbols = CURRENCY_SYMBOLS
 
     def _format_unit(self, unit_str: str) -> str:
         if not unit_str:
@@ -38,47 +75,84 @@ class UnitCalculator:
 
     @staticmethod
     def calculate_unit(ast_node, context: Dict[str, "Parameter"]) -> Optional[str]:
-        calculator = UnitCalculator()
-        result = calculator._calculate_with_pint(ast_node, context)
-        if result:
-            return calculator._format_unit(result)
-        return result
-
-    def _calculate_with_pint(self, ast_node, context: Dict[str, "Parameter"]) -> Optional[str]:
-        if isinstance(ast_node, (float, int)):
-            return None
+        program = tuple(FormulaCompiler().linearize(ast_node))
+        units = {arg: context[arg].unit for op, arg in program if op == VAR and arg in context}
+        return UnitCalculator.calculate_program_unit(program, units)
 
-        if isinstance(ast_node, str):
-            if ast_node in context:
-                unit_str = context[ast_node].unit
-
-                if unit_str is None or unit_str == "":
-                    return None
-
-                if unit_str in self.currency_symbols:
-                    return self.currency_symbols[unit_str]
+    @staticmethod
+    def calculate_program_unit(program: Tuple[Tuple[str, Any], ...], units: Dict[str, Optional[str]]) -> Optional[str]:
+        operand_units = tuple(sorted({(arg, units.get(arg)) for op, arg in program if op == VAR}))
+        with metrics.stage("units"):
+            return _infer_unit(program, operand_units)
 
-                if "/" in unit_str:
-                    return self._parse_compound_unit(unit_str)
+    @staticmethod
+    def resolve_units(model: "CalculationModel") -> Dict[str, Optional[str]]:
+        # Units of every parameter in the model; calculation units are inferred in evaluation
+        # order so formulas built on other calculations see their inferred units
+        units: Dict[str, Optional[str]] = {}
+        for name in model.evaluation_order:
+            param = model.param_map[name]
+            if param.type == "CALCULATION":
+                units[name] = UnitCalculator.calculate_program_unit(tuple(param.compiled.program), units)
+            else:
+                units[name] = param.unit
+        return units
+
+    def _calculate_program(
+        self, program: Tuple[Tuple[str, Any], ...], units: Dict[str, Optional[str]]
+    ) -> Optional[str]:
+        stack: List[Optional[str]] = []
+
+        for op, arg in program:
+            if op == CONST:
+                stack.append(None)
+            elif op == VAR:
+                stack.append(self._operand_unit(units.get(arg)))
+            elif op.startswith("Unary"):
+                # Sign changes keep the operand's unit
+                continue
+            elif op == CALL:
+                name, argc = arg
+                args = stack[len(stack) - argc :]
+                del stack[len(stack) - argc :]
+                stack.append(self._call_unit(name, args))
+            else:
+                right_unit = stack.pop()
+                left_unit = stack.pop()
+                stack.append(self._combine_units(op, left_unit, right_unit))
 
-                try:
-                    unit = self.ureg(unit_str)
-                    return f"{unit.units:~}"
-                except Exception:
-                    return unit_str
+        result = stack.pop()
+        if result:
+            return self._format_unit(result)
+        return result
 
+    def _call_unit(self, name: str, args: List[Optional[str]]) -> Optional[str]:
+        # Reductions keep their argument's unit; npv discounts its values, min/max of two values
+        # need compatible units like a sum
+        if name == "npv":
+            return args[1]
+        if len(args) == 2:
+            return self._combine_units("Add", args[0], args[1])
+        return args[0]
+
+    def _operand_unit(self, unit_str: Optional[str]) -> Optional[str]:
+        if unit_str is None or unit_str == "":
             return None
 
-        if isinstance(ast_node, dict):
-            return self._calculate_formula_with_pint(ast_node, context)
+        if unit_str in self.currency_symbols:
+            return self.currency_symbols[unit_str]
 
-    def _calculate_formula_with_pint(self, ast_node, context: Dict[str, "Parameter"]) -> Optional[str]:
-        op_type = ast_node["type"]
+        if "/" in unit_str:
+            return self._parse_compound_unit(unit_str)
 
-        if op_type in ["Add", "Subtract"]:
-            left_unit = self._calculate_with_pint(ast_node["left"], context)
-            right_unit = self._calculate_with_pint(ast_node["right"], context)
+        try:
+            unit = self.ureg(unit_str)
+            return f"{unit.units:~}"
+        except Exception:
+            return unit_str
 
+    def _combine_units(self, op_type: str, left_unit: Optional[str], right_unit: Optional[str]) -> Optional[str]:
+        if op_type in ["Add", "Subtract"]:
             if left_unit is None and right_unit is None:
                 return None
             if left_unit is None:
@@ -105,9 +179,6 @@ class UnitCalculator:
                     raise ValueError(f"Incompatible units for {op_type.lower()}: '{left_unit}' and '{right_unit}'")
 
         elif op_type == "Multiply":
-            left_unit = self._calculate_with_pint(ast_node["left"], context)
-            right_unit = self._calculate_with_pint(ast_node["right"], context)
-
             if left_unit is None and right_unit is None:
                 return None
             if left_unit is None:
@@ -121,17 +192,24 @@ class UnitCalculator:
                 return f"{result.units:~}"
 
         elif op_type == "Divide":
-            left_unit = self._calculate_with_pint(ast_node["left"], context)
-            right_unit = self._calculate_with_pint(ast_node["right"], context)
-
             if left_unit is None and right_unit is None:
                 return None
             if left_unit is None:
-                return right_unit
-            elif right_unit is None:
                 return f"1/{right_unit}"
+            elif right_unit is None:
+                return left_unit
             else:
                 left_pint = self.ureg(left_unit)
                 right_pint = self.ureg(right_unit)
                 result = left_pint / right_pint
                 return f"{result.units:~}"
+
+        return None
+
+
+@lru_cache(maxsize=8192)
+def _infer_unit(
+    program: Tuple[Tuple[str, Any], ...], operand_units: Tuple[Tuple[str, Optional[str]], ...]
+) -> Optional[str]:
+    # Memoized per (formula program, operand units), so repeated models only pay pint once
+    return UnitCalculator()._calculate_program(program, dict(operand_units))
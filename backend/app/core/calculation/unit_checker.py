@@ -0,0 +1,201 @@
+# Register-time dimensional analysis, with unit conversions folded into the compiled formulas
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from app.core.metrics import metrics
+
+from .compiler import CALL, CONST, UNARY_OPERATORS, VAR, CompiledFormula, FormulaCompiler
+from .unit_calculator import CURRENCY_SYMBOLS, UnitCalculator, get_unit_registry
+
+if TYPE_CHECKING:
+    import pint
+
+    from .model import CalculationModel
+
+# Stack entry while checking a formula: (instructions, unit, constant value). A unit of None marks
+# a bare number or unitless parameter, which takes whatever unit it is combined with.
+Operand = Tuple[List[Tuple[str, Any]], Optional["pint.Unit"], Optional[float]]
+
+
+class UnitCheckError(ValueError):
+    pass
+
+
+class UnitChecker:
+    """Infers the unit of every calculation of a model in evaluation order.
+
+    Adding or subtracting compatible but different units (kW + W, EUR + USD) scales the right
+    operand into the left one's unit, and a calculation with a declared unit is scaled into it.
+    The scale factors are appended to the formula's program, so evaluation needs no unit work.
+    """
+
+    def __init__(self, model: "CalculationModel"):
+        self.model = model
+        self.ureg = get_unit_registry()
+        self.units: Dict[str, Optional["pint.Unit"]] = {}
+        self.conversions = 0
+
+    def check(self) -> Tuple[Dict[str, CompiledFormula], Dict[str, Optional[str]]]:
+        # Returns the converted formula of each calculation, and every parameter's unit
+        formulas = {}
+        compiler = FormulaCompiler()
+
+        with metrics.stage("unit_check"):
+            for name in self.model.evaluation_order:
+                param = self.model.param_map[name]
+                declared = self._parse(name, param.unit)
+
+                if param.type != "CALCULATION":
+                    self.units[name] = declared
+                    continue
+
+                conversions = self.conversions
+                program, unit = self._check_program(name, param.compiled.program)
+                if declared is not None:
+                    # Formulas of unitless operands simply take the declared unit
+                    if unit is not None:
+                        if unit.dimensionality != declared.dimensionality:
+                            raise UnitCheckError(
+                                f"Parameter '{name}' is declared in '{self._format(declared)}' "
+                                f"but its formula yields '{self._format(unit)}'."
+                            )
+                        program = self._convert(name, program, unit, declared)
+                    unit = declared
+                self.units[name] = unit
+
+                if self.conversions > conversions:
+                    formulas[name] = compiler.compile_program(program, set(param.compiled.variables), param.formula)
+
+        return formulas, {name: self._format(unit) for name, unit in self.units.items()}
+
+    def _format(self, unit: Optional["pint.Unit"]) -> Optional[str]:
+        # Same notation as UnitCalculator; dimensionless results have no unit
+        if unit is None or unit.dimensionless:
+            return None
+        return UnitCalculator()._format_unit(f"{unit:~}")
+
+    def _parse(self, name: str, unit: Optional[str]) -> Optional["pint.Unit"]:
+        if not unit:
+            return None
+        for symbol, currency in CURRENCY_SYMBOLS.items():
+            unit = unit.replace(symbol, currency)
+        try:
+            return self.ureg.parse_units(unit)
+        except Exception:
+            raise UnitCheckError(f"Parameter '{name}' has an unknown unit '{unit}'.")
+
+    def _check_program(self, name: str, program: List[Tuple[str, Any]]) -> Tuple[List[Tuple[str, Any]], Any]:
+        stack: List[Operand] = []
+
+        for op, arg in program:
+            if op == CONST:
+                stack.append(([(op, arg)], None, arg))
+            elif op == VAR:
+                stack.append(([(op, arg)], self.units.get(arg), None))
+            elif op in UNARY_OPERATORS:
+                instructions, unit, value = stack.pop()
+                if value is not None:
+                    value = -value if op == "Unary_USub" else value
+                stack.append((instructions + [(op, None)], unit, value))
+            elif op == CALL:
+                args = stack[len(stack) - arg[1] :]
+                del stack[len(stack) - arg[1] :]
+                stack.append(self._call(name, arg, args))
+            else:
+                right = stack.pop()
+                left = stack.pop()
+                stack.append(self._combine(name, op, left, right))
+
+        instructions, unit, _ = stack.pop()
+        return instructions, unit
+
+    def _combine(self, name: str, op: str, left: Operand, right: Operand) -> Operand:
+        left_program, left_unit, left_value = left
+        right_program, right_unit, right_value = right
+        unit = None
+
+        if op in ("Add", "Subtract"):
+            if left_unit is None or right_unit is None or left_unit == right_unit:
+                unit = right_unit if left_unit is None else left_unit
+            elif left_unit.dimensionality != right_unit.dimensionality:
+                raise UnitCheckError(
+                    f"Parameter '{name}' combines incompatible units '{self._format(left_unit)}' "
+                    f"and '{self._format(right_unit)}'."
+                )
+            else:
+                right_program = self._convert(name, right_program, right_unit, left_unit)
+                unit = left_unit
+        elif op == "Multiply":
+            unit = self._product(left_unit, right_unit, 1)
+        elif op == "Divide":
+            unit = self._product(left_unit, right_unit, -1)
+        elif right_unit is not None and not right_unit.dimensionless:
+            raise UnitCheckError(
+                f"Parameter '{name}' raises to a power in '{self._format(right_unit)}', exponents must be unitless."
+            )
+        elif left_unit is not None and not left_unit.dimensionless:
+            if right_value is None:
+                raise UnitCheckError(
+                    f"Parameter '{name}' raises '{self._format(left_unit)}' to a variable power, "
+                    "exponents of values with units must be constants."
+                )
+            unit = left_unit**right_value
+
+        value = None
+        if left_value is not None and right_value is not None:
+            value = _apply(op, left_value, right_value)
+        return left_program + right_program + [(op, None)], unit, value
+
+    def _call(self, name: str, call: Tuple[str, int], args: List[Operand]) -> Operand:
+        function, argc = call
+        if function == "npv":
+            (rate_program, rate_unit, _), (program, unit, _) = args
+            if rate_unit is not None and not rate_unit.dimensionless:
+                raise UnitCheckError(
+                    f"Parameter '{name}' discounts at a rate in '{self._format(rate_unit)}', rates must be unitless."
+                )
+            return rate_program + program + [(CALL, call)], unit, None
+        if argc == 2:
+            # min/max of two values compare them, so the second is converted like an addend
+            program, unit, _ = self._combine(name, "Add", args[0], args[1])
+            return program[:-1] + [(CALL, call)], unit, None
+
+        program, unit, _ = args[0]
+        return program + [(CALL, call)], unit, None
+
+    def _product(self, left: Optional["pint.Unit"], right: Optional["pint.Unit"], power: int):
+        if right is None:
+            return left
+        if left is None:
+            return right**power
+        return left * right**power
+
+    def _convert(self, name: str, program: List[Tuple[str, Any]], unit, target) -> List[Tuple[str, Any]]:
+        if unit == target:
+            return program
+
+        # Offset units (degC vs K) can't be converted by a factor alone
+        if self.ureg.Quantity(0.0, unit).to(target).magnitude != 0:
+            raise UnitCheckError(
+                f"Parameter '{name}' converts between offset units '{self._format(unit)}' and '{self._format(target)}'."
+            )
+        factor = float(self.ureg.Quantity(1.0, unit).to(target).magnitude)
+
+        self.conversions += 1
+        return program + [(CONST, factor), ("Multiply", None)]
+
+
+def _apply(op: str, left: float, right: float) -> Optional[float]:
+    # Value of a constant subexpression, only needed for constant exponents
+    try:
+        if op == "Add":
+            return left + right
+        if op == "Subtract":
+            return left - right
+        if op == "Multiply":
+            return left * right
+        if op == "Divide":
+            return left / right
+        value = left**right
+        return value if isinstance(value, float) else None
+    except (ArithmeticError, ValueError):
+        return None
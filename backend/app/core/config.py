@@ -0,0 +1,83 @@
+# Application settings, overridable through CALC_* environment variables
+from typing import Literal
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="CALC_")
+
+    # Server-side model registry
+    registry_max_models: int = 256
+    registry_max_bytes: int = 256 * 1024 * 1024
+
+    # Compiled models shared by all worker processes as artifact files; "" puts them in /dev/shm
+    shared_store_enabled: bool = False
+    shared_store_path: str = ""
+    shared_store_max_bytes: int = 512 * 1024 * 1024
+
+    # Saved, versioned models; "memory" keeps them for the life of the process
+    model_store_backend: Literal["memory", "sqlite", "mongo"] = "memory"
+    model_store_sqlite_path: str = "models.db"
+    model_store_mongo_url: str = "mongodb://localhost:27017"
+    model_store_mongo_database: str = "calculator"
+    model_store_mongo_collection: str = "models"
+
+    # Where pint caches its parsed unit definitions; ":auto:" is the user cache directory, "" disables it
+    unit_cache_folder: str = ":auto:"
+
+    # Prime unit and formula caches at startup, before the server reports ready
+    warmup_enabled: bool = True
+
+    # Incremental recalculation sessions
+    session_max_sessions: int = 1024
+    session_ttl_seconds: float = 3600.0
+
+    # Streaming scenario evaluation
+    stream_chunk_size: int = 1024
+    stream_max_chunk_size: int = 65536
+
+    # Cartesian parameter sweeps, evaluated in chunks of stream_chunk_size scenarios
+    sweep_max_scenarios: int = 100_000_000
+    sweep_max_pareto_points: int = 10_000
+
+    # Largest decoded column accepted in a binary (.npz) batch body
+    columnar_max_bytes: int = 256 * 1024 * 1024
+
+    # Monte Carlo simulation
+    monte_carlo_max_samples: int = 1_000_000
+    monte_carlo_chunk_size: int = 10_000
+    monte_carlo_max_workers: int = 4
+
+    # Per-stage timing histograms on /metrics and Server-Timing headers
+    metrics_enabled: bool = True
+
+    # Process pool for large evaluations; 0 workers keeps everything in the threadpool
+    offload_max_workers: int = 2
+    offload_max_queue: int = 64
+    offload_min_parameters: int = 5000
+    offload_worker_max_models: int = 32
+
+    # Micro-batching of concurrent calculations for the same model; the window is the most a
+    # request waits for others to join it
+    coalesce_enabled: bool = False
+    coalesce_window_ms: float = 2.0
+    coalesce_max_batch: int = 256
+
+    # Result cache for repeated calculations; off unless enabled
+    result_cache_enabled: bool = False
+    result_cache_backend: Literal["memory", "mongo"] = "memory"
+    result_cache_max_entries: int = 10_000
+    result_cache_max_bytes: int = 64 * 1024 * 1024
+    # 0 keeps results until evicted
+    result_cache_ttl_seconds: float = 0
+    result_cache_mongo_url: str = "mongodb://localhost:27017"
+    result_cache_mongo_database: str = "calculator"
+    result_cache_mongo_collection: str = "result_cache"
+
+    # Goal-seek solving
+    solver_max_iterations: int = 1000
+    solver_max_specs: int = 256
+
+
+settings = Settings()
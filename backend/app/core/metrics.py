@@ -0,0 +1,138 @@
+# Per-stage timings and counts, exported as Prometheus text and Server-Timing headers
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from threading import Lock
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Seconds; Prometheus client defaults shifted down, since most stages take well under a millisecond
+TIME_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+SIZE_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+# Stage durations of the request being handled, in milliseconds; unset outside requests
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+_disabled = nullcontext()
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Metrics:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = Lock()
+        # (metric name, label value) -> histogram or counter
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._counters: Dict[Tuple[str, str], float] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], Dict[str, float]]]] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._labels: Dict[str, str] = {}
+
+    def describe(self, name: str, kind: str, description: str, label: str = "kind"):
+        self._help[name] = (kind, description)
+        self._labels[name] = label
+
+    def stage(self, name: str):
+        # Times the enclosed block; a shared no-op context when metrics are disabled
+        if not self.enabled:
+            return _disabled
+        return self._time_stage(name)
+
+    @contextmanager
+    def _time_stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe("calc_stage_duration_seconds", name, elapsed, TIME_BUCKETS)
+
+            timings = request_timings.get()
+            if timings is not None:
+                timings[name] = timings.get(name, 0.0) + elapsed * 1000
+
+    def observe(self, metric: str, label: str, value: float, buckets: Tuple[float, ...] = SIZE_BUCKETS):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get((metric, label))
+            if histogram is None:
+                histogram = self._histograms[(metric, label)] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, metric: str, label: str, value: float = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[(metric, label)] = self._counters.get((metric, label), 0) + value
+
+    def register_gauge(self, metric: str, label_name: str, collect: Callable[[], Dict[str, float]]):
+        # Values read at scrape time, e.g. from caches that already keep their own statistics
+        self._gauges[metric] = (label_name, collect)
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        written = set()
+
+        def header(metric: str, default_kind: str):
+            if metric not in written:
+                written.add(metric)
+                kind, description = self._help.get(metric, (default_kind, metric))
+                lines.append(f"# HELP {metric} {description}")
+                lines.append(f"# TYPE {metric} {kind}")
+
+        for (metric, label), histogram in histograms:
+            header(metric, "histogram")
+            label_name = self._labels.get(metric, "kind")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{label_name}="{label}",le="{bound:g}"}} {cumulative}')
+            cumulative += histogram.counts[-1]
+            lines.append(f'{metric}_bucket{{{label_name}="{label}",le="+Inf"}} {cumulative}')
+            lines.append(f'{metric}_sum{{{label_name}="{label}"}} {histogram.sum:.9g}')
+            lines.append(f'{metric}_count{{{label_name}="{label}"}} {cumulative}')
+
+        for (metric, label), value in counters:
+            header(metric, "counter")
+            lines.append(f'{metric}{{{self._labels.get(metric, "kind")}="{label}"}} {value:g}')
+
+        for metric, (label_name, collect) in sorted(self._gauges.items()):
+            header(metric, "gauge")
+            for label, value in sorted(collect().items()):
+                lines.append(f'{metric}{{{label_name}="{label}"}} {value:g}')
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{name};dur={duration:.3f}" for name, duration in timings.items())
+
+
+metrics = Metrics(enabled=settings.metrics_enabled)
+metrics.describe("calc_stage_duration_seconds", "histogram", "Time spent per calculation stage", label="stage")
+metrics.describe("calc_model_size", "histogram", "Parameters and dependency edges per built graph")
+metrics.describe("calc_cache_hits_total", "counter", "Cache hits by cache", label="cache")
+metrics.describe("calc_cache_misses_total", "counter", "Cache misses by cache", label="cache")
@@ -1,21 +1,275 @@
-from typing import Dict, List, Optional
+from datetime import datetime
+from typing import Dict, List, Literal, Optional, Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+# A scalar, or a time series with one value per step of the model's time axis
+Value = Union[float, List[float]]
 
 
 class ParameterSchema(BaseModel):
     name: str
     type: str
     unit: Optional[str] = None
-    value: Optional[float] = None
+    value: Optional[Value] = None
     formula: Optional[str] = None
 
 
 class CalculationRequest(BaseModel):
     parameters: List[ParameterSchema]
-    inputs: Dict[str, float]
+    inputs: Dict[str, Value]
     target: List[str]
+    # Also return derivatives of each target with respect to every input
+    sensitivity: bool = False
+    # Relative input change used for the tornado low/high values
+    swing: float = Field(0.1, gt=0)
+
+
+class TornadoEntry(BaseModel):
+    input: str
+    value: Value
+    derivative: Value
+    # Relative change in the target per relative change in the input; null when the target is zero
+    elasticity: Optional[float]
+    low: float
+    high: float
+
+
+class TargetSensitivity(BaseModel):
+    gradient: Dict[str, Value]
+    # Inputs ranked by how far they swing the target
+    tornado: List[TornadoEntry]
 
 
 class CalculationResponse(BaseModel):
+    result: List[Value]
+    sensitivity: Optional[Dict[str, TargetSensitivity]] = None
+
+
+class BatchCalculationRequest(BaseModel):
+    parameters: List[ParameterSchema]
+    inputs: Dict[str, Union[float, List[float]]]
+    target: List[str]
+
+
+class ModelBatchCalculationRequest(BaseModel):
+    inputs: Dict[str, Union[float, List[float]]]
+    target: List[str]
+
+
+class BatchCalculationResponse(BaseModel):
+    # One column per target, one value per scenario; null where a scenario has no finite result
+    result: List[List[Optional[float]]]
+
+
+class ModelRegistrationRequest(BaseModel):
+    parameters: List[ParameterSchema]
+    # Reject dimensionally invalid formulas and convert between compatible units when evaluating
+    check_units: bool = False
+
+
+class ModelRegistrationResponse(BaseModel):
+    model_id: str
+    parameter_count: int
+
+
+class StoredModelResponse(BaseModel):
+    name: str
+    version: int
+    # Content hash to calculate with, as returned by model registration
+    model_id: str
+    check_units: bool
+    created_at: datetime
+
+
+class StoredModelVersionsResponse(BaseModel):
+    name: str
+    versions: List[StoredModelResponse]
+
+
+class StoredModelDetailResponse(StoredModelResponse):
+    parameters: List[ParameterSchema]
+    units: Dict[str, Optional[str]]
+
+
+class ModelCalculationRequest(BaseModel):
+    inputs: Dict[str, Value]
+    target: List[str]
+    sensitivity: bool = False
+    swing: float = Field(0.1, gt=0)
+
+
+class ModelUnitsResponse(BaseModel):
+    units: Dict[str, Optional[str]]
+
+
+class OptimizationStatsResponse(BaseModel):
+    formulas: int
+    # Operations and operands across the individual formula trees
+    source_nodes: int
+    # Nodes left in the shared DAG after folding and common-subexpression elimination
+    nodes: int
+    eliminated: int
+    folded: int
+    shared: int
+
+
+class ResultCacheStatsResponse(BaseModel):
+    enabled: bool
+    backend: str
+    hits: int
+    misses: int
+    entries: Optional[int] = None
+    # Only tracked by the in-memory backend
+    bytes: Optional[int] = None
+    evictions: Optional[int] = None
+    expirations: Optional[int] = None
+
+
+class RegistryStatsResponse(BaseModel):
+    models: int
+    bytes: int
+    max_models: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    # Only reported with the shared model store enabled
+    shared_loads: Optional[int] = None
+    shared_publishes: Optional[int] = None
+    shared_stale: Optional[int] = None
+
+
+class SessionCreateRequest(BaseModel):
+    model_id: str
+    inputs: Dict[str, float]
+    target: List[str]
+
+
+class SessionResponse(BaseModel):
+    session_id: str
     result: List[float]
+
+
+class SessionUpdateRequest(BaseModel):
+    inputs: Dict[str, float]
+
+
+class SessionUpdateResponse(BaseModel):
+    # Only the targets whose value changed
+    changed: Dict[str, float]
+    recomputed: int
+
+
+class DistributionSpec(BaseModel):
+    distribution: Literal["normal", "uniform", "triangular", "lognormal"]
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    low: Optional[float] = None
+    high: Optional[float] = None
+    mode: Optional[float] = None
+    sigma: Optional[float] = None
+
+
+class SimulationRequest(BaseModel):
+    inputs: Dict[str, Union[float, DistributionSpec]]
+    target: List[str]
+    samples: int = Field(10_000, ge=1)
+    seed: Optional[int] = None
+    percentiles: List[float] = [5, 50, 95]
+    workers: int = Field(1, ge=1)
+
+
+class TargetStatistics(BaseModel):
+    mean: Optional[float]
+    std: Optional[float]
+    percentiles: Dict[str, Optional[float]]
+    # Samples without a finite result, e.g. after a division by zero
+    invalid: int
+
+
+class SimulationResponse(BaseModel):
+    results: Dict[str, TargetStatistics]
+    samples: int
+    elapsed_ms: float
+
+
+class SweepRange(BaseModel):
+    start: float
+    stop: float
+    # Number of evenly spaced levels, start and stop included
+    steps: int = Field(ge=1)
+
+
+class SweepRequest(BaseModel):
+    # Levels of each swept input; every combination is evaluated, the last input varying fastest
+    axes: Dict[str, Union[List[float], SweepRange]]
+    # Values for the inputs that stay fixed across the sweep
+    inputs: Dict[str, float] = {}
+    target: List[str]
+    # "results" streams one NDJSON line per scenario, "aggregate" returns only the extremes and
+    # the Pareto front
+    mode: Literal["results", "aggregate"] = "aggregate"
+    # Targets to minimize or maximize together, for the Pareto front
+    pareto: Dict[str, Literal["min", "max"]] = {}
+
+
+class SweepPoint(BaseModel):
+    index: int
+    # Values of the swept inputs
+    inputs: Dict[str, float]
+    # Results of every target
+    result: List[Optional[float]]
+
+
+class SweepExtremes(BaseModel):
+    min: Optional[float]
+    max: Optional[float]
+    argmin: Optional[SweepPoint]
+    argmax: Optional[SweepPoint]
+    # Scenarios without a finite result, e.g. after a division by zero
+    invalid: int
+
+
+class SweepResponse(BaseModel):
+    results: Dict[str, SweepExtremes]
+    # Scenarios no other scenario beats on every Pareto objective, by index
+    pareto: List[SweepPoint]
+    scenarios: int
+    elapsed_ms: float
+
+
+class GoalSeekSpec(BaseModel):
+    target: str
+    value: float
+    # The free input varied to make the target equal value
+    input: str
+    lower: Optional[float] = None
+    upper: Optional[float] = None
+    # Newton start point; defaults to the bracket midpoint or the input's current value
+    initial: Optional[float] = None
+    method: Literal["brent", "bisection", "newton"] = "brent"
+
+
+class SolveRequest(BaseModel):
+    # Values for the inputs that stay fixed while solving
+    inputs: Dict[str, Value]
+    solve: List[GoalSeekSpec]
+    tolerance: float = Field(1e-9, gt=0)
+    max_iterations: int = Field(100, ge=1)
+
+
+class SolveResult(BaseModel):
+    target: str
+    input: str
+    solution: Optional[float]
+    residual: Optional[float]
+    iterations: int
+    converged: bool
+    elapsed_ms: float
+    message: Optional[str] = None
+
+
+class SolveResponse(BaseModel):
+    solutions: List[SolveResult]
+    elapsed_ms: float
@@ -0,0 +1,24 @@
+# One-off startup work, done before the server reports ready instead of on the first requests
+from app.core.calculation.batch import BatchCalculator
+from app.core.calculation.calculator import Calculator
+from app.core.calculation.model import CalculationModel
+from app.core.calculation.unit_calculator import UnitCalculator
+from app.core.metrics import metrics
+
+# Touches every operator, units that need pint and a currency, so each lazily built piece is primed
+WARMUP_PARAMETERS = [
+    {"name": "load", "type": "USER", "unit": "kW"},
+    {"name": "hours", "type": "GLOBAL", "value": 8760, "unit": "h"},
+    {"name": "price", "type": "GLOBAL", "value": 0.1, "unit": "$/kWh"},
+    {"name": "energy", "type": "CALCULATION", "formula": "load * hours"},
+    {"name": "cost", "type": "CALCULATION", "formula": "-(energy * price) / 2 + energy ** 0 - 1"},
+]
+
+
+def warmup():
+    with metrics.stage("warmup"):
+        model = CalculationModel.from_definitions(WARMUP_PARAMETERS)
+        UnitCalculator.resolve_units(model)
+        Calculator(model.parameters, {"load": 1.0}, model=model).evaluate(["cost"])
+        Calculator(model.parameters, {"load": 1.0}, model=model, optimize=True).evaluate(["cost"])
+        BatchCalculator(model.parameters, {"load": [1.0, 2.0]}, model=model).evaluate(["cost"])
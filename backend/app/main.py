@@ -1,12 +1,43 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 
+from .api.v1.cache import router as cache_router
 from .api.v1.calculate import router as calculation_router
+from .api.v1.models import router as models_router
+from .api.v1.sessions import router as sessions_router
+from .api.v1.store import router as store_router
+from .core.calculation.coalescer import request_coalescer
+from .core.calculation.compiler import compile_formula
+from .core.calculation.model_store import model_store
+from .core.calculation.offload import evaluation_pool
+from .core.calculation.registry import model_registry
+from .core.calculation.result_cache import result_cache
+from .core.calculation.unit_calculator import _infer_unit
+from .core.config import settings
+from .core.metrics import metrics, request_timings, server_timing
+from .core.warmup import warmup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The server only accepts requests once this returns, so the first ones don't pay for cold caches
+    if settings.warmup_enabled:
+        await run_in_threadpool(warmup)
+    yield
+    # Worker processes are only started on first use, but must not outlive the server
+    evaluation_pool.shutdown()
+
 
 app = FastAPI(
     title="Parameter Calculator API",
     description="A calculation engine for parameter dependencies",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -17,7 +48,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def stage_timing(request: Request, call_next):
+    if not metrics.enabled:
+        return await call_next(request)
+
+    # Stages running in this request, including in threadpool workers, add to this dict
+    timings = {}
+    token = request_timings.set(timings)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_timings.reset(token)
+
+    timings["total"] = (time.perf_counter() - start) * 1000
+    response.headers["Server-Timing"] = server_timing(timings)
+    return response
+
+
+def cache_stats(cache_info) -> dict:
+    return {"hits": cache_info.hits, "misses": cache_info.misses, "size": cache_info.currsize}
+
+
+metrics.register_gauge("calc_compiled_formula_cache", "kind", lambda: cache_stats(compile_formula.cache_info()))
+metrics.register_gauge("calc_unit_cache", "kind", lambda: cache_stats(_infer_unit.cache_info()))
+metrics.register_gauge("calc_model_registry", "kind", model_registry.stats)
+metrics.register_gauge("calc_evaluation_pool", "kind", evaluation_pool.stats)
+metrics.register_gauge("calc_coalescer", "kind", request_coalescer.stats)
+metrics.register_gauge(
+    "calc_result_cache",
+    "kind",
+    lambda: {name: value for name, value in result_cache.stats().items() if isinstance(value, (int, float))},
+)
+metrics.register_gauge(
+    "calc_model_store",
+    "kind",
+    lambda: {name: value for name, value in model_store.stats().items() if isinstance(value, (int, float))},
+)
+
 app.include_router(calculation_router, prefix="/api/v1", tags=["calculations"])
+app.include_router(models_router, prefix="/api/v1", tags=["models"])
+app.include_router(sessions_router, prefix="/api/v1", tags=["sessions"])
+app.include_router(cache_router, prefix="/api/v1", tags=["cache"])
+app.include_router(store_router, prefix="/api/v1", tags=["store"])
 
 
 @app.get("/")
@@ -30,6 +105,11 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,71 @@
+# Throughput of concurrent calculations against one model, evaluated one by one in the threadpool
+# as /calculate does by default, and micro-batched by the request coalescer. HTTP and JSON are
+# left out, since in-process clients would dominate the timings.
+#
+# Usage (from backend/): python -m benchmarks.coalescing --sizes 100 1000 10000 --requests 1000
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.calculation.calculator import Calculator
+from app.core.calculation.coalescer import RequestCoalescer
+from app.core.calculation.model import CalculationModel
+from benchmarks.generator import generate_definitions, generate_inputs, output_names
+
+
+async def measure(evaluate, scenarios, targets):
+    latencies = []
+
+    async def call(scenario):
+        start = time.perf_counter()
+        await evaluate(scenario, targets)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call(scenario) for scenario in scenarios))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return len(scenarios) / elapsed, statistics.median(latencies) * 1000, latencies[-1] * 1000
+
+
+async def run(sizes: List[int], requests: int, window_ms: float, max_batch: int, seed: int):
+    print(f"{'nodes':>10} {'mode':>10} {'req/s':>10} {'p50 ms':>10} {'max ms':>10}")
+
+    for size in sizes:
+        definitions = generate_definitions(size, seed=seed)
+        model = CalculationModel.from_definitions(definitions)
+        inputs = generate_inputs(definitions, seed=seed)
+        targets = output_names(definitions)[:10]
+        scenarios = [{name: value + index % 7 for name, value in inputs.items()} for index in range(requests)]
+
+        async def single(scenario, targets):
+            calculator = Calculator(model.parameters, scenario, model=model, optimize=True)
+            return await run_in_threadpool(calculator.evaluate, targets)
+
+        coalescer = RequestCoalescer(window_ms, max_batch, enabled=True)
+
+        async def coalesced(scenario, targets):
+            return await coalescer.evaluate(model.model_id, lambda: model, scenario, targets)
+
+        for mode, evaluate in (("single", single), ("coalesced", coalesced)):
+            # The first pass builds the model's plans, so both modes are timed on warm caches
+            await measure(evaluate, scenarios[:10], targets)
+            throughput, p50, worst = await measure(evaluate, scenarios, targets)
+            print(f"{size:>10} {mode:>10} {throughput:>10.0f} {p50:>10.2f} {worst:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-batching throughput benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.sizes, args.requests, args.window_ms, args.max_batch, args.seed))
@@ -0,0 +1,42 @@
+# Scaling benchmark for DependencyGraph construction and topological sort
+#
+# Usage (from backend/): python -m benchmarks.dependency_graph --sizes 1000 10000 100000
+import argparse
+import time
+from typing import List
+
+from app.core.calculation.dependency_graph import DependencyGraph
+from benchmarks.generator import generate_parameters
+
+
+def run(sizes: List[int], depth: int, fan_in: int, repeat: int, seed: int):
+    print(f"{'nodes':>10} {'edges':>10} {'build ms':>10} {'sort ms':>10} {'ns/(V+E)':>10}")
+
+    for size in sizes:
+        parameters = generate_parameters(size, depth=depth, fan_in=fan_in, seed=seed)
+        edges = sum(len(p.dependencies) for p in parameters)
+
+        build_times, sort_times = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            graph = DependencyGraph(parameters)
+            built = time.perf_counter()
+            graph.topological_sort()
+            build_times.append(built - start)
+            sort_times.append(time.perf_counter() - built)
+
+        build, sort = min(build_times), min(sort_times)
+        per_element = (build + sort) / (size + edges) * 1e9
+        print(f"{size:>10} {edges:>10} {build * 1e3:>10.2f} {sort * 1e3:>10.2f} {per_element:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DependencyGraph scaling benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--depth", type=int, default=10)
+    parser.add_argument("--fan-in", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.sizes, args.depth, args.fan_in, args.repeat, args.seed)
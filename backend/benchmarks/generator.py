@@ -0,0 +1,78 @@
+# Synthetic parameter models for benchmarks
+import random
+from typing import Any, Dict, List
+
+from app.core.calculation.compiler import compile_formula
+from app.core.calculation.parameter import Parameter
+
+# Extra operations appended to formulas for complexity; chosen to keep values finite at any depth
+COMPLEXITY_TERMS = ["* 1.01", "+ 0.5", "- 0.25", "/ 1.02"]
+
+
+def generate_definitions(
+    size: int,
+    depth: int = 10,
+    fan_in: int = 3,
+    complexity: int = 0,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """Parameter definitions for a layered model.
+
+    A tenth of the parameters (at least one) are USER inputs in layer 0. The rest are CALCULATION
+    parameters spread over ``depth`` layers, each averaging ``fan_in`` parameters from earlier
+    layers with at least one from the layer directly below, so the longest dependency chain is
+    ``depth``. ``complexity`` adds that many constant operations to every formula.
+    """
+    rng = random.Random(seed)
+    inputs = max(1, size // 10)
+    calculations = size - inputs
+    depth = max(1, min(depth, calculations))
+
+    definitions: List[Dict[str, Any]] = [{"name": f"p{i}", "type": "USER", "unit": "kW"} for i in range(inputs)]
+    layers = [list(range(inputs))]
+    earlier = list(range(inputs))
+
+    for layer in range(depth):
+        count = calculations // depth + (1 if layer < calculations % depth else 0)
+        start = len(definitions)
+
+        for i in range(start, start + count):
+            deps = {rng.choice(layers[-1])}
+            while len(deps) < min(fan_in, len(earlier)):
+                deps.add(rng.choice(earlier))
+
+            formula = f"({' + '.join(f'p{dep}' for dep in sorted(deps))}) / {len(deps)}"
+            for _ in range(complexity):
+                formula = f"({formula} {rng.choice(COMPLEXITY_TERMS)})"
+            definitions.append({"name": f"p{i}", "type": "CALCULATION", "formula": formula})
+
+        layers.append(list(range(start, start + count)))
+        earlier.extend(layers[-1])
+
+    # Shuffle so nothing can benefit from definitions already being in dependency order
+    rng.shuffle(definitions)
+    return definitions
+
+
+def generate_parameters(
+    size: int,
+    depth: int = 10,
+    fan_in: int = 3,
+    complexity: int = 0,
+    seed: int = 0,
+) -> List[Parameter]:
+    return [Parameter(definition) for definition in generate_definitions(size, depth, fan_in, complexity, seed)]
+
+
+def generate_inputs(definitions: List[Dict[str, Any]], seed: int = 0) -> Dict[str, float]:
+    rng = random.Random(seed)
+    return {d["name"]: rng.uniform(1, 100) for d in definitions if d["type"] == "USER"}
+
+
+def output_names(definitions: List[Dict[str, Any]]) -> List[str]:
+    # Parameters nothing else depends on; evaluating them touches the whole model
+    used = set()
+    for definition in definitions:
+        if definition["type"] == "CALCULATION":
+            used.update(compile_formula(definition["formula"]).variables)
+    return sorted(d["name"] for d in definitions if d["type"] == "CALCULATION" and d["name"] not in used)
@@ -0,0 +1,140 @@
+# End-to-end benchmark of the calculation engine stages on synthetic models
+#
+# Usage (from backend/):
+#   python -m benchmarks.suite --sizes 100 1000 10000 --output bench.json
+#   python -m benchmarks.suite --sizes 100 1000 10000 --compare bench.json
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.testclient import TestClient
+
+from app.core.calculation.calculator import Calculator
+from app.core.calculation.dependency_graph import DependencyGraph
+from app.core.calculation.model import CalculationModel
+from app.core.calculation.parser import FormulaParser
+from app.core.calculation.unit_calculator import UnitCalculator, _infer_unit
+from app.main import app
+from benchmarks.generator import generate_definitions, generate_inputs, output_names
+
+STAGES = ["parse", "graph_build", "graph_sort", "calculate", "units", "api"]
+
+
+def time_stage(function: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return {"min_ms": min(times), "median_ms": statistics.median(times)}
+
+
+def benchmark_model(
+    size: int, depth: int, fan_in: int, complexity: int, repeat: int, seed: int, client: TestClient
+) -> Dict[str, Any]:
+    definitions = generate_definitions(size, depth, fan_in, complexity, seed)
+    inputs = generate_inputs(definitions, seed)
+    targets = output_names(definitions)
+    model = CalculationModel.from_definitions(definitions)
+    parameters = model.parameters
+    formulas = [d["formula"] for d in definitions if d["type"] == "CALCULATION"]
+    parser = FormulaParser()
+
+    def parse():
+        for formula in formulas:
+            parser.parse_formula_to_ast(formula)
+
+    def calculate():
+        # A fresh model each time, as /calculate builds one per request
+        Calculator(parameters=parameters, inputs=inputs).evaluate(targets)
+
+    graph = DependencyGraph(parameters)
+    request_body = {"parameters": definitions, "inputs": inputs, "target": targets}
+
+    stages = {
+        "parse": time_stage(parse, repeat),
+        "graph_build": time_stage(lambda: DependencyGraph(parameters), repeat),
+        "graph_sort": time_stage(graph.topological_sort, repeat),
+        "calculate": time_stage(calculate, repeat),
+        # Unit inference is memoized per formula shape; clear it to time the cold path
+        "units": time_stage(lambda: UnitCalculator.resolve_units(model), repeat, setup=_infer_unit.cache_clear),
+        "api": time_stage(lambda: client.post("/api/v1/calculate", json=request_body).raise_for_status(), repeat),
+    }
+
+    return {
+        "size": size,
+        "depth": depth,
+        "fan_in": fan_in,
+        "complexity": complexity,
+        "edges": sum(len(p.dependencies) for p in parameters),
+        "targets": len(targets),
+        "stages": stages,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes: List[int], depth: int, fan_in: int, complexity: int, repeat: int, seed: int) -> Dict[str, Any]:
+    client = TestClient(app)
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "results": [benchmark_model(size, depth, fan_in, complexity, repeat, seed, client) for size in sizes],
+    }
+
+
+def report(report_data: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    # Median milliseconds per stage; with a baseline, the ratio to it (> 1 is slower)
+    baseline_results = {}
+    if baseline is not None:
+        baseline_results = {(r["size"], r["depth"], r["fan_in"], r["complexity"]): r for r in baseline["results"]}
+
+    print(f"{'size':>8} {'edges':>8} " + " ".join(f"{stage:>16}" for stage in STAGES))
+    for result in report_data["results"]:
+        previous = baseline_results.get((result["size"], result["depth"], result["fan_in"], result["complexity"]))
+        cells = []
+        for stage in STAGES:
+            median = result["stages"][stage]["median_ms"]
+            cell = f"{median:.2f}"
+            if previous is not None:
+                cell += f" ({median / previous['stages'][stage]['median_ms']:.2f}x)"
+            cells.append(f"{cell:>16}")
+        print(f"{result['size']:>8} {result['edges']:>8} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calculation engine benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000])
+    parser.add_argument("--depth", type=int, default=10)
+    parser.add_argument("--fan-in", type=int, default=3)
+    parser.add_argument("--complexity", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.depth, args.fan_in, args.complexity, args.repeat, args.seed)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
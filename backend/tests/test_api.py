@@ -1,10 +1,30 @@
+import io
+import json
+import threading
+
+import numpy as np
+import pytest
 from fastapi.testclient import TestClient
 
+from app.core.calculation.coalescer import request_coalescer
+from app.core.calculation.offload import evaluation_pool
+from app.core.calculation.registry import model_registry
+from app.core.calculation.result_cache import result_cache
 from app.main import app
 
 client = TestClient(app)
 
 
+def post_with_timeout(url: str, timeout: float = 10.0, **kwargs):
+    # Streaming endpoints read the body while responding; fail instead of hanging the suite
+    outcome = {}
+    worker = threading.Thread(target=lambda: outcome.update(response=client.post(url, **kwargs)), daemon=True)
+    worker.start()
+    worker.join(timeout)
+    assert not worker.is_alive(), f"POST {url} did not finish within {timeout}s"
+    return outcome["response"]
+
+
 def test_calculation():
     """Test the calculation api endpoints"""
     request_body = {
@@ -29,3 +49,579 @@ def test_calculation():
     assert response.status_code == 200
 
     assert response.json() == {"result": [550.0]}
+
+
+def test_batch_calculation():
+    """Test the batch calculation endpoint with per-scenario inputs"""
+    request_body = {
+        "parameters": [
+            {"name": "tax_rate", "type": "GLOBAL", "value": 0.2},
+            {"name": "price", "type": "USER"},
+            {"name": "quantity", "type": "USER"},
+            {"name": "subtotal", "type": "CALCULATION", "formula": "price * quantity"},
+            {"name": "total", "type": "CALCULATION", "formula": "subtotal * (1 + tax_rate)"},
+        ],
+        "inputs": {"price": [100, 200, 300], "quantity": 2},
+        "target": ["subtotal", "total", "tax_rate"],
+    }
+
+    response = client.post("/api/v1/calculate/batch", json=request_body)
+    assert response.status_code == 200
+
+    assert response.json() == {
+        "result": [
+            [200.0, 400.0, 600.0],
+            [240.0, 480.0, 720.0],
+            [0.2, 0.2, 0.2],
+        ]
+    }
+
+
+def test_batch_calculation_errors():
+    """Non-finite scenarios come back as null, invalid batches as 422"""
+    parameters = [
+        {"name": "k", "type": "GLOBAL", "value": 1},
+        {"name": "x", "type": "USER"},
+        {"name": "ratio", "type": "CALCULATION", "formula": "k / x"},
+    ]
+
+    response = client.post(
+        "/api/v1/calculate/batch", json={"parameters": parameters, "inputs": {"x": [0, 4]}, "target": ["ratio"]}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"result": [[None, 0.25]]}
+
+    response = client.post(
+        "/api/v1/calculate/batch",
+        json={"parameters": parameters, "inputs": {"x": [1, 2], "k": [1, 2, 3]}, "target": ["ratio"]},
+    )
+    assert response.status_code == 422
+    assert "same number of scenarios" in response.json()["detail"]
+
+    response = client.post(
+        "/api/v1/calculate/batch", json={"parameters": parameters, "inputs": {}, "target": ["ratio"]}
+    )
+    assert response.status_code == 422
+
+    constant = [{"name": "k", "type": "GLOBAL", "value": 1}, {"name": "r", "type": "CALCULATION", "formula": "k / 0"}]
+    response = client.post("/api/v1/calculate/batch", json={"parameters": constant, "inputs": {}, "target": ["r"]})
+    assert response.json() == {"result": [[None]]}
+
+
+def test_registered_model_calculation():
+    """Register a model once and calculate against it by id"""
+    parameters = [
+        {"name": "price", "type": "USER"},
+        {"name": "quantity", "type": "USER"},
+        {"name": "subtotal", "type": "CALCULATION", "formula": "price * quantity"},
+    ]
+
+    response = client.post("/api/v1/models", json={"parameters": parameters})
+    assert response.status_code == 200
+    model_id = response.json()["model_id"]
+    assert response.json()["parameter_count"] == 3
+
+    # Registering the same content again returns the same id
+    response = client.post("/api/v1/models", json={"parameters": list(reversed(parameters))})
+    assert response.json()["model_id"] == model_id
+
+    for price, expected in [(10, 50.0), (20, 100.0)]:
+        response = client.post(
+            f"/api/v1/calculate/{model_id}",
+            json={"inputs": {"price": price, "quantity": 5}, "target": ["subtotal"]},
+        )
+        assert response.status_code == 200
+        assert response.json() == {"result": [expected]}
+
+    response = client.post("/api/v1/calculate/unknown", json={"inputs": {}, "target": []})
+    assert response.status_code == 404
+
+    response = client.get(f"/api/v1/models/{model_id}/optimization")
+    assert response.status_code == 200
+    assert response.json()["nodes"] == 3
+
+    response = client.get("/api/v1/models/stats")
+    assert response.json()["hits"] >= 2
+    assert response.json()["misses"] >= 1
+
+    cyclic = [
+        {"name": "a", "type": "CALCULATION", "formula": "b + 1"},
+        {"name": "b", "type": "CALCULATION", "formula": "a + 1"},
+    ]
+    response = client.post("/api/v1/models", json={"parameters": cyclic})
+    assert response.status_code == 422
+
+
+def test_calculation_session():
+    """Create a session, send an input delta and read back only changed targets"""
+    parameters = [
+        {"name": "price", "type": "USER"},
+        {"name": "quantity", "type": "USER"},
+        {"name": "shipping", "type": "USER"},
+        {"name": "subtotal", "type": "CALCULATION", "formula": "price * quantity"},
+        {"name": "total", "type": "CALCULATION", "formula": "subtotal + shipping"},
+    ]
+    model_id = client.post("/api/v1/models", json={"parameters": parameters}).json()["model_id"]
+
+    response = client.post(
+        "/api/v1/sessions",
+        json={
+            "model_id": model_id,
+            "inputs": {"price": 10, "quantity": 2, "shipping": 5},
+            "target": ["subtotal", "total"],
+        },
+    )
+    assert response.status_code == 200
+    session_id = response.json()["session_id"]
+    assert response.json()["result"] == [20.0, 25.0]
+
+    response = client.patch(f"/api/v1/sessions/{session_id}", json={"inputs": {"shipping": 7}})
+    assert response.status_code == 200
+    assert response.json() == {"changed": {"total": 27.0}, "recomputed": 1}
+
+    response = client.patch(f"/api/v1/sessions/{session_id}", json={"inputs": {"unknown": 1}})
+    assert response.status_code == 422
+
+    response = client.post(
+        "/api/v1/sessions", json={"model_id": model_id, "inputs": {"price": 10}, "target": ["total"]}
+    )
+    assert response.status_code == 422
+
+    assert client.delete(f"/api/v1/sessions/{session_id}").status_code == 204
+    assert client.get(f"/api/v1/sessions/{session_id}").status_code == 404
+
+
+def test_unit_checked_model():
+    """Models registered with check_units convert between units and reject invalid formulas"""
+    parameters = [
+        {"name": "it_load", "type": "USER", "unit": "kW"},
+        {"name": "lighting", "type": "GLOBAL", "value": 500, "unit": "W"},
+        {"name": "load", "type": "CALCULATION", "formula": "it_load + lighting"},
+    ]
+    response = client.post("/api/v1/models", json={"parameters": parameters, "check_units": True})
+    assert response.status_code == 200
+    model_id = response.json()["model_id"]
+    assert model_id != client.post("/api/v1/models", json={"parameters": parameters}).json()["model_id"]
+
+    response = client.post(f"/api/v1/calculate/{model_id}", json={"inputs": {"it_load": 2}, "target": ["load"]})
+    assert response.json() == {"result": [2.5]}
+    assert client.get(f"/api/v1/models/{model_id}/units").json()["units"]["load"] == "kW"
+
+    invalid = [*parameters, {"name": "bad", "type": "CALCULATION", "formula": "load + 1", "unit": "h"}]
+    response = client.post("/api/v1/models", json={"parameters": invalid, "check_units": True})
+    assert response.status_code == 422
+    assert "declared in 'h'" in response.json()["detail"]
+
+
+def test_time_series_calculation():
+    """List values are time series that formulas reduce with sum, cumsum, min, max and npv"""
+    parameters = [
+        {"name": "revenue", "type": "USER"},
+        {"name": "rate", "type": "GLOBAL", "value": 0.1},
+        {"name": "cash", "type": "CALCULATION", "formula": "revenue - 50"},
+        {"name": "total", "type": "CALCULATION", "formula": "sum(cash)"},
+        {"name": "pv", "type": "CALCULATION", "formula": "npv(rate, cash)"},
+    ]
+    inputs = {"revenue": [110, 171, 50]}
+    response = client.post(
+        "/api/v1/calculate", json={"parameters": parameters, "inputs": inputs, "target": ["cash", "total", "pv"]}
+    )
+    assert response.status_code == 200
+    cash, total, pv = response.json()["result"]
+    assert cash == [60, 121, 0]
+    assert total == 181
+    assert pv == pytest.approx(60 / 1.1 + 121 / 1.1**2)
+
+    model_id = client.post("/api/v1/models", json={"parameters": parameters}).json()["model_id"]
+    response = client.post(
+        f"/api/v1/calculate/{model_id}/batch", json={"inputs": {"revenue": [1, 2]}, "target": ["total"]}
+    )
+    assert response.status_code == 422
+
+
+def test_delete_model():
+    """Deleted models are no longer available"""
+    parameters = [{"name": "x", "type": "USER"}, {"name": "y", "type": "CALCULATION", "formula": "x * 3"}]
+    model_id = client.post("/api/v1/models", json={"parameters": parameters}).json()["model_id"]
+
+    assert client.delete(f"/api/v1/models/{model_id}").status_code == 204
+    response = client.post(f"/api/v1/calculate/{model_id}", json={"inputs": {"x": 1}, "target": ["y"]})
+    assert response.status_code == 404
+    assert client.delete(f"/api/v1/models/{model_id}").status_code == 404
+
+
+def test_model_store():
+    """Stored models are versioned, and their model_id works even after leaving the registry"""
+    parameters = [{"name": "x", "type": "USER"}, {"name": "y", "type": "CALCULATION", "formula": "x * 3"}]
+    saved = client.post("/api/v1/store/api-test", json={"parameters": parameters}).json()
+    assert saved["version"] == 1
+    client.post("/api/v1/store/api-test", json={"parameters": [*parameters, {"name": "z", "type": "USER"}]})
+
+    versions = client.get("/api/v1/store/api-test").json()["versions"]
+    assert [version["version"] for version in versions] == [1, 2]
+    assert client.get("/api/v1/store/api-test/latest").json()["version"] == 2
+    detail = client.get("/api/v1/store/api-test/1").json()
+    assert detail["model_id"] == saved["model_id"]
+    assert [param["name"] for param in detail["parameters"]] == ["x", "y"]
+
+    model_registry.clear()
+    response = client.post(f"/api/v1/calculate/{saved['model_id']}", json={"inputs": {"x": 2}, "target": ["y"]})
+    assert response.json() == {"result": [6.0]}
+
+    assert client.get("/api/v1/store/api-test/3").status_code == 404
+    assert client.get("/api/v1/store/api-test/first").status_code == 422
+    invalid = client.post(
+        "/api/v1/store/api-test", json={"parameters": [{"name": "y", "type": "CALCULATION", "formula": "y"}]}
+    )
+    assert invalid.status_code == 422
+    assert client.delete("/api/v1/store/api-test").status_code == 204
+    assert client.get("/api/v1/store/api-test").status_code == 404
+
+
+def test_binary_batch_calculation():
+    """Registered-model batches take and return .npz columns, with JSON as the default"""
+    parameters = [
+        {"name": "pue", "type": "USER"},
+        {"name": "it_load", "type": "USER"},
+        {"name": "facility_load", "type": "CALCULATION", "formula": "it_load * pue"},
+        {"name": "per_kw", "type": "CALCULATION", "formula": "facility_load / it_load"},
+    ]
+    model_id = client.post("/api/v1/models", json={"parameters": parameters}).json()["model_id"]
+
+    body = io.BytesIO()
+    np.savez(body, pue=np.array([1.2, 1.5, 2.0]), it_load=np.array([100.0, 0.0, 50.0]))
+    response = client.post(
+        f"/api/v1/calculate/{model_id}/batch",
+        params={"target": ["facility_load", "per_kw"]},
+        content=body.getvalue(),
+        headers={"Content-Type": "application/x-npz", "Accept": "application/x-npz"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-npz"
+    with np.load(io.BytesIO(response.content)) as result:
+        assert result["facility_load"].tolist() == [120.0, 0.0, 100.0]
+        assert np.isnan(result["per_kw"][1])
+
+    # Binary in, JSON out
+    response = client.post(
+        f"/api/v1/calculate/{model_id}/batch",
+        params={"target": ["facility_load"]},
+        content=body.getvalue(),
+        headers={"Content-Type": "application/x-npz"},
+    )
+    assert response.json() == {"result": [[120.0, 0.0, 100.0]]}
+
+    # JSON in, binary out
+    response = client.post(
+        f"/api/v1/calculate/{model_id}/batch",
+        json={"inputs": {"pue": [1.5, 2.0], "it_load": 10}, "target": ["per_kw"]},
+        headers={"Accept": "application/x-npz"},
+    )
+    with np.load(io.BytesIO(response.content)) as result:
+        assert result["per_kw"].tolist() == [1.5, 2.0]
+
+    response = client.post(
+        f"/api/v1/calculate/{model_id}/batch",
+        content=body.getvalue(),
+        headers={"Content-Type": "application/x-npz"},
+    )
+    assert response.status_code == 422
+
+    response = client.post(
+        f"/api/v1/calculate/{model_id}/batch",
+        params={"target": ["facility_load"]},
+        content=b"garbage",
+        headers={"Content-Type": "application/x-npz"},
+    )
+    assert response.status_code == 422
+    assert client.post(f"/api/v1/calculate/{model_id}/batch", json={"inputs": {}}).status_code == 422
+
+
+def test_streaming_calculation():
+    """Stream NDJSON scenarios through a registered model in small chunks"""
+    parameters = [
+        {"name": "pue", "type": "USER"},
+        {"name": "it_load", "type": "GLOBAL", "value": 100},
+        {"name": "facility_load", "type": "CALCULATION", "formula": "it_load * pue"},
+    ]
+    model_id = client.post("/api/v1/models", json={"parameters": parameters}).json()["model_id"]
+
+    pues = [1.0 + i / 100 for i in range(25)]
+    body = "\n".join(json.dumps({"pue": pue}) for pue in pues)
+
+    response = post_with_timeout(
+        f"/api/v1/calculate/{model_id}/stream",
+        params={"target": ["facility_load", "pue"], "chunk_size": 10},
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == len(pues)
+    assert lines[5] == {"result": [100 * pues[5], pues[5]]}
+
+    response = post_with_timeout(
+        f"/api/v1/calculate/{model_id}/stream",
+        params={"target": ["facility_load"]},
+        content='{"pue": 1.2}\nnot json\n',
+    )
+    assert "error" in json.loads(response.text.splitlines()[-1])
+
+    response = post_with_timeout(
+        f"/api/v1/calculate/{model_id}/stream",
+        params={"target": ["facility_load"]},
+        content='{"pue": null}\n',
+    )
+    assert "must be a number" in json.loads(response.text.splitlines()[-1])["error"]
+
+
+def test_streaming_non_finite_results():
+    """Division by zero streams as null so every line stays valid JSON"""
+    parameters = [
+        {"name": "x", "type": "USER"},
+        {"name": "ratio", "type": "CALCULATION", "formula": "1 / x"},
+    ]
+    model_id = client.post("/api/v1/models", json={"parameters": parameters}).json()["model_id"]
+
+    response = post_with_timeout(
+        f"/api/v1/calculate/{model_id}/stream",
+        params={"target": ["ratio"]},
+        content='{"x": 0}\n{"x": 4}\n',
+    )
+    assert [json.loads(line) for line in response.text.splitlines()] == [{"result": [None]}, {"result": [0.25]}]
+
+
+def test_parameter_sweep():
+    """Sweeps evaluate every combination of input levels, aggregated or streamed"""
+    parameters = [
+        {"name": "it_load", "type": "USER"},
+        {"name": "pue", "type": "USER"},
+        {"name": "capex", "type": "CALCULATION", "formula": "it_load * 1000 / pue"},
+        {"name": "opex", "type": "CALCULATION", "formula": "it_load * pue * 100"},
+    ]
+    model_id = client.post("/api/v1/models", json={"parameters": parameters}).json()["model_id"]
+    sweep = {
+        "axes": {"it_load": [100, 200], "pue": {"start": 1.0, "stop": 2.0, "steps": 3}},
+        "target": ["capex", "opex"],
+    }
+
+    response = client.post(
+        f"/api/v1/calculate/{model_id}/sweep", json={**sweep, "pareto": {"capex": "min", "opex": "min"}}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["scenarios"] == 6
+    assert body["results"]["opex"]["max"] == 40000
+    assert body["results"]["opex"]["argmax"] == {
+        "index": 5,
+        "inputs": {"it_load": 200, "pue": 2.0},
+        "result": [100000, 40000],
+    }
+    assert [point["index"] for point in body["pareto"]] == [0, 1, 2]
+
+    response = post_with_timeout(
+        f"/api/v1/calculate/{model_id}/sweep", params={"chunk_size": 4}, json={**sweep, "mode": "results"}
+    )
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 6
+    assert lines[4] == {"index": 4, "inputs": {"it_load": 200, "pue": 1.5}, "result": [200000 / 1.5, 30000]}
+
+    response = client.post(f"/api/v1/calculate/{model_id}/sweep", json={**sweep, "axes": {"it_load": [1]}})
+    assert response.status_code == 422
+    assert "pue" in response.json()["detail"]
+
+
+def test_simulation():
+    """Monte Carlo simulation over a registered model returns per-target statistics"""
+    parameters = [
+        {"name": "price", "type": "USER"},
+        {"name": "quantity", "type": "USER"},
+        {"name": "subtotal", "type": "CALCULATION", "formula": "price * quantity"},
+    ]
+    model_id = client.post("/api/v1/models", json={"parameters": parameters}).json()["model_id"]
+
+    request_body = {
+        "inputs": {"price": {"distribution": "uniform", "low": 10, "high": 20}, "quantity": 2},
+        "target": ["subtotal"],
+        "samples": 5000,
+        "seed": 1,
+    }
+    response = client.post(f"/api/v1/calculate/{model_id}/simulate", json=request_body)
+    assert response.status_code == 200
+
+    stats = response.json()["results"]["subtotal"]
+    assert 29 < stats["mean"] < 31
+    assert set(stats["percentiles"]) == {"p5", "p50", "p95"}
+    assert client.post(f"/api/v1/calculate/{model_id}/simulate", json=request_body).json()["results"] == {
+        "subtotal": stats
+    }
+
+    request_body["inputs"]["price"] = {"distribution": "normal", "mean": 10}
+    response = client.post(f"/api/v1/calculate/{model_id}/simulate", json=request_body)
+    assert response.status_code == 422
+
+
+def test_calculation_sensitivity():
+    """Sensitivity mode returns gradients and ranked tornado data next to the result"""
+    request_body = {
+        "parameters": [
+            {"name": "price", "type": "USER"},
+            {"name": "quantity", "type": "USER"},
+            {"name": "subtotal", "type": "CALCULATION", "formula": "price * quantity"},
+        ],
+        "inputs": {"price": 100, "quantity": 5},
+        "target": ["subtotal"],
+        "sensitivity": True,
+    }
+
+    response = client.post("/api/v1/calculate", json=request_body)
+    assert response.status_code == 200
+
+    body = response.json()
+    assert body["result"] == [500.0]
+    assert body["sensitivity"]["subtotal"]["gradient"] == {"price": 5.0, "quantity": 100.0}
+    assert body["sensitivity"]["subtotal"]["tornado"][0]["low"] == 450.0
+
+    model_id = client.post("/api/v1/models", json={"parameters": request_body["parameters"]}).json()["model_id"]
+    response = client.post(
+        f"/api/v1/calculate/{model_id}",
+        json={"inputs": {"price": 100}, "target": ["subtotal"], "sensitivity": True},
+    )
+    assert response.status_code == 422
+
+
+def test_goal_seek():
+    """Solve for the input that brings a target to a desired value"""
+    parameters = [
+        {"name": "price", "type": "USER"},
+        {"name": "quantity", "type": "USER"},
+        {"name": "subtotal", "type": "CALCULATION", "formula": "price * quantity"},
+    ]
+    model_id = client.post("/api/v1/models", json={"parameters": parameters}).json()["model_id"]
+
+    response = client.post(
+        f"/api/v1/calculate/{model_id}/solve",
+        json={
+            "inputs": {"quantity": 4},
+            "solve": [
+                {"target": "subtotal", "value": 100, "input": "price", "lower": 0, "upper": 1000},
+                {"target": "subtotal", "value": 100, "input": "price", "method": "newton", "initial": 1},
+            ],
+        },
+    )
+    assert response.status_code == 200
+
+    solutions = response.json()["solutions"]
+    assert [solution["converged"] for solution in solutions] == [True, True]
+    assert abs(solutions[0]["solution"] - 25) < 1e-6
+    assert abs(solutions[1]["solution"] - 25) < 1e-6
+
+    response = client.post(
+        f"/api/v1/calculate/{model_id}/solve",
+        json={"inputs": {"quantity": 4}, "solve": [{"target": "subtotal", "value": 100, "input": "price"}]},
+    )
+    assert response.status_code == 422
+
+
+def test_metrics():
+    """Stage timings show up as Server-Timing headers and Prometheus histograms"""
+    request_body = {
+        "parameters": [
+            {"name": "price", "type": "USER"},
+            {"name": "quantity", "type": "USER"},
+            {"name": "subtotal", "type": "CALCULATION", "formula": "price * quantity"},
+        ],
+        "inputs": {"price": 100, "quantity": 5},
+        "target": ["subtotal"],
+    }
+
+    response = client.post("/api/v1/calculate", json=request_body)
+    stages = {entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")}
+    assert {"graph_build", "graph_sort", "evaluate", "total"} <= stages
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "# TYPE calc_stage_duration_seconds histogram" in response.text
+    assert 'calc_stage_duration_seconds_count{stage="evaluate"}' in response.text
+    assert 'calc_model_size_bucket{kind="parameters",le="10"}' in response.text
+    assert 'calc_compiled_formula_cache{kind="hits"}' in response.text
+
+
+def test_offloaded_calculation(monkeypatch):
+    """Models above the size threshold are evaluated in the process pool, or rejected with 503 when it is full"""
+    request_body = {
+        "parameters": [
+            {"name": "price", "type": "USER"},
+            {"name": "quantity", "type": "USER"},
+            {"name": "subtotal", "type": "CALCULATION", "formula": "price * quantity"},
+        ],
+        "inputs": {"price": 100, "quantity": 5},
+        "target": ["subtotal"],
+    }
+    monkeypatch.setattr(evaluation_pool, "min_parameters", 1)
+    try:
+        response = client.post("/api/v1/calculate", json=request_body)
+        assert response.status_code == 200
+        assert response.json() == {"result": [500.0]}
+
+        monkeypatch.setattr(evaluation_pool, "max_queue", 0)
+        response = client.post("/api/v1/calculate", json=request_body)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+    finally:
+        evaluation_pool.shutdown()
+
+
+def test_coalesced_calculation(monkeypatch):
+    """With micro-batching on, concurrent calculations return the same results as without"""
+    parameters = [
+        {"name": "price", "type": "USER"},
+        {"name": "quantity", "type": "USER"},
+        {"name": "subtotal", "type": "CALCULATION", "formula": "price * quantity"},
+    ]
+    model_id = client.post("/api/v1/models", json={"parameters": parameters}).json()["model_id"]
+    monkeypatch.setattr(request_coalescer, "enabled", True)
+
+    response = client.post(
+        "/api/v1/calculate",
+        json={"parameters": parameters, "inputs": {"price": 3, "quantity": 5}, "target": ["subtotal"]},
+    )
+    assert response.json() == {"result": [15.0]}
+
+    response = client.post(
+        f"/api/v1/calculate/{model_id}", json={"inputs": {"price": 4, "quantity": 5}, "target": ["subtotal"]}
+    )
+    assert response.json() == {"result": [20.0]}
+    assert request_coalescer.stats()["pending"] == 0
+
+
+def test_result_cache(monkeypatch):
+    """Exact repeats are served from the result cache once it is enabled"""
+    request_body = {
+        "parameters": [
+            {"name": "price", "type": "USER"},
+            {"name": "quantity", "type": "USER"},
+            {"name": "subtotal", "type": "CALCULATION", "formula": "price * quantity"},
+        ],
+        "inputs": {"price": 100, "quantity": 5},
+        "target": ["subtotal"],
+    }
+    monkeypatch.setattr(result_cache, "enabled", True)
+    client.delete("/api/v1/cache")
+
+    for _ in range(3):
+        assert client.post("/api/v1/calculate", json=request_body).json() == {"result": [500.0]}
+
+    model_id = client.post("/api/v1/models", json={"parameters": request_body["parameters"]}).json()["model_id"]
+    response = client.post(
+        f"/api/v1/calculate/{model_id}", json={"inputs": request_body["inputs"], "target": ["subtotal"]}
+    )
+    assert response.json() == {"result": [500.0]}
+
+    stats = client.get("/api/v1/cache/stats").json()
+    # Registered models share the content hash of the same definitions sent inline
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (3, 1, 1)
+    assert stats["enabled"] is True
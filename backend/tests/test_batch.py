@@ -0,0 +1,45 @@
+import pytest
+
+from app.core.calculation.batch import BatchCalculator
+from app.core.calculation.calculator import Calculator
+from app.core.calculation.parameter import Parameter
+
+
+class TestBatchCalculator:
+    parameter_dicts = [
+        {"name": "it_load", "type": "INPUT"},
+        {"name": "pue", "type": "INPUT"},
+        {"name": "price", "type": "GLOBAL", "value": 0.12},
+        {"name": "energy", "type": "CALCULATION", "formula": "it_load * pue * 8760"},
+        {"name": "cost", "type": "CALCULATION", "formula": "energy * price"},
+    ]
+
+    def test_matches_scalar_calculator(self):
+        pues = [1.1, 1.25, 1.5, 2.0]
+        parameters = [Parameter(param) for param in self.parameter_dicts]
+
+        calculator = BatchCalculator(parameters, {"it_load": 1000.0, "pue": pues})
+        result = calculator.evaluate(["energy", "cost"])
+
+        for index, pue in enumerate(pues):
+            scalar = Calculator([Parameter(param) for param in self.parameter_dicts], {"it_load": 1000.0, "pue": pue})
+            expected = scalar.evaluate(["energy", "cost"])["result"]
+            assert [result["result"][0][index], result["result"][1][index]] == pytest.approx(expected)
+
+    def test_mismatched_scenario_counts(self):
+        parameters = [Parameter(param) for param in self.parameter_dicts]
+
+        with pytest.raises(ValueError, match="same number of scenarios"):
+            BatchCalculator(parameters, {"it_load": [1.0, 2.0], "pue": [1.1, 1.2, 1.3]})
+
+    def test_division_by_zero_does_not_fail_batch(self):
+        parameters = [
+            Parameter({"name": "x", "type": "INPUT"}),
+            Parameter({"name": "ratio", "type": "CALCULATION", "formula": "1 / x"}),
+        ]
+
+        calculator = BatchCalculator(parameters, {"x": [0.0, 4.0]})
+        column = calculator.evaluate_arrays(["ratio"])[0]
+
+        assert column[1] == 0.25
+        assert column[0] == float("inf")
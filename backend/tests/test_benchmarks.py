@@ -0,0 +1,45 @@
+import json
+
+from app.core.calculation.dependency_graph import DependencyGraph
+from benchmarks import coalescing, suite
+from benchmarks.generator import generate_definitions, generate_parameters, output_names
+
+
+def longest_chain(parameters):
+    graph = DependencyGraph(parameters)
+    depth = {}
+    for name in graph.topological_sort():
+        depth[name] = max((depth[dep] + 1 for dep in graph.graph[name]), default=0)
+    return max(depth.values())
+
+
+class TestGenerator:
+    def test_shape(self):
+        definitions = generate_definitions(200, depth=5, fan_in=3, complexity=2, seed=1)
+
+        assert len(definitions) == 200
+        assert sum(d["type"] == "USER" for d in definitions) == 20
+        assert longest_chain(generate_parameters(200, depth=5, fan_in=3, seed=1)) == 5
+        assert generate_definitions(200, depth=5, fan_in=3, complexity=2, seed=1) == definitions
+        assert output_names(definitions)
+
+
+class TestSuite:
+    def test_run_writes_comparable_json(self, tmp_path):
+        results = suite.run([50], depth=3, fan_in=2, complexity=1, repeat=1, seed=0)
+
+        path = tmp_path / "bench.json"
+        path.write_text(json.dumps(results))
+        stages = json.loads(path.read_text())["results"][0]["stages"]
+
+        assert set(stages) == set(suite.STAGES)
+        assert all(stage["median_ms"] >= 0 for stage in stages.values())
+        suite.report(results, baseline=results)
+
+
+class TestCoalescingBenchmark:
+    async def test_runs(self, capsys):
+        await coalescing.run([30], requests=20, window_ms=1, max_batch=8, seed=0)
+
+        output = capsys.readouterr().out
+        assert "single" in output and "coalesced" in output
@@ -1,6 +1,7 @@
 import pytest
 
 from app.core.calculation.calculator import Calculator
+from app.core.calculation.model import CalculationModel
 from app.core.calculation.parameter import Parameter
 
 
@@ -230,3 +231,46 @@ class TestCalculator:
 
         with pytest.raises(ValueError, match="CALCULATION parameter 'invalid' requires formula"):
             Parameter({"name": "invalid", "type": "CALCULATION"})  # Missing formula
+
+    def test_target_pruning(self):
+        """Only ancestors of the requested targets are evaluated"""
+        parameter_dicts = [
+            {"name": "it_load", "type": "USER"},
+            {"name": "unused_input", "type": "USER"},
+            {"name": "pue", "type": "GLOBAL", "value": 1.2},
+            {"name": "facility_load", "type": "CALCULATION", "formula": "it_load * pue"},
+            {"name": "unrelated", "type": "CALCULATION", "formula": "unused_input * 2"},
+        ]
+
+        parameters = [Parameter(param) for param in parameter_dicts]
+        model = CalculationModel(parameters)
+
+        # unused_input is missing, which only matters if "unrelated" gets evaluated
+        calculator = Calculator(parameters, {"it_load": 100.0}, model=model)
+        assert calculator.evaluate(["facility_load"])["result"] == [120.0]
+
+        plan = model.evaluation_plan(["facility_load"])
+        assert set(plan) == {"it_load", "pue", "facility_load"}
+        assert model.evaluation_plan(["facility_load"]) is plan
+
+        with pytest.raises(KeyError):
+            Calculator(parameters, {"it_load": 100.0}, model=model).evaluate(["unrelated"])
+
+    def test_input_override_prunes_upstream(self):
+        """A calculation supplied as an input doesn't need its own dependencies"""
+        parameter_dicts = [
+            {"name": "it_load", "type": "USER"},
+            {"name": "pue", "type": "USER"},
+            {"name": "facility_load", "type": "CALCULATION", "formula": "it_load * pue"},
+            {"name": "cost", "type": "CALCULATION", "formula": "facility_load * 2"},
+        ]
+
+        parameters = [Parameter(param) for param in parameter_dicts]
+        model = CalculationModel(parameters)
+
+        calculator = Calculator(parameters, {"facility_load": 50.0}, model=model)
+        assert calculator.evaluate(["cost"])["result"] == [100.0]
+        assert model.evaluation_plan(["cost"], ["facility_load"]) == ["facility_load", "cost"]
+
+        # Without the override the full closure is still planned
+        assert set(model.evaluation_plan(["cost"])) == {"it_load", "pue", "facility_load", "cost"}
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.calculation.calculator import Calculator
+from app.core.calculation.coalescer import RequestCoalescer
+from app.core.calculation.model import CalculationModel
+
+DEFINITIONS = [
+    {"name": "it_load", "type": "USER"},
+    {"name": "pue", "type": "USER"},
+    {"name": "hours", "type": "GLOBAL", "value": 8760},
+    {"name": "energy", "type": "CALCULATION", "formula": "it_load * pue * hours"},
+    {"name": "per_pue", "type": "CALCULATION", "formula": "energy / pue"},
+]
+
+
+@pytest.fixture
+def model():
+    return CalculationModel.from_definitions(DEFINITIONS)
+
+
+def evaluate(coalescer, model, inputs, targets):
+    return coalescer.evaluate(model.model_id, lambda: model, inputs, targets)
+
+
+class TestRequestCoalescer:
+    async def test_concurrent_requests_share_one_batch(self, model):
+        coalescer = RequestCoalescer(window_ms=20, max_batch=100, enabled=True)
+        scenarios = [{"it_load": float(load), "pue": 1.0 + load / 10} for load in range(1, 21)]
+
+        results = await asyncio.gather(*(evaluate(coalescer, model, s, ["energy", "per_pue"]) for s in scenarios))
+
+        assert coalescer.stats() == {"requests": 20, "batches": 1, "pending": 0}
+        for scenario, result in zip(scenarios, results):
+            expected = Calculator(model.parameters, scenario, model=model).evaluate(["energy", "per_pue"])
+            assert result == pytest.approx(expected)
+
+    async def test_full_batches_do_not_wait_for_the_window(self, model):
+        coalescer = RequestCoalescer(window_ms=10_000, max_batch=4, enabled=True)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(evaluate(coalescer, model, {"it_load": 1.0, "pue": 2.0}, ["energy"]) for _ in range(8)))
+
+        assert time.perf_counter() - start < 5
+        assert coalescer.stats()["batches"] == 2
+
+    async def test_added_latency_is_bounded_by_the_window(self, model):
+        coalescer = RequestCoalescer(window_ms=5, max_batch=100, enabled=True)
+
+        start = time.perf_counter()
+        assert await evaluate(coalescer, model, {"it_load": 1.0, "pue": 1.0}, ["energy"]) == {"result": [8760.0]}
+        assert time.perf_counter() - start < 1
+
+    async def test_batches_are_split_by_targets_and_input_names(self, model):
+        coalescer = RequestCoalescer(window_ms=20, max_batch=100, enabled=True)
+
+        results = await asyncio.gather(
+            evaluate(coalescer, model, {"it_load": 1.0, "pue": 1.0}, ["energy"]),
+            evaluate(coalescer, model, {"it_load": 1.0, "pue": 1.0}, ["per_pue"]),
+            evaluate(coalescer, model, {"it_load": 1.0, "pue": 1.0, "hours": 1.0}, ["energy"]),
+            evaluate(coalescer, model, {"it_load": 2.0, "pue": 1.0}, ["energy"]),
+        )
+
+        assert [result["result"] for result in results] == [[8760.0], [8760.0], [1.0], [17520.0]]
+        assert coalescer.stats()["batches"] == 3
+
+    async def test_errors_only_fail_their_own_request(self, model):
+        coalescer = RequestCoalescer(window_ms=20, max_batch=100, enabled=True)
+
+        results = await asyncio.gather(
+            evaluate(coalescer, model, {"it_load": 1.0, "pue": 0.0}, ["per_pue"]),
+            evaluate(coalescer, model, {"it_load": 1.0, "pue": 2.0}, ["per_pue"]),
+            return_exceptions=True,
+        )
+
+        assert isinstance(results[0], ZeroDivisionError)
+        assert results[1] == {"result": [8760.0]}
+
+        with pytest.raises(KeyError):
+            await asyncio.gather(
+                evaluate(coalescer, model, {"it_load": 1.0}, ["energy"]),
+                evaluate(coalescer, model, {"it_load": 2.0}, ["energy"]),
+            )
@@ -0,0 +1,59 @@
+import io
+import zipfile
+
+import numpy as np
+import pytest
+
+from app.core.calculation.columnar import accepts_npz, read_npz, write_npz
+
+
+def npz_bytes(compressed=False, **columns):
+    buffer = io.BytesIO()
+    (np.savez_compressed if compressed else np.savez)(buffer, **columns)
+    return buffer.getvalue()
+
+
+class TestColumnar:
+    def test_round_trip(self):
+        body = write_npz(["a", "b"], [np.arange(5.0), np.array([np.inf, np.nan])])
+        columns = read_npz(body, max_bytes=1024)
+
+        assert columns["a"].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+        assert np.isinf(columns["b"][0]) and np.isnan(columns["b"][1])
+
+    def test_stored_columns_are_views_of_the_body(self):
+        body = npz_bytes(x=np.arange(1000.0), scalar=np.float64(2.5), ints=np.arange(3))
+        columns = read_npz(body, max_bytes=1 << 20)
+
+        assert np.shares_memory(columns["x"], np.frombuffer(body, dtype=np.uint8))
+        assert not columns["x"].flags.writeable
+        assert columns["x"].tolist() == list(np.arange(1000.0))
+        assert columns["scalar"].shape == () and columns["scalar"] == 2.5
+        assert columns["ints"].tolist() == [0, 1, 2]
+
+    def test_compressed_and_non_native_columns(self):
+        columns = read_npz(npz_bytes(compressed=True, x=np.arange(4.0)), max_bytes=1024)
+        assert columns["x"].tolist() == [0.0, 1.0, 2.0, 3.0]
+
+        columns = read_npz(npz_bytes(x=np.arange(4.0).astype(">f8")), max_bytes=1024)
+        assert columns["x"].tolist() == [0.0, 1.0, 2.0, 3.0]
+
+    def test_invalid_bodies(self):
+        with pytest.raises(ValueError, match="Invalid .npz body"):
+            read_npz(b"not a zip", max_bytes=1024)
+        with pytest.raises(ValueError, match="must be numeric"):
+            read_npz(npz_bytes(x=np.array(["a", "b"])), max_bytes=1024)
+        with pytest.raises(ValueError, match="exceeds 100 bytes"):
+            read_npz(npz_bytes(compressed=True, x=np.zeros(1000)), max_bytes=100)
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("notes.txt", "hello")
+        with pytest.raises(ValueError, match="Unexpected member"):
+            read_npz(buffer.getvalue(), max_bytes=1024)
+
+    def test_accepts_npz(self):
+        assert accepts_npz("application/x-npz")
+        assert accepts_npz("application/json;q=0.5, application/x-npz")
+        assert not accepts_npz("application/json")
+        assert not accepts_npz("")
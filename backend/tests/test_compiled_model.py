@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.core.calculation.calculator import Calculator
+from app.core.calculation.model import CalculationModel
+from app.core.calculation.parameter import Parameter
+
+
+def make_model(extra=()):
+    parameter_dicts = [
+        {"name": "it_load", "type": "USER"},
+        {"name": "pue", "type": "USER"},
+        {"name": "hours", "type": "GLOBAL", "value": 8760},
+        {"name": "energy", "type": "CALCULATION", "formula": "it_load * pue * hours"},
+        {"name": "capex", "type": "CALCULATION", "formula": "it_load * 1000"},
+        {"name": "tco", "type": "CALCULATION", "formula": "capex + energy"},
+        *extra,
+    ]
+    return CalculationModel([Parameter(param) for param in parameter_dicts])
+
+
+class TestCompiledModel:
+    def test_slots_follow_evaluation_order(self):
+        model = make_model()
+        compiled = model.compiled
+
+        assert compiled.names == tuple(model.evaluation_order)
+        assert [compiled.slots[name] for name in model.evaluation_order] == list(range(len(compiled.names)))
+        assert compiled.template[compiled.slots["hours"]] == 8760.0
+
+    def test_run_into_flat_buffer(self):
+        compiled = make_model().compiled
+        buffer = compiled.run({"it_load": 100.0, "pue": 1.5}, ["tco"])
+
+        assert compiled.read(buffer, {}, ["tco", "energy"]) == [100000.0 + 1314000.0, 1314000.0]
+        # Running never touches the shared template
+        assert np.isnan(compiled.template[compiled.slots["energy"]])
+
+    def test_run_into_numpy_buffer(self):
+        compiled = make_model().compiled
+        buffer = compiled.run({"it_load": np.array([1.0, 2.0]), "pue": 1.5}, ["tco"], size=2)
+
+        assert buffer.shape == (len(compiled.names), 2)
+        assert compiled.read(buffer, {}, ["tco"])[0].tolist() == [1000.0 + 13140.0, 2000.0 + 26280.0]
+
+    def test_inputs_override_statics_and_calculations(self):
+        compiled = make_model().compiled
+
+        buffer = compiled.run({"it_load": 1.0, "hours": 1.0, "pue": 1.0}, ["energy"])
+        assert compiled.read(buffer, {}, ["energy"]) == [1.0]
+
+        # pue isn't needed once energy is provided
+        buffer = compiled.run({"it_load": 1.0, "energy": 5.0}, ["tco"])
+        assert compiled.read(buffer, {}, ["tco"]) == [1005.0]
+
+    def test_missing_inputs(self):
+        compiled = make_model([{"name": "other", "type": "INPUT"}]).compiled
+
+        with pytest.raises(KeyError):
+            compiled.run({"it_load": 1.0}, ["tco"])
+        with pytest.raises(ValueError, match="Parameter 'other' could not be resolved"):
+            compiled.run({}, ["other"])
+
+    def test_invalid_static_only_fails_runs_that_need_it(self):
+        compiled = make_model([{"name": "bad", "type": "COMPANY", "value": "n/a"}]).compiled
+
+        compiled.run({"it_load": 1.0, "pue": 1.0}, ["tco"])
+        with pytest.raises(ValueError, match="invalid numeric value"):
+            compiled.run({}, ["bad"])
+
+    def test_immutable(self):
+        model = make_model()
+
+        with pytest.raises(AttributeError):
+            model.compiled.names = ()
+        with pytest.raises(TypeError):
+            model.compiled.slots["tco"] = 0
+        with pytest.raises(AttributeError):
+            model.parameters[0].result = 1.0
+
+    def test_concurrent_runs_share_one_model(self):
+        model = make_model()
+
+        def run(load):
+            return Calculator(model.parameters, {"it_load": float(load), "pue": 1.0}, model=model).evaluate(["tco"])
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(run, range(200)))
+
+        assert results == [{"result": [load * 1000.0 + load * 8760.0]} for load in range(200)]
+
+    def test_deep_formula_falls_back_to_program(self):
+        formula = "(" * 150 + "it_load" + " + 1)" * 150
+        compiled = make_model([{"name": "deep", "type": "CALCULATION", "formula": formula}]).compiled
+
+        buffer = compiled.run({"it_load": 1.0}, ["deep"])
+        assert compiled.read(buffer, {}, ["deep"]) == [151.0]
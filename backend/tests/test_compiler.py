@@ -0,0 +1,47 @@
+import pytest
+
+from app.core.calculation.calculator import Calculator
+from app.core.calculation.compiler import FormulaCompiler, compile_formula
+from app.core.calculation.parameter import Parameter
+
+
+class TestFormulaCompiler:
+    def test_compiled_formula_matches_operators(self):
+        compiled = compile_formula("(a + b) * c - a / b + -c ** 2")
+        assert compiled.is_native
+        assert compiled.variables == {"a", "b", "c"}
+
+        context = {"a": 6.0, "b": 3.0, "c": 2.0}
+        assert compiled(context) == (6.0 + 3.0) * 2.0 - 6.0 / 3.0 + -(2.0**2)
+        assert compiled.run_program(context) == compiled(context)
+
+    def test_compiled_plans_are_cached_by_formula_text(self):
+        first = Parameter({"name": "a", "type": "CALCULATION", "formula": "x * 2"})
+        second = Parameter({"name": "b", "type": "CALCULATION", "formula": "x * 2"})
+
+        assert first.compiled is second.compiled
+        assert compile_formula("x * 2") is first.compiled
+
+    def test_missing_variable(self):
+        compiled = compile_formula("x + y")
+
+        with pytest.raises(ValueError, match="Variable 'y' not found in context"):
+            compiled({"x": 1.0})
+
+    def test_deep_formula_uses_iterative_fallback(self):
+        depth = 2000
+        parameter_dicts = [
+            {"name": "x", "type": "INPUT"},
+            {"name": "result", "type": "CALCULATION", "formula": " + ".join(["x"] * depth)},
+        ]
+
+        parameters = [Parameter(param) for param in parameter_dicts]
+        assert not parameters[1].compiled.is_native
+
+        calculator = Calculator(parameters, {"x": 0.5})
+        result = calculator.evaluate(["result"])
+        assert result["result"] == [depth * 0.5]
+
+    def test_unsupported_unary_operator(self):
+        with pytest.raises(ValueError, match="Unsupported unary operator"):
+            FormulaCompiler().compile("not x")
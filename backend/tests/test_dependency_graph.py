@@ -0,0 +1,50 @@
+import pytest
+
+from app.core.calculation.dependency_graph import DependencyGraph
+from app.core.calculation.parameter import Parameter
+
+
+class TestDependencyGraph:
+    def test_topological_order_and_reverse_index(self):
+        parameter_dicts = [
+            {"name": "total", "type": "CALCULATION", "formula": "a + b"},
+            {"name": "b", "type": "CALCULATION", "formula": "a * 2"},
+            {"name": "a", "type": "USER"},
+        ]
+
+        graph = DependencyGraph([Parameter(param) for param in parameter_dicts])
+        order = graph.topological_sort()
+
+        assert order == ["a", "b", "total"]
+        assert sorted(graph.dependants["a"]) == ["b", "total"]
+        assert graph.dependants["total"] == []
+
+    def test_long_chain(self):
+        size = 20_000
+        parameters = [Parameter({"name": "p0", "type": "USER"})]
+        parameters += [
+            Parameter({"name": f"p{i}", "type": "CALCULATION", "formula": f"p{i - 1} + 1"}) for i in range(1, size)
+        ]
+
+        order = DependencyGraph(list(reversed(parameters))).topological_sort()
+        assert order == [f"p{i}" for i in range(size)]
+
+    def test_cycle_path_is_reported(self):
+        parameter_dicts = [
+            {"name": "x", "type": "USER"},
+            {"name": "downstream", "type": "CALCULATION", "formula": "c * 2"},
+            {"name": "a", "type": "CALCULATION", "formula": "x + c"},
+            {"name": "b", "type": "CALCULATION", "formula": "a + 1"},
+            {"name": "c", "type": "CALCULATION", "formula": "b + 1"},
+        ]
+
+        graph = DependencyGraph([Parameter(param) for param in parameter_dicts])
+
+        with pytest.raises(ValueError, match="Cycle detected in parameter dependencies: c -> b -> a -> c"):
+            graph.topological_sort()
+
+    def test_self_reference(self):
+        graph = DependencyGraph([Parameter({"name": "a", "type": "CALCULATION", "formula": "a + 1"})])
+
+        with pytest.raises(ValueError, match="a -> a"):
+            graph.topological_sort()
@@ -0,0 +1,40 @@
+from app.core.metrics import Metrics, request_timings, server_timing
+
+
+class TestMetrics:
+    def test_stage_records_histogram_and_request_timings(self):
+        metrics = Metrics()
+        timings = {}
+        token = request_timings.set(timings)
+        try:
+            with metrics.stage("parse"):
+                pass
+            with metrics.stage("parse"):
+                pass
+        finally:
+            request_timings.reset(token)
+
+        assert list(timings) == ["parse"]
+        assert server_timing(timings).startswith("parse;dur=")
+
+        text = metrics.render()
+        assert 'calc_stage_duration_seconds_count{kind="parse"} 2' in text
+        assert 'calc_stage_duration_seconds_bucket{kind="parse",le="+Inf"} 2' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        metrics = Metrics()
+        for value in [5, 50, 500]:
+            metrics.observe("calc_model_size", "edges", value)
+
+        text = metrics.render()
+        assert 'calc_model_size_bucket{kind="edges",le="10"} 1' in text
+        assert 'calc_model_size_bucket{kind="edges",le="1000"} 3' in text
+        assert 'calc_model_size_sum{kind="edges"} 555' in text
+
+    def test_disabled_records_nothing(self):
+        metrics = Metrics(enabled=False)
+        with metrics.stage("parse"):
+            pass
+        metrics.increment("calc_cache_hits_total", "evaluation_plan")
+
+        assert metrics.render() == "\n"
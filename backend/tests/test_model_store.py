@@ -0,0 +1,165 @@
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from app.core.calculation import artifact
+from app.core.calculation.calculator import Calculator
+from app.core.calculation.model_store import (
+    MemoryModelStoreBackend,
+    ModelStore,
+    MongoModelStoreBackend,
+    SqliteModelStoreBackend,
+    VersionConflictError,
+)
+
+
+def make_definitions(factor: float):
+    return [
+        {"name": "it_load", "type": "USER", "unit": "kW"},
+        {"name": "hours", "type": "GLOBAL", "value": 8760, "unit": "h"},
+        {"name": "factor", "type": "GLOBAL", "value": factor},
+        {"name": "energy", "type": "CALCULATION", "formula": "it_load * hours * factor"},
+    ]
+
+
+class FakeCursor(list):
+    def sort(self, key, direction):
+        return FakeCursor(sorted(self, key=lambda document: document[key], reverse=direction < 0))
+
+
+class FakeCollection:
+    # The subset of a pymongo collection the model store backend uses
+    def __init__(self):
+        self.documents = {}
+        self.indexes = []
+
+    def create_index(self, keys, **options):
+        self.indexes.append((keys, options))
+
+    def _matches(self, query):
+        return [doc for doc in self.documents.values() if all(doc.get(key) == value for key, value in query.items())]
+
+    def insert_one(self, document):
+        if document["_id"] in self.documents:
+            raise DuplicateKeyError("duplicate")
+        self.documents[document["_id"]] = dict(document)
+
+    def find_one(self, query, sort=None):
+        documents = FakeCursor(self._matches(query))
+        if sort:
+            documents = documents.sort(*sort[0])
+        return documents[0] if documents else None
+
+    def find(self, query, projection=None):
+        excluded = [key for key, value in (projection or {}).items() if not value]
+        return FakeCursor({k: v for k, v in doc.items() if k not in excluded} for doc in self._matches(query))
+
+    def update_one(self, query, update):
+        for document in self._matches(query):
+            document.update(update["$set"])
+
+    def delete_many(self, query):
+        matches = self._matches(query)
+        for document in matches:
+            del self.documents[document["_id"]]
+        return SimpleNamespace(deleted_count=len(matches))
+
+    def estimated_document_count(self):
+        return len(self.documents)
+
+
+@pytest.fixture(params=["memory", "sqlite", "mongo"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return ModelStore(MemoryModelStoreBackend())
+    if request.param == "sqlite":
+        return ModelStore(SqliteModelStoreBackend(str(tmp_path / "models.db")))
+    return ModelStore(MongoModelStoreBackend(FakeCollection()))
+
+
+class TestModelStore:
+    def test_versions(self, store):
+        first, _ = store.save("cooling", make_definitions(1.0))
+        second, _ = store.save("cooling", make_definitions(2.0))
+        again, _ = store.save("cooling", make_definitions(2.0))
+        third, _ = store.save("cooling", make_definitions(1.0))
+
+        assert [first.version, second.version, again.version, third.version] == [1, 2, 2, 3]
+        assert third.model_id == first.model_id
+        assert [record.version for record in store.versions("cooling")] == [1, 2, 3]
+        assert store.get("cooling").version == 3
+        assert store.get("cooling", 2).definitions == make_definitions(2.0)
+        assert store.get("cooling", 4) is None
+        assert store.get("other") is None
+
+    def test_saved_models_load_without_compiling(self, store):
+        record, model = store.save("cooling", make_definitions(2.0))
+        assert record.units["it_load"] == "kW"
+
+        loaded = store.find(model.model_id)
+        assert loaded.param_map["energy"].ast is None
+        for candidate in (model, loaded):
+            calculator = Calculator(candidate.parameters, {"it_load": 1.0}, model=candidate)
+            assert calculator.evaluate(["energy"]) == {"result": [17520.0]}
+        assert store.find("unknown") is None
+        assert store.stats()["loads"] == 1
+
+    def test_unit_checked_models(self, store):
+        record, model = store.save("checked", make_definitions(1.0), check_units=True)
+
+        assert record.check_units
+        assert record.units["energy"] == "h * kW"
+        assert store.load(store.get("checked")).units == model.units
+
+    @pytest.mark.parametrize(
+        "name,definitions,message",
+        [
+            ("bad name!", make_definitions(1.0), "Model name"),
+            ("cycle", [{"name": "a", "type": "CALCULATION", "formula": "a + 1"}], "Cycle"),
+            (
+                "units",
+                [*make_definitions(1.0), {"name": "x", "type": "CALCULATION", "formula": "it_load + hours"}],
+                "units",
+            ),
+        ],
+    )
+    def test_invalid_models_are_not_saved(self, store, name, definitions, message):
+        with pytest.raises(ValueError, match=message):
+            store.save(name, definitions)
+        assert store.get(name) is None
+
+    def test_stale_artifacts_are_rebuilt(self, store, monkeypatch):
+        original = store.save("cooling", make_definitions(1.0))[0].artifact
+
+        monkeypatch.setattr(artifact, "FORMAT_VERSION", artifact.FORMAT_VERSION + 1)
+        store.load(store.get("cooling"))
+        store.load(store.get("cooling"))
+
+        assert store.stats()["rebuilds"] == 1
+        assert store.get("cooling").artifact != original
+
+    def test_delete(self, store):
+        store.save("cooling", make_definitions(1.0))
+        store.save("cooling", make_definitions(2.0))
+
+        assert store.delete("cooling") == 2
+        assert store.versions("cooling") == []
+        assert store.delete("cooling") == 0
+
+    def test_conflicting_versions(self, store):
+        record, _ = store.save("cooling", make_definitions(1.0))
+
+        with pytest.raises(VersionConflictError):
+            store.backend.insert(record)
+
+
+def test_sqlite_models_survive_restarts(tmp_path):
+    path = str(tmp_path / "models.db")
+    record, _ = ModelStore(SqliteModelStoreBackend(path)).save("cooling", make_definitions(3.0))
+
+    restarted = ModelStore(SqliteModelStoreBackend(path))
+    assert restarted.get("cooling").created_at == record.created_at
+    model = restarted.find(record.model_id)
+    assert Calculator(model.parameters, {"it_load": 1.0}, model=model).evaluate(["energy"]) == {"result": [26280.0]}
+    assert restarted.stats()["versions"] == 1
@@ -0,0 +1,51 @@
+import pytest
+
+from app.core.calculation.model import CalculationModel
+from app.core.calculation.monte_carlo import MonteCarloSimulator
+from app.core.calculation.parameter import Parameter
+
+
+def make_model():
+    parameter_dicts = [
+        {"name": "it_load", "type": "USER"},
+        {"name": "price", "type": "USER"},
+        {"name": "utilization", "type": "USER"},
+        {"name": "hours", "type": "GLOBAL", "value": 8760},
+        {"name": "energy_cost", "type": "CALCULATION", "formula": "it_load * utilization * hours * price"},
+    ]
+    return CalculationModel([Parameter(param) for param in parameter_dicts])
+
+
+INPUTS = {
+    "it_load": 1000.0,
+    "price": {"distribution": "normal", "mean": 0.12, "std": 0.02},
+    "utilization": {"distribution": "triangular", "low": 0.5, "mode": 0.7, "high": 0.9},
+}
+
+
+class TestMonteCarloSimulator:
+    def test_statistics(self):
+        simulator = MonteCarloSimulator(make_model(), INPUTS, ["energy_cost"], samples=20_000, seed=7)
+        stats = simulator.run([5, 50, 95])["results"]["energy_cost"]
+
+        # Independent inputs: E[price * utilization] = E[price] * E[utilization]
+        expected_mean = 1000 * 8760 * 0.12 * (0.5 + 0.7 + 0.9) / 3
+        assert stats["mean"] == pytest.approx(expected_mean, rel=0.01)
+        assert stats["percentiles"]["p5"] < stats["percentiles"]["p50"] < stats["percentiles"]["p95"]
+        assert stats["invalid"] == 0
+
+    def test_seeded_runs_are_reproducible_across_worker_counts(self):
+        model = make_model()
+
+        single = MonteCarloSimulator(model, INPUTS, ["energy_cost"], samples=4000, seed=42, chunk_size=1000)
+        pooled = MonteCarloSimulator(model, INPUTS, ["energy_cost"], samples=4000, seed=42, chunk_size=1000, workers=2)
+
+        assert single.run([50])["results"] == pooled.run([50])["results"]
+
+    def test_invalid_distribution(self):
+        with pytest.raises(ValueError, match="requires std"):
+            MonteCarloSimulator(make_model(), {"price": {"distribution": "normal", "mean": 1}}, [], samples=10)
+
+        with pytest.raises(ValueError, match="mode outside"):
+            inputs = {"price": {"distribution": "triangular", "low": 0, "mode": 2, "high": 1}}
+            MonteCarloSimulator(make_model(), inputs, [], samples=10)
@@ -0,0 +1,56 @@
+import pytest
+
+from app.core.calculation.model import CalculationModel
+from app.core.calculation.offload import EvaluationPool, PoolSaturatedError
+
+DEFINITIONS = [
+    {"name": "it_load", "type": "USER"},
+    {"name": "pue", "type": "USER"},
+    {"name": "hours", "type": "GLOBAL", "value": 8760},
+    {"name": "energy", "type": "CALCULATION", "formula": "it_load * pue * hours"},
+]
+
+
+@pytest.fixture
+def pool():
+    pool = EvaluationPool(max_workers=1, max_queue=4, min_parameters=0)
+    yield pool
+    pool.shutdown()
+
+
+class TestEvaluationPool:
+    async def test_evaluates_in_worker_and_ships_model_once(self, pool):
+        model = CalculationModel.from_definitions(DEFINITIONS)
+
+        assert await pool.evaluate(model, {"it_load": 100.0, "pue": 1.5}, ["energy"]) == {"result": [1314000.0]}
+        assert model.model_id in pool._shipped
+        assert await pool.evaluate(model, {"it_load": 10.0, "pue": 1.5}, ["energy"]) == {"result": [131400.0]}
+
+    async def test_worker_without_model_gets_definitions_on_retry(self, pool):
+        model = CalculationModel.from_definitions(DEFINITIONS)
+        pool._shipped.add(model.model_id)
+
+        assert await pool.evaluate(model, {"it_load": 100.0, "pue": 1.0}, ["energy"]) == {"result": [876000.0]}
+
+    async def test_unregistered_definitions(self, pool):
+        result = await pool.evaluate_definitions(DEFINITIONS, {"it_load": 1.0, "pue": 1.0}, ["energy", "hours"])
+
+        assert result == {"result": [8760.0, 8760.0]}
+
+    async def test_errors_propagate(self, pool):
+        with pytest.raises(KeyError):
+            await pool.evaluate_definitions(DEFINITIONS, {"it_load": 1.0}, ["energy"])
+
+    async def test_saturated_pool_fails_fast(self):
+        pool = EvaluationPool(max_workers=1, max_queue=0, min_parameters=0)
+
+        with pytest.raises(PoolSaturatedError):
+            await pool.evaluate_definitions(DEFINITIONS, {"it_load": 1.0, "pue": 1.0}, ["energy"])
+        assert pool._executor is None
+
+    def test_should_offload(self):
+        pool = EvaluationPool(max_workers=2, max_queue=4, min_parameters=1000)
+
+        assert not pool.should_offload(999)
+        assert pool.should_offload(1000)
+        assert not EvaluationPool(max_workers=0, max_queue=4, min_parameters=0).should_offload(10**6)
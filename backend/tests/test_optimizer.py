@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from app.core.calculation.calculator import Calculator
+from app.core.calculation.model import CalculationModel
+from app.core.calculation.optimizer import CONST
+from app.core.calculation.parameter import Parameter
+
+
+def make_model():
+    parameter_dicts = [
+        {"name": "it_load", "type": "USER"},
+        {"name": "pue", "type": "USER"},
+        {"name": "price", "type": "USER"},
+        {"name": "hours", "type": "GLOBAL", "value": 8760},
+        {"name": "years", "type": "COMPANY", "value": 5},
+        {"name": "energy_cost", "type": "CALCULATION", "formula": "it_load * pue * hours * price"},
+        {"name": "lifetime_energy", "type": "CALCULATION", "formula": "it_load * pue * hours * years"},
+        {"name": "lifetime_hours", "type": "CALCULATION", "formula": "hours * years * 1"},
+        {"name": "tco", "type": "CALCULATION", "formula": "energy_cost * years + lifetime_hours"},
+    ]
+    return CalculationModel([Parameter(param) for param in parameter_dicts])
+
+
+INPUTS = {"it_load": 100.0, "pue": 1.5, "price": 0.1}
+TARGETS = ["tco", "lifetime_energy", "energy_cost", "lifetime_hours"]
+
+
+class TestExpressionPlan:
+    def test_matches_unoptimized_calculator(self):
+        model = make_model()
+
+        expected = Calculator(model.parameters, INPUTS, model=model).evaluate(TARGETS)
+        optimized = Calculator(model.parameters, INPUTS, model=model, optimize=True).evaluate(TARGETS)
+
+        assert optimized == expected
+
+    def test_folds_statics_and_shares_subexpressions(self):
+        plan = make_model().expression_plan(TARGETS, INPUTS)
+
+        # hours * years * 1 folds completely, and it_load * pue * hours is built only once
+        assert plan.nodes[plan.outputs["lifetime_hours"]] == (CONST, 43800.0)
+        assert plan.stats["folded"] == 2
+        assert plan.stats["shared"] == 2
+        assert plan.stats["eliminated"] == plan.stats["source_nodes"] - plan.stats["nodes"] > 0
+
+    def test_commutative_operands_are_shared(self):
+        parameters = [
+            Parameter({"name": "a", "type": "USER"}),
+            Parameter({"name": "b", "type": "USER"}),
+            Parameter({"name": "x", "type": "CALCULATION", "formula": "a * b"}),
+            Parameter({"name": "y", "type": "CALCULATION", "formula": "b * a"}),
+        ]
+        plan = CalculationModel(parameters).expression_plan(["x", "y"])
+
+        assert plan.outputs["x"] == plan.outputs["y"]
+
+    def test_provided_statics_are_not_folded(self):
+        model = make_model()
+        inputs = dict(INPUTS, hours=100.0)
+
+        result = Calculator(model.parameters, inputs, model=model, optimize=True).evaluate(["lifetime_hours"])
+        assert result == {"result": [500.0]}
+        assert model.expression_plan(["lifetime_hours"], inputs) is not model.expression_plan(
+            ["lifetime_hours"], INPUTS
+        )
+
+    def test_plans_are_cached_per_provided_overrides(self):
+        model = make_model()
+
+        assert model.expression_plan(TARGETS, INPUTS) is model.expression_plan(TARGETS, {"it_load": 1.0})
+
+    def test_batch_constants_divide_to_inf(self):
+        parameters = [
+            Parameter({"name": "k", "type": "GLOBAL", "value": 1}),
+            Parameter({"name": "r", "type": "CALCULATION", "formula": "k / 0"}),
+        ]
+        plan = CalculationModel(parameters).expression_plan(["r"])
+
+        with np.errstate(divide="ignore"):
+            assert plan.evaluate({}, ["r"], constant=np.float64) == [np.inf]
+        with pytest.raises(ZeroDivisionError):
+            plan.evaluate({}, ["r"])
+
+    def test_unresolved_target(self):
+        with pytest.raises(ValueError, match="Target 'unknown' was not resolved"):
+            make_model().expression_plan(["unknown"]).evaluate({}, ["unknown"])
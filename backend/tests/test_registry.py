@@ -0,0 +1,56 @@
+import pytest
+
+from app.core.calculation.calculator import Calculator
+from app.core.calculation.registry import ModelRegistry, ModelTooLargeError
+
+
+def make_definitions(factor: float):
+    return [
+        {"name": "x", "type": "USER"},
+        {"name": "factor", "type": "GLOBAL", "value": factor},
+        {"name": "result", "type": "CALCULATION", "formula": "x * factor"},
+    ]
+
+
+class TestModelRegistry:
+    def test_register_returns_shared_model(self):
+        registry = ModelRegistry(max_models=4, max_bytes=10**7)
+
+        model = registry.register(make_definitions(2.0))
+        assert registry.register(make_definitions(2.0)) is model
+        assert registry.get(model.model_id) is model
+
+        for x in [1.0, 3.0]:
+            calculator = Calculator(model.parameters, {"x": x}, model=model)
+            assert calculator.evaluate(["result"])["result"] == [x * 2.0]
+
+    def test_lru_eviction_by_count(self):
+        registry = ModelRegistry(max_models=2, max_bytes=10**7)
+
+        first = registry.register(make_definitions(1.0))
+        second = registry.register(make_definitions(2.0))
+        registry.get(first.model_id)
+        registry.register(make_definitions(3.0))
+
+        assert registry.get(second.model_id) is None
+        assert registry.get(first.model_id) is first
+
+        stats = registry.stats()
+        assert stats["models"] == 2
+        assert stats["evictions"] == 1
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+
+    def test_memory_limit(self):
+        model_size = ModelRegistry(max_models=4, max_bytes=10**7).register(make_definitions(1.0)).estimated_size()
+        registry = ModelRegistry(max_models=4, max_bytes=model_size * 2 + 1)
+
+        for factor in [1.0, 2.0, 3.0]:
+            registry.register(make_definitions(factor))
+
+        stats = registry.stats()
+        assert stats["bytes"] <= stats["max_bytes"]
+        assert stats["evictions"] >= 1
+
+        with pytest.raises(ModelTooLargeError):
+            ModelRegistry(max_models=4, max_bytes=10).register(make_definitions(1.0))
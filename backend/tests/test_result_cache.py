@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+
+from app.core.calculation.result_cache import MemoryCacheBackend, MongoCacheBackend, ResultCache, result_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeCollection:
+    # The subset of a pymongo collection the cache backend uses
+    def __init__(self):
+        self.documents = {}
+        self.indexes = []
+
+    def create_index(self, key, **options):
+        self.indexes.append((key, options))
+
+    def find_one(self, query):
+        return self.documents.get(query["_id"])
+
+    def replace_one(self, query, document, upsert=False):
+        self.documents[query["_id"]] = document
+
+    def delete_many(self, query):
+        self.documents.clear()
+
+    def estimated_document_count(self):
+        return len(self.documents)
+
+
+class TestResultKey:
+    def test_canonical(self):
+        assert result_key("m", {"a": 1.0, "b": 2.0}, ["x"]) == result_key("m", {"b": 2.0, "a": 1.0}, ["x"])
+        assert result_key("m", {"a": 1.0}, ["x", "y"]) != result_key("m", {"a": 1.0}, ["y", "x"])
+        assert result_key("m", {"a": 1.0}, ["x"]) != result_key("n", {"a": 1.0}, ["x"])
+
+
+class TestMemoryCacheBackend:
+    def test_lru_eviction(self):
+        backend = MemoryCacheBackend(max_entries=2, max_bytes=10**6)
+        backend.set("a", [1.0])
+        backend.set("b", [2.0])
+        backend.get("a")
+        backend.set("c", [3.0])
+
+        assert backend.get("b") is None
+        assert backend.get("a") == [1.0]
+        assert backend.stats()["evictions"] == 1
+
+    def test_byte_limit(self):
+        backend = MemoryCacheBackend(max_entries=100, max_bytes=2000)
+        for i in range(50):
+            backend.set(str(i), [float(i)] * 10)
+
+        assert 0 < backend.stats()["bytes"] <= 2000
+        assert backend.stats()["entries"] < 50
+
+        backend.set("huge", [0.0] * 10_000)
+        assert backend.get("huge") is None
+
+    def test_ttl(self):
+        clock = FakeClock()
+        backend = MemoryCacheBackend(max_entries=10, max_bytes=10**6, ttl_seconds=60, clock=clock)
+        backend.set("a", [1.0])
+
+        clock.now = 59
+        assert backend.get("a") == [1.0]
+        clock.now = 60
+        assert backend.get("a") is None
+        assert backend.stats() == {"entries": 0, "bytes": 0, "evictions": 0, "expirations": 1}
+
+
+class TestMongoCacheBackend:
+    def test_round_trip_and_expiry(self):
+        collection = FakeCollection()
+        backend = MongoCacheBackend(collection, ttl_seconds=60)
+        backend.set("a", [1.0])
+
+        assert collection.indexes == [("expires_at", {"expireAfterSeconds": 0})]
+        assert backend.get("a") == [1.0]
+
+        collection.documents["a"]["expires_at"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+        assert backend.get("a") is None
+
+
+class TestResultCache:
+    def test_hit_miss_counters(self):
+        cache = ResultCache(MemoryCacheBackend(max_entries=10, max_bytes=10**6), enabled=True)
+
+        assert cache.get("m", {"a": 1.0}, ["x"]) is None
+        cache.set("m", {"a": 1.0}, ["x"], [2.0])
+        assert cache.get("m", {"a": 1.0}, ["x"]) == [2.0]
+
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
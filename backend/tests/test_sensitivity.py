@@ -0,0 +1,73 @@
+import pytest
+
+from app.core.calculation.model import CalculationModel
+from app.core.calculation.parameter import Parameter
+from app.core.calculation.sensitivity import SensitivityAnalyzer
+
+
+def make_model(extra=()):
+    parameter_dicts = [
+        {"name": "it_load", "type": "USER"},
+        {"name": "pue", "type": "USER"},
+        {"name": "price", "type": "USER"},
+        {"name": "hours", "type": "GLOBAL", "value": 8760},
+        {"name": "energy", "type": "CALCULATION", "formula": "it_load * pue * hours"},
+        {"name": "energy_cost", "type": "CALCULATION", "formula": "energy * price"},
+        {"name": "capex", "type": "CALCULATION", "formula": "it_load * 1000"},
+        {"name": "tco", "type": "CALCULATION", "formula": "capex + energy_cost"},
+        *extra,
+    ]
+    return CalculationModel([Parameter(param) for param in parameter_dicts])
+
+
+INPUTS = {"it_load": 100.0, "pue": 1.5, "price": 0.1}
+
+
+def finite_difference(model, inputs, target, name, step=1e-6):
+    def value(shifted):
+        return SensitivityAnalyzer(model, shifted).analyze([target])["result"][0]
+
+    up = dict(inputs, **{name: inputs[name] + step})
+    down = dict(inputs, **{name: inputs[name] - step})
+    return (value(up) - value(down)) / (2 * step)
+
+
+class TestSensitivityAnalyzer:
+    def test_gradient_through_dag(self):
+        result = SensitivityAnalyzer(make_model(), INPUTS).analyze(["tco"])
+
+        assert result["result"] == pytest.approx([100000.0 + 100 * 1.5 * 8760 * 0.1])
+        assert result["sensitivity"]["tco"]["gradient"] == pytest.approx(
+            {"it_load": 1000 + 1.5 * 8760 * 0.1, "pue": 100 * 8760 * 0.1, "price": 100 * 1.5 * 8760}
+        )
+
+    def test_matches_finite_differences_for_every_operator(self):
+        model = make_model(
+            [
+                {"name": "ratio", "type": "CALCULATION", "formula": "-(energy_cost / capex) ** pue + +price - it_load"},
+            ]
+        )
+        gradient = SensitivityAnalyzer(model, INPUTS).analyze(["ratio"])["sensitivity"]["ratio"]["gradient"]
+
+        for name in INPUTS:
+            assert gradient[name] == pytest.approx(finite_difference(model, INPUTS, "ratio", name), rel=1e-5)
+
+    def test_inputs_overriding_calculations(self):
+        inputs = dict(INPUTS, energy=50000.0)
+        gradient = SensitivityAnalyzer(make_model(), inputs).analyze(["tco"])["sensitivity"]["tco"]["gradient"]
+
+        # pue only reaches tco through energy, which the caller pinned
+        assert gradient == pytest.approx({"it_load": 1000.0, "pue": 0.0, "price": 50000.0, "energy": 0.1})
+
+    def test_tornado_ranking(self):
+        tornado = SensitivityAnalyzer(make_model(), INPUTS).analyze(["tco"], swing=0.1)["sensitivity"]["tco"]["tornado"]
+
+        # energy_cost (131400) outweighs capex (100000), so it_load, which drives both, ranks first
+        assert [entry["input"] for entry in tornado] == ["it_load", "pue", "price"]
+        assert tornado[1]["low"] == pytest.approx(231400 - 13140)
+        assert tornado[1]["high"] == pytest.approx(231400 + 13140)
+        assert tornado[1]["elasticity"] == pytest.approx(131400 / 231400)
+
+    def test_missing_input(self):
+        with pytest.raises(KeyError):
+            SensitivityAnalyzer(make_model(), {"it_load": 1.0}).analyze(["tco"])
@@ -0,0 +1,73 @@
+import pytest
+
+from app.core.calculation.model import CalculationModel
+from app.core.calculation.parameter import Parameter
+from app.core.calculation.session import CalculationSession, SessionStore
+
+
+def make_model():
+    parameter_dicts = [
+        {"name": "it_load", "type": "USER"},
+        {"name": "pue", "type": "USER"},
+        {"name": "price", "type": "USER"},
+        {"name": "hours", "type": "GLOBAL", "value": 8760},
+        {"name": "energy", "type": "CALCULATION", "formula": "it_load * pue * hours"},
+        {"name": "energy_cost", "type": "CALCULATION", "formula": "energy * price"},
+        {"name": "capex", "type": "CALCULATION", "formula": "it_load * 1000"},
+        {"name": "tco", "type": "CALCULATION", "formula": "capex + energy_cost"},
+    ]
+    return CalculationModel([Parameter(param) for param in parameter_dicts])
+
+
+class TestCalculationSession:
+    def test_update_recomputes_only_dependants(self):
+        session = CalculationSession(make_model(), {"it_load": 100.0, "pue": 1.5, "price": 0.1}, ["capex", "tco"])
+        assert session.results() == pytest.approx([100000.0, 100000.0 + 100 * 1.5 * 8760 * 0.1])
+
+        changed, recomputed = session.update({"price": 0.2})
+        assert changed == {"tco": pytest.approx(100000.0 + 100 * 1.5 * 8760 * 0.2)}
+        # energy_cost and tco, but not energy or capex
+        assert recomputed == 2
+
+    def test_unchanged_values_stop_propagation(self):
+        session = CalculationSession(make_model(), {"it_load": 100.0, "pue": 1.5, "price": 0.1}, ["tco"])
+
+        assert session.update({"price": 0.1}) == ({}, 0)
+
+    def test_input_overrides_calculation(self):
+        session = CalculationSession(make_model(), {"it_load": 100.0, "pue": 1.5, "price": 0.1}, ["tco"])
+
+        session.update({"energy": 1000.0, "pue": 2.0})
+        assert session.results() == [100000.0 + 1000.0 * 0.1]
+
+        with pytest.raises(ValueError, match="not a parameter"):
+            session.update({"unknown": 1.0})
+
+    def test_failed_update_leaves_session_unchanged(self):
+        parameters = [
+            Parameter({"name": "x", "type": "USER"}),
+            Parameter({"name": "r", "type": "CALCULATION", "formula": "1 / x"}),
+        ]
+        session = CalculationSession(CalculationModel(parameters), {"x": 2.0}, ["r"])
+
+        with pytest.raises(ZeroDivisionError):
+            session.update({"x": 0.0})
+        assert session.inputs == {"x": 2.0}
+        assert session.results() == [0.5]
+
+        assert session.update({"x": 4.0}) == ({"r": 0.25}, 1)
+
+    def test_store_eviction(self):
+        store = SessionStore(max_sessions=2, ttl_seconds=3600)
+        model = make_model()
+        inputs = {"it_load": 1.0, "pue": 1.0, "price": 1.0}
+
+        first = store.create(model, inputs, ["tco"])
+        store.create(model, inputs, ["tco"])
+        store.create(model, inputs, ["tco"])
+
+        assert store.get(first.session_id) is None
+
+        expiring = SessionStore(max_sessions=2, ttl_seconds=-1)
+        session = expiring.create(model, inputs, ["tco"])
+        assert expiring.get(session.session_id) is None
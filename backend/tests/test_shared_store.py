@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+
+import pytest
+
+from app.core.calculation import artifact
+from app.core.calculation.artifact import ArtifactVersionError, dump_model, load_model
+from app.core.calculation.calculator import Calculator
+from app.core.calculation.model import CalculationModel
+from app.core.calculation.registry import ModelRegistry
+from app.core.calculation.shared_store import SharedModelStore
+
+DEFINITIONS = [
+    {"name": "it_load", "type": "USER", "unit": "kW"},
+    {"name": "lighting", "type": "GLOBAL", "value": 500, "unit": "W"},
+    {"name": "price", "type": "COMPANY", "value": "0.12", "unit": "$/kWh"},
+    {"name": "hours", "type": "GLOBAL", "value": 8760, "unit": "h"},
+    {"name": "load", "type": "CALCULATION", "formula": "it_load + lighting"},
+    {"name": "cost", "type": "CALCULATION", "formula": "load * hours * price", "unit": "$"},
+    # Too deep for a native function, so it runs on the program interpreter
+    {"name": "deep", "type": "CALCULATION", "formula": "(" * 150 + "it_load" + " + 1)" * 150},
+]
+
+
+def evaluate(model, targets=("load", "cost", "deep")):
+    return Calculator(model.parameters, {"it_load": 2.0}, model=model, optimize=True).evaluate(list(targets))
+
+
+def load_in_worker(path, model_id):
+    # Runs in a separate process, like another uvicorn worker
+    model, _ = SharedModelStore(path, 10**8).load(model_id)
+    return evaluate(model, ["cost"])
+
+
+class TestArtifact:
+    @pytest.mark.parametrize("check_units", [False, True])
+    def test_round_trip(self, check_units):
+        model = CalculationModel.from_definitions(DEFINITIONS, check_units)
+        restored = load_model(dump_model(model))
+
+        assert restored.model_id == model.model_id
+        assert restored.evaluation_order == model.evaluation_order
+        assert restored.units == model.units
+        assert evaluate(restored) == evaluate(model)
+        assert restored.param_map["load"].compiled.is_native
+        assert not restored.param_map["deep"].compiled.is_native
+
+    def test_time_series_round_trip(self):
+        definitions = [
+            {"name": "cash", "type": "GLOBAL", "value": [10, 20, 30]},
+            {"name": "rate", "type": "USER"},
+            {"name": "pv", "type": "CALCULATION", "formula": "npv(rate, cash)"},
+        ]
+        model = load_model(dump_model(CalculationModel.from_definitions(definitions)))
+
+        assert model.time_series
+        result = Calculator(model.parameters, {"rate": 0.0}, model=model).evaluate(["pv"])
+        assert result == {"result": [60.0]}
+
+    def test_other_versions_are_rejected(self, monkeypatch):
+        data = dump_model(CalculationModel.from_definitions(DEFINITIONS))
+
+        monkeypatch.setattr(artifact, "FORMAT_VERSION", artifact.FORMAT_VERSION + 1)
+        with pytest.raises(ArtifactVersionError):
+            load_model(data)
+        with pytest.raises(ValueError, match="Not a model artifact"):
+            load_model(b"x" * 32)
+
+
+class TestSharedModelStore:
+    def test_workers_share_compiled_models(self, tmp_path):
+        first = ModelRegistry(max_models=4, max_bytes=10**8, store=SharedModelStore(str(tmp_path), 10**8))
+        second = ModelRegistry(max_models=4, max_bytes=10**8, store=SharedModelStore(str(tmp_path), 10**8))
+
+        model = first.register(DEFINITIONS)
+        assert os.listdir(tmp_path) == [f"{model.model_id}.model"]
+
+        # Loaded from the artifact, without compiling formulas (restored ones carry no AST)
+        shared = second.get(model.model_id)
+        assert shared is not model
+        assert shared.param_map["load"].ast is None
+        assert evaluate(shared) == evaluate(model)
+        assert second.register(DEFINITIONS) is shared
+        assert second.stats()["shared_loads"] == 1
+        assert first.stats()["shared_publishes"] == 1
+
+    def test_removal_invalidates_other_workers(self, tmp_path):
+        first = ModelRegistry(max_models=4, max_bytes=10**8, store=SharedModelStore(str(tmp_path), 10**8))
+        second = ModelRegistry(max_models=4, max_bytes=10**8, store=SharedModelStore(str(tmp_path), 10**8))
+
+        model = first.register(DEFINITIONS)
+        assert second.get(model.model_id) is not None
+
+        assert first.remove(model.model_id)
+        assert second.get(model.model_id) is None
+        assert not os.listdir(tmp_path)
+
+    def test_stale_artifacts_are_rebuilt(self, tmp_path, monkeypatch):
+        store = SharedModelStore(str(tmp_path), 10**8)
+        model = CalculationModel.from_definitions(DEFINITIONS)
+        store.publish(model)
+
+        monkeypatch.setattr(artifact, "FORMAT_VERSION", artifact.FORMAT_VERSION + 1)
+        registry = ModelRegistry(max_models=4, max_bytes=10**8, store=store)
+        assert registry.get(model.model_id) is None
+
+        registry.register(DEFINITIONS)
+        assert store.stats() == {"shared_loads": 0, "shared_publishes": 2, "shared_stale": 2}
+        assert store.load(model.model_id) is not None
+
+    def test_eviction_and_invalid_ids(self, tmp_path):
+        models = [
+            CalculationModel.from_definitions([*DEFINITIONS, {"name": "x", "type": "GLOBAL", "value": index}])
+            for index in range(3)
+        ]
+        store = SharedModelStore(str(tmp_path), len(dump_model(models[0])) * 2 + 100)
+        for model in models:
+            store.publish(model)
+
+        assert store.stamp(models[0].model_id) is None
+        assert all(store.stamp(model.model_id) for model in models[1:])
+        assert store.load("../../etc/passwd") is None
+
+    def test_load_in_another_process(self, tmp_path):
+        model = CalculationModel.from_definitions(DEFINITIONS, check_units=True)
+        SharedModelStore(str(tmp_path), 10**8).publish(model)
+
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            assert pool.apply(load_in_worker, (str(tmp_path), model.model_id)) == evaluate(model, ["cost"])
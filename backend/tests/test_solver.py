@@ -0,0 +1,80 @@
+import pytest
+
+from app.core.calculation.model import CalculationModel
+from app.core.calculation.parameter import Parameter
+from app.core.calculation.solver import GoalSeekSolver
+
+
+def make_model():
+    parameter_dicts = [
+        {"name": "it_load", "type": "USER"},
+        {"name": "price", "type": "USER"},
+        {"name": "hours", "type": "GLOBAL", "value": 8760},
+        {"name": "energy_cost", "type": "CALCULATION", "formula": "it_load * hours * price"},
+        {"name": "capex", "type": "CALCULATION", "formula": "it_load ** 2 * 10"},
+        {"name": "tco", "type": "CALCULATION", "formula": "capex + energy_cost"},
+    ]
+    return CalculationModel([Parameter(param) for param in parameter_dicts])
+
+
+INPUTS = {"it_load": 100.0, "price": 0.1}
+
+# tco = 100000 + 876000 * price, so tco = 500000 at price = 400000 / 876000
+BREAK_EVEN = 400000 / 876000
+
+
+class TestGoalSeekSolver:
+    @pytest.mark.parametrize("method", ["brent", "bisection", "newton"])
+    def test_methods_agree(self, method):
+        solver = GoalSeekSolver(make_model(), INPUTS)
+        spec = {"target": "tco", "value": 500000, "input": "price", "lower": 0, "upper": 10, "method": method}
+        result = solver.solve_one(spec)
+
+        assert result["converged"]
+        assert result["solution"] == pytest.approx(BREAK_EVEN)
+        assert result["residual"] == pytest.approx(0, abs=1e-3)
+
+    def test_brent_needs_fewer_iterations_than_bisection(self):
+        solver = GoalSeekSolver(make_model(), INPUTS)
+        spec = {"target": "tco", "value": 500000, "input": "it_load", "lower": 1, "upper": 1000}
+
+        brent = solver.solve_one(spec)
+        bisection = solver.solve_one(dict(spec, method="bisection"))
+
+        assert brent["solution"] == pytest.approx(bisection["solution"])
+        assert brent["iterations"] < bisection["iterations"]
+
+    def test_unbounded_newton(self):
+        solver = GoalSeekSolver(make_model(), INPUTS)
+        result = solver.solve_one({"target": "capex", "value": 250000, "input": "it_load", "method": "newton"})
+
+        assert result["converged"]
+        assert result["solution"] == pytest.approx(158.11388300841898)
+
+    def test_batch_solve(self):
+        solver = GoalSeekSolver(make_model(), INPUTS)
+        result = solver.solve(
+            [
+                {"target": "tco", "value": 500000, "input": "price", "lower": 0, "upper": 10},
+                {"target": "energy_cost", "value": 8760, "input": "price", "lower": 0, "upper": 10},
+            ]
+        )
+
+        assert [solution["solution"] for solution in result["solutions"]] == pytest.approx([BREAK_EVEN, 0.01])
+        assert result["elapsed_ms"] >= 0
+
+    def test_no_sign_change(self):
+        solver = GoalSeekSolver(make_model(), INPUTS)
+        result = solver.solve_one({"target": "tco", "value": 1, "input": "price", "lower": 0, "upper": 10})
+
+        assert not result["converged"]
+        assert result["solution"] is None
+        assert "same sign" in result["message"]
+
+    def test_invalid_specs(self):
+        solver = GoalSeekSolver(make_model(), INPUTS)
+
+        with pytest.raises(ValueError, match="lower and upper"):
+            solver.solve_one({"target": "tco", "value": 1, "input": "price"})
+        with pytest.raises(ValueError, match="not a parameter"):
+            solver.solve_one({"target": "tco", "value": 1, "input": "unknown", "lower": 0, "upper": 1})
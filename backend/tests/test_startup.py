@@ -0,0 +1,67 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from app.core.warmup import warmup
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+# Generous budgets, meant to catch regressions like an eager heavy import, not to benchmark
+IMPORT_BUDGET_SECONDS = 3.0
+FIRST_RESPONSE_BUDGET_SECONDS = 0.5
+
+COLD_START = """
+import json, sys, time
+
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter() - start
+pint_on_import = "pint" in sys.modules
+
+from fastapi.testclient import TestClient
+
+with TestClient(app) as client:
+    start = time.perf_counter()
+    response = client.post(
+        "/api/v1/calculate",
+        json={
+            "parameters": [
+                {"name": "load", "type": "USER", "unit": "kW"},
+                {"name": "energy", "type": "CALCULATION", "formula": "load * 24"},
+            ],
+            "inputs": {"load": 2},
+            "target": ["energy"],
+        },
+    )
+    first_response = time.perf_counter() - start
+
+print(json.dumps({
+    "imported": imported,
+    "pint_on_import": pint_on_import,
+    "first_response": first_response,
+    "result": response.json(),
+}))
+"""
+
+
+def cold_start() -> dict:
+    # A fresh interpreter, since this one has already imported everything
+    output = subprocess.run(
+        [sys.executable, "-c", COLD_START], cwd=BACKEND, capture_output=True, text=True, check=True, timeout=60
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def test_cold_start_budgets():
+    timings = cold_start()
+
+    assert not timings["pint_on_import"]
+    assert timings["imported"] < IMPORT_BUDGET_SECONDS
+    assert timings["result"] == {"result": [48.0]}
+    assert timings["first_response"] < FIRST_RESPONSE_BUDGET_SECONDS
+
+
+def test_warmup_is_idempotent():
+    warmup()
+    warmup()
@@ -0,0 +1,119 @@
+import itertools
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from app.core.calculation.model import CalculationModel
+from app.core.calculation.sweep import ParameterSweep, pareto_front
+
+DEFINITIONS = [
+    {"name": "it_load", "type": "USER"},
+    {"name": "pue", "type": "USER"},
+    {"name": "price", "type": "USER"},
+    {"name": "capex", "type": "CALCULATION", "formula": "it_load * 1000 / pue"},
+    {"name": "opex", "type": "CALCULATION", "formula": "it_load * pue * 8760 * price"},
+]
+AXES = {"it_load": [100, 200, 300], "pue": {"start": 1.1, "stop": 1.5, "steps": 5}}
+
+
+def brute_force(levels, price=0.1):
+    rows = []
+    for it_load, pue in itertools.product(*levels):
+        rows.append((it_load, pue, it_load * 1000 / pue, it_load * pue * 8760 * price))
+    return rows
+
+
+def dominated(values, j):
+    # Identical rows count as dominated by the earlier one
+    return any(
+        np.all(values[i] <= values[j]) and (np.any(values[i] < values[j]) or i < j)
+        for i in range(len(values))
+        if i != j
+    )
+
+
+class TestParameterSweep:
+    def test_scenarios_enumerate_the_grid_in_product_order(self):
+        model = CalculationModel.from_definitions(DEFINITIONS)
+        sweep = ParameterSweep(model, AXES, {"price": 0.1}, ["capex", "opex"], chunk_size=4)
+        expected = brute_force([[100, 200, 300], np.linspace(1.1, 1.5, 5)])
+
+        assert sweep.size == 15
+        assert [sweep.scenario(index) for index in range(sweep.size)] == [
+            {"it_load": it_load, "pue": pue} for it_load, pue, _, _ in expected
+        ]
+
+        values = np.hstack([sweep.evaluate_chunk(start, stop) for start, stop in sweep.chunks()])
+        np.testing.assert_allclose(values.T, [[capex, opex] for _, _, capex, opex in expected])
+
+    def test_aggregates(self):
+        model = CalculationModel.from_definitions(DEFINITIONS)
+        sweep = ParameterSweep(model, AXES, {"price": 0.1}, ["capex", "opex"], chunk_size=4)
+        expected = brute_force([[100, 200, 300], np.linspace(1.1, 1.5, 5)])
+
+        result = sweep.aggregate({"capex": "min", "opex": "max"})
+        capex = result["results"]["capex"]
+        assert capex["min"] == pytest.approx(min(row[2] for row in expected))
+        assert capex["argmin"]["index"] == 4
+        assert capex["argmin"]["inputs"] == {"it_load": 100, "pue": pytest.approx(1.5)}
+        assert capex["argmax"]["index"] == 10
+        assert capex["invalid"] == 0
+
+        objectives = np.array([[row[2], -row[3]] for row in expected])
+        front = [index for index in range(len(expected)) if not dominated(objectives, index)]
+        assert [point["index"] for point in result["pareto"]] == front
+        assert result["scenarios"] == 15
+
+    def test_non_finite_results_are_counted(self):
+        model = CalculationModel.from_definitions(DEFINITIONS)
+        sweep = ParameterSweep(model, {"it_load": [1, 2], "pue": [0, 1]}, {"price": 1}, ["capex"])
+
+        result = sweep.aggregate()["results"]["capex"]
+        assert result["invalid"] == 2
+        assert (result["min"], result["max"]) == (1000, 2000)
+
+    @pytest.mark.parametrize("objectives", [1, 2, 3])
+    def test_pareto_front_matches_brute_force(self, objectives):
+        rng = np.random.default_rng(objectives)
+        for _ in range(50):
+            values = rng.integers(0, 5, (rng.integers(1, 40), objectives)).astype(float)
+            expected = [index for index in range(len(values)) if not dominated(values, index)]
+            assert pareto_front(values).tolist() == expected
+
+    def test_memory_does_not_grow_with_the_grid(self):
+        model = CalculationModel.from_definitions(DEFINITIONS)
+
+        def peak(steps):
+            axes = {"it_load": {"start": 1, "stop": 2, "steps": steps}, "pue": {"start": 1, "stop": 2, "steps": 100}}
+            sweep = ParameterSweep(model, axes, {"price": 0.1}, ["capex", "opex"], chunk_size=1000)
+            tracemalloc.start()
+            try:
+                sweep.aggregate({"capex": "min", "opex": "min"})
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        assert peak(1000) < 2 * peak(100)
+
+    @pytest.mark.parametrize(
+        "axes,inputs,message",
+        [
+            ({}, {}, "at least one"),
+            ({"it_load": []}, {}, "non-empty"),
+            ({"it_load": [1]}, {"it_load": 1}, "both swept and fixed"),
+            ({"it_load": list(range(10)), "pue": list(range(10))}, {}, "at most 50"),
+        ],
+    )
+    def test_invalid_sweeps(self, axes, inputs, message):
+        model = CalculationModel.from_definitions(DEFINITIONS)
+
+        with pytest.raises(ValueError, match=message):
+            ParameterSweep(model, axes, inputs, ["capex"], max_scenarios=50)
+
+    def test_pareto_objectives_must_be_targets(self):
+        model = CalculationModel.from_definitions(DEFINITIONS)
+        sweep = ParameterSweep(model, AXES, {"price": 0.1}, ["capex"])
+
+        with pytest.raises(ValueError, match="one of the targets"):
+            sweep.aggregate({"opex": "min"})
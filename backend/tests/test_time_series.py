@@ -0,0 +1,136 @@
+import numpy as np
+import pytest
+
+from app.core.calculation.batch import BatchCalculator
+from app.core.calculation.calculator import Calculator
+from app.core.calculation.coalescer import evaluate_scenarios
+from app.core.calculation.model import CalculationModel
+from app.core.calculation.parser import parse_formula_to_ast
+from app.core.calculation.sensitivity import SensitivityAnalyzer
+from app.core.calculation.session import CalculationSession
+from app.core.calculation.unit_checker import UnitCheckError
+
+DEFINITIONS = [
+    {"name": "price", "type": "GLOBAL", "value": [0.1, 0.11, 0.12, 0.13], "unit": "$/kWh"},
+    {"name": "load", "type": "USER", "unit": "kW"},
+    {"name": "growth", "type": "USER"},
+    {"name": "rate", "type": "GLOBAL", "value": 0.08},
+    {"name": "hours", "type": "GLOBAL", "value": 8760, "unit": "h"},
+    {"name": "energy", "type": "CALCULATION", "formula": "load * hours * cumsum(growth + 1) / 4", "unit": "kWh"},
+    {"name": "cost", "type": "CALCULATION", "formula": "energy * price", "unit": "$"},
+    {"name": "total", "type": "CALCULATION", "formula": "sum(cost)"},
+    {"name": "pv", "type": "CALCULATION", "formula": "npv(rate, cost)"},
+    {"name": "peak", "type": "CALCULATION", "formula": "max(cost) - min(max(cost, 30000))"},
+]
+INPUTS = {"load": 100, "growth": [0, 0.1, 0.2, 0.3]}
+TARGETS = ["cost", "total", "pv", "peak"]
+
+
+def expected():
+    energy = 100 * 8760 * np.cumsum([1.0, 1.1, 1.2, 1.3]) / 4
+    cost = energy * np.array([0.1, 0.11, 0.12, 0.13])
+    pv = np.sum(cost / 1.08 ** np.arange(1, 5))
+    return cost, cost.sum(), pv, cost.max() - max(cost.min(), 30000)
+
+
+class TestParsing:
+    def test_calls_become_call_nodes(self):
+        ast, variables = parse_formula_to_ast("npv(rate, cost) + 1")
+
+        assert ast["left"] == {"type": "Call", "function": "npv", "args": ["rate", "cost"]}
+        assert variables == {"rate", "cost"}
+        assert parse_formula_to_ast("sum(a * b) + max(c, 1)")[1] == {"a", "b", "c"}
+
+    @pytest.mark.parametrize(
+        "formula,message",
+        [
+            ("exp(a)", "exp"),
+            ("npv(a)", "takes 2 argument(s)"),
+            ("sum(values=a)", "positional"),
+        ],
+    )
+    def test_invalid_calls(self, formula, message):
+        with pytest.raises(ValueError, match=message):
+            parse_formula_to_ast(formula)
+
+
+class TestEvaluation:
+    @pytest.mark.parametrize("optimize", [False, True])
+    def test_series_and_reductions(self, optimize):
+        model = CalculationModel.from_definitions(DEFINITIONS)
+        result = Calculator(model.parameters, INPUTS, model=model, optimize=optimize).evaluate(TARGETS)["result"]
+
+        cost, total, pv, peak = expected()
+        assert isinstance(result[0], list)
+        assert result[0] == pytest.approx(cost.tolist())
+        assert result[1:] == pytest.approx([total, pv, peak])
+
+    def test_scalar_models_are_unchanged(self):
+        model = CalculationModel.from_definitions(
+            [{"name": "a", "type": "USER"}, {"name": "b", "type": "CALCULATION", "formula": "max(a, 2) + 1"}]
+        )
+
+        assert not model.time_series
+        assert Calculator(model.parameters, {"a": 1}, model=model).evaluate(["b"]) == {"result": [3.0]}
+        assert BatchCalculator(model.parameters, {"a": [1.0, 3.0]}, model=model).evaluate(["b"]) == {
+            "result": [[3.0, 4.0]]
+        }
+
+    def test_series_lengths_must_match(self):
+        model = CalculationModel.from_definitions(DEFINITIONS)
+
+        assert model.time_steps == 4
+        with pytest.raises(ValueError, match="growth"):
+            Calculator(model.parameters, {"load": 1, "growth": [0, 0.1]}, model=model).evaluate(["total"])
+
+    def test_units(self):
+        model = CalculationModel.from_definitions(DEFINITIONS, check_units=True)
+        assert model.units["total"] == "$"
+        assert model.units["pv"] == "$"
+
+        invalid = [*DEFINITIONS[:3], {"name": "r", "type": "GLOBAL", "value": 0.1, "unit": "h"}]
+        invalid.append({"name": "pv", "type": "CALCULATION", "formula": "npv(r, price)"})
+        with pytest.raises(UnitCheckError, match="rates must be unitless"):
+            CalculationModel.from_definitions(invalid, check_units=True)
+
+
+class TestSensitivity:
+    def test_gradients_match_finite_differences(self):
+        model = CalculationModel.from_definitions(DEFINITIONS)
+        inputs = {"load": 100.0, "growth": [0, 0.1, 0.2, 0.3], "rate": 0.08}
+        gradient = SensitivityAnalyzer(model, inputs).analyze(["pv"])["sensitivity"]["pv"]["gradient"]
+
+        def pv(**changes):
+            return SensitivityAnalyzer(model, {**inputs, **changes}).analyze(["pv"])["result"][0]
+
+        h = 1e-6
+        assert gradient["rate"] == pytest.approx((pv(rate=0.08 + h) - pv(rate=0.08 - h)) / (2 * h), rel=1e-6)
+        assert gradient["load"] == pytest.approx((pv(load=100 + h) - pv(load=100 - h)) / (2 * h), rel=1e-6)
+        for step in range(4):
+            up, down = list(inputs["growth"]), list(inputs["growth"])
+            up[step] += h
+            down[step] -= h
+            assert gradient["growth"][step] == pytest.approx((pv(growth=up) - pv(growth=down)) / (2 * h), rel=1e-6)
+
+    def test_series_targets_are_rejected(self):
+        model = CalculationModel.from_definitions(DEFINITIONS)
+
+        with pytest.raises(ValueError, match="scalar"):
+            SensitivityAnalyzer(model, INPUTS).analyze(["cost"])
+
+
+class TestUnsupportedPaths:
+    def test_batches_and_sessions_reject_time_series_models(self):
+        model = CalculationModel.from_definitions(DEFINITIONS)
+
+        with pytest.raises(ValueError):
+            BatchCalculator(model.parameters, {"load": [1.0, 2.0]}, model=model).evaluate(["total"])
+        with pytest.raises(ValueError):
+            CalculationSession(model, INPUTS, ["total"])
+
+    def test_coalescer_evaluates_time_series_one_by_one(self):
+        model = CalculationModel.from_definitions(DEFINITIONS)
+        scenarios = [INPUTS, {**INPUTS, "load": 200}]
+
+        results = evaluate_scenarios(lambda: model, scenarios, ["total"])
+        assert results[1]["result"][0] == pytest.approx(2 * results[0]["result"][0])
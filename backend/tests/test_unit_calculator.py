@@ -0,0 +1,58 @@
+import pytest
+
+from app.core.calculation.model import CalculationModel
+from app.core.calculation.parameter import Parameter
+from app.core.calculation.unit_calculator import UnitCalculator, _infer_unit, get_unit_registry
+
+
+class TestUnitCalculator:
+    def test_registry_is_shared(self):
+        assert UnitCalculator().ureg is UnitCalculator().ureg is get_unit_registry()
+
+    def test_resolve_units_follows_calculation_chain(self):
+        parameter_dicts = [
+            {"name": "it_load", "type": "USER", "unit": "kW"},
+            {"name": "hours", "type": "GLOBAL", "value": 8760, "unit": "h"},
+            {"name": "price", "type": "GLOBAL", "value": 0.1, "unit": "$/kW/h"},
+            {"name": "energy", "type": "CALCULATION", "formula": "it_load * hours"},
+            {"name": "energy_cost", "type": "CALCULATION", "formula": "energy * price"},
+            {"name": "cost_per_kw", "type": "CALCULATION", "formula": "energy_cost / it_load"},
+            {"name": "inverse_load", "type": "CALCULATION", "formula": "1 / it_load"},
+            {"name": "credit", "type": "CALCULATION", "formula": "-energy_cost"},
+        ]
+        model = CalculationModel([Parameter(param) for param in parameter_dicts])
+
+        units = UnitCalculator.resolve_units(model)
+
+        assert units["energy"] == "h * kW"
+        assert units["energy_cost"] == "$"
+        assert units["cost_per_kw"] == "$/kW"
+        assert units["inverse_load"] == "1/kW"
+        assert units["credit"] == "$"
+        # Definitions are left untouched, so shared models stay consistent
+        assert model.param_map["energy"].unit == ""
+
+    def test_unit_inference_is_memoized(self):
+        parameter_dicts = [
+            {"name": "a", "type": "USER", "unit": "MW"},
+            {"name": "b", "type": "USER", "unit": "MW"},
+            {"name": "total", "type": "CALCULATION", "formula": "a + b"},
+        ]
+
+        UnitCalculator.resolve_units(CalculationModel([Parameter(param) for param in parameter_dicts]))
+        hits = _infer_unit.cache_info().hits
+        units = UnitCalculator.resolve_units(CalculationModel([Parameter(param) for param in parameter_dicts]))
+
+        assert units["total"] == "MW"
+        assert _infer_unit.cache_info().hits == hits + 1
+
+    def test_incompatible_units(self):
+        parameter_dicts = [
+            {"name": "a", "type": "USER", "unit": "MW"},
+            {"name": "b", "type": "USER", "unit": "kWh"},
+            {"name": "total", "type": "CALCULATION", "formula": "a - b"},
+        ]
+        model = CalculationModel([Parameter(param) for param in parameter_dicts])
+
+        with pytest.raises(ValueError, match="Incompatible units for subtract"):
+            UnitCalculator.resolve_units(model)
@@ -0,0 +1,102 @@
+import pytest
+
+from app.core.calculation.calculator import Calculator
+from app.core.calculation.model import CalculationModel, model_hash
+from app.core.calculation.sensitivity import SensitivityAnalyzer
+from app.core.calculation.unit_checker import UnitCheckError
+
+DEFINITIONS = [
+    {"name": "it_load", "type": "USER", "unit": "kW"},
+    {"name": "lighting", "type": "GLOBAL", "value": 500, "unit": "W"},
+    {"name": "hours", "type": "GLOBAL", "value": 10, "unit": "h"},
+    {"name": "price", "type": "GLOBAL", "value": 0.2, "unit": "€/kW/h"},
+    {"name": "fee", "type": "GLOBAL", "value": 5, "unit": "$"},
+    {"name": "load", "type": "CALCULATION", "formula": "it_load + lighting"},
+    {"name": "load_w", "type": "CALCULATION", "formula": "load", "unit": "W"},
+    {"name": "energy_cost", "type": "CALCULATION", "formula": "load * hours * price"},
+    {"name": "total", "type": "CALCULATION", "formula": "energy_cost + fee", "unit": "$"},
+    {"name": "margin", "type": "CALCULATION", "formula": "total * 1.2"},
+]
+
+
+def check(definitions):
+    return CalculationModel.from_definitions(definitions, check_units=True)
+
+
+class TestUnitChecker:
+    def test_units_are_resolved_at_build_time(self):
+        model = check(DEFINITIONS)
+
+        assert model.units["load"] == "kW"
+        assert model.units["load_w"] == "W"
+        assert model.units["energy_cost"] == "€"
+        assert model.units["total"] == "$"
+        assert model.units["margin"] == "$"
+
+    def test_conversions_are_folded_into_evaluation(self):
+        model = check(DEFINITIONS)
+        targets = ["load", "load_w", "energy_cost", "total", "margin"]
+        # 2 kW + 500 W = 2.5 kW, 2.5 kW * 10 h * 0.2 €/kWh = 5 €, 5 € = 5.5 $
+        expected = [2.5, 2500.0, 5.0, 10.5, 12.6]
+
+        for optimize in (False, True):
+            result = Calculator(model.parameters, {"it_load": 2.0}, model=model, optimize=optimize).evaluate(targets)
+            assert result["result"] == pytest.approx(expected)
+
+        analysis = SensitivityAnalyzer(model, {"it_load": 2.0}).analyze(["total"])
+        assert analysis["sensitivity"]["total"]["gradient"]["it_load"] == pytest.approx(10 * 0.2 * 1.1)
+
+    def test_unchecked_models_are_unchanged(self):
+        model = CalculationModel.from_definitions(DEFINITIONS)
+
+        assert model.units is None
+        assert Calculator(model.parameters, {"it_load": 2.0}, model=model).evaluate(["load"]) == {"result": [502.0]}
+        assert model.model_id != check(DEFINITIONS).model_id == model_hash(DEFINITIONS, check_units=True)
+
+    def test_unitless_operands_adapt(self):
+        model = check(
+            [
+                {"name": "load", "type": "USER", "unit": "kW"},
+                {"name": "factor", "type": "USER"},
+                {"name": "padded", "type": "CALCULATION", "formula": "load * factor + 1"},
+                {"name": "squared", "type": "CALCULATION", "formula": "load ** 2"},
+                {"name": "ratio", "type": "CALCULATION", "formula": "load / load"},
+                {"name": "priced", "type": "CALCULATION", "formula": "factor * 3", "unit": "$"},
+            ]
+        )
+
+        assert model.units["padded"] == "kW"
+        assert model.units["squared"] == "kW ** 2"
+        assert model.units["ratio"] is None
+        assert model.units["priced"] == "$"
+
+    @pytest.mark.parametrize(
+        "formula, unit, message",
+        [
+            ("load + hours", None, "incompatible units 'kW' and 'h'"),
+            ("load - fee", None, "incompatible units"),
+            ("load * hours", "$", "declared in '\\$' but its formula yields"),
+            ("load ** hours", None, "exponents must be unitless"),
+            ("load ** factor", None, "variable power"),
+            ("temperature + 1 + kelvin", None, "offset units"),
+        ],
+    )
+    def test_invalid_formulas_are_rejected(self, formula, unit, message):
+        definitions = [
+            {"name": "load", "type": "USER", "unit": "kW"},
+            {"name": "hours", "type": "USER", "unit": "h"},
+            {"name": "fee", "type": "USER", "unit": "$"},
+            {"name": "factor", "type": "USER"},
+            {"name": "temperature", "type": "USER", "unit": "degC"},
+            {"name": "kelvin", "type": "USER", "unit": "K"},
+            {"name": "bad", "type": "CALCULATION", "formula": formula, "unit": unit},
+        ]
+
+        with pytest.raises(UnitCheckError, match=message):
+            check(definitions)
+        # Without checking the same model builds as before
+        CalculationModel.from_definitions(definitions)
+
+    def test_unknown_unit(self):
+        with pytest.raises(UnitCheckError, match="unknown unit 'furlongz'"):
+            check([{"name": "x", "type": "USER", "unit": "furlongz"}])